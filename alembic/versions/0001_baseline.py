@@ -0,0 +1,106 @@
+"""Baseline schema (the tables create_all built before migrations)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "districts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("state", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_districts_id", "districts", ["id"])
+    op.create_index("ix_districts_name", "districts", ["name"], unique=True)
+
+    op.create_table(
+        "mandals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("district_id", sa.Integer(), sa.ForeignKey("districts.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_mandals_id", "mandals", ["id"])
+    op.create_index("ix_mandals_name", "mandals", ["name"])
+
+    op.create_table(
+        "villages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("mandal_id", sa.Integer(), sa.ForeignKey("mandals.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_villages_id", "villages", ["id"])
+    op.create_index("ix_villages_name", "villages", ["name"])
+
+    op.create_table(
+        "booths",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("booth_number", sa.String(), nullable=False),
+        sa.Column("booth_name", sa.String(), nullable=False),
+        sa.Column("village_id", sa.Integer(), sa.ForeignKey("villages.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_booths_id", "booths", ["id"])
+    op.create_index("ix_booths_booth_number", "booths", ["booth_number"])
+
+    op.create_table(
+        "houses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("house_number", sa.String(), nullable=False),
+        sa.Column("booth_id", sa.Integer(), sa.ForeignKey("booths.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_houses_id", "houses", ["id"])
+    op.create_index("ix_houses_house_number", "houses", ["house_number"])
+
+    op.create_table(
+        "voters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("age", sa.Integer()),
+        sa.Column("gender", sa.String()),
+        sa.Column("voter_id", sa.String(), nullable=False),
+        sa.Column("house_id", sa.Integer(), sa.ForeignKey("houses.id"), nullable=False),
+        sa.Column("district_name", sa.String()),
+        sa.Column("mandal_name", sa.String()),
+        sa.Column("village_name", sa.String()),
+        sa.Column("booth_number", sa.String()),
+        sa.Column("house_number", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_voters_id", "voters", ["id"])
+    op.create_index("ix_voters_name", "voters", ["name"])
+    op.create_index("ix_voters_voter_id", "voters", ["voter_id"], unique=True)
+    for column in ("district_name", "mandal_name", "village_name", "booth_number", "house_number"):
+        op.create_index(f"ix_voters_{column}", "voters", [column])
+
+    op.create_table(
+        "upload_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("booth_id", sa.Integer(), sa.ForeignKey("booths.id"), nullable=False),
+        sa.Column("total_voters", sa.Integer()),
+        sa.Column("total_houses", sa.Integer()),
+        sa.Column("status", sa.String()),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_upload_logs_id", "upload_logs", ["id"])
+
+
+def downgrade() -> None:
+    for table in ("upload_logs", "voters", "houses", "booths", "villages", "mandals", "districts"):
+        op.drop_table(table)
@@ -0,0 +1,71 @@
+"""Unique hierarchy indexes and denormalized hierarchy ids on voters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (index, table, columns) - each parent may hold a name only once
+UNIQUE_INDEXES = [
+    ("uq_mandals_district_id_name", "mandals", ["district_id", "name"]),
+    ("uq_villages_mandal_id_name", "villages", ["mandal_id", "name"]),
+    ("uq_booths_village_id_booth_number", "booths", ["village_id", "booth_number"]),
+    ("uq_houses_booth_id_house_number", "houses", ["booth_id", "house_number"]),
+]
+
+# Voter column -> (referenced table, how to fill it from the level below)
+VOTER_HIERARCHY_IDS = [
+    ("booth_id", "booths", "SELECT booth_id FROM houses WHERE houses.id = voters.house_id"),
+    ("village_id", "villages", "SELECT village_id FROM booths WHERE booths.id = voters.booth_id"),
+    ("mandal_id", "mandals", "SELECT mandal_id FROM villages WHERE villages.id = voters.village_id"),
+    ("district_id", "districts", "SELECT district_id FROM mandals WHERE mandals.id = voters.mandal_id"),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Check every table before creating anything: SQLite DDL isn't rolled back
+    for name, table, columns in UNIQUE_INDEXES:
+        column_list = ", ".join(columns)
+        duplicates = bind.execute(sa.text(
+            f"SELECT {column_list}, COUNT(*) FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1"
+        )).fetchmany(5)
+        if duplicates:
+            raise RuntimeError(
+                f"Cannot create {name}: {table} has duplicate ({column_list}) rows, "
+                f"e.g. {[tuple(row) for row in duplicates]}. Merge them and rerun the migration."
+            )
+    for name, table, columns in UNIQUE_INDEXES:
+        op.create_index(name, table, columns, unique=True)
+
+    op.create_index("ix_voters_house_id", "voters", ["house_id"])
+
+    for column, parent, fill in VOTER_HIERARCHY_IDS:
+        op.add_column("voters", sa.Column(column, sa.Integer(), nullable=True))
+        # SQLite cannot ALTER TABLE ... ADD CONSTRAINT; the models declare the
+        # foreign keys, so databases built by create_all still get them
+        if bind.dialect.name != "sqlite":
+            op.create_foreign_key(f"fk_voters_{column}_{parent}", "voters", parent, [column], ["id"])
+        op.execute(f"UPDATE voters SET {column} = ({fill})")
+        op.create_index(f"ix_voters_{column}_id", "voters", [column, "id"])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for column, parent, _ in reversed(VOTER_HIERARCHY_IDS):
+        op.drop_index(f"ix_voters_{column}_id", table_name="voters")
+        if bind.dialect.name != "sqlite":
+            op.drop_constraint(f"fk_voters_{column}_{parent}", "voters", type_="foreignkey")
+        op.drop_column("voters", column)
+
+    op.drop_index("ix_voters_house_id", table_name="voters")
+    for name, table, _ in reversed(UNIQUE_INDEXES):
+        op.drop_index(name, table_name=table)
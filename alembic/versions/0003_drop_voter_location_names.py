@@ -0,0 +1,51 @@
+"""Drop the location name columns from voters (resolved from the hierarchy ids)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+NAME_COLUMNS = ["district_name", "mandal_name", "village_name", "booth_number", "house_number"]
+
+# (column, how to fill it from the voter's hierarchy ids)
+NAME_SOURCES = [
+    ("district_name", "SELECT name FROM districts WHERE districts.id = voters.district_id"),
+    ("mandal_name", "SELECT name FROM mandals WHERE mandals.id = voters.mandal_id"),
+    ("village_name", "SELECT name FROM villages WHERE villages.id = voters.village_id"),
+    ("booth_number", "SELECT booth_number FROM booths WHERE booths.id = voters.booth_id"),
+    ("house_number", "SELECT house_number FROM houses WHERE houses.id = voters.house_id"),
+]
+
+
+def _drop_voter_search_index():
+    # The SQLite full-text index reads voters.house_number in the older
+    # layout; the application recreates it (and refills it) on startup
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("voters_fts_insert", "voters_fts_delete", "voters_fts_update"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS voters_fts")
+    op.execute("DROP VIEW IF EXISTS voters_fts_content")
+
+
+def upgrade() -> None:
+    _drop_voter_search_index()
+    for column in NAME_COLUMNS:
+        op.drop_index(f"ix_voters_{column}", table_name="voters")
+        op.drop_column("voters", column)
+
+
+def downgrade() -> None:
+    _drop_voter_search_index()
+    for column, source in NAME_SOURCES:
+        op.add_column("voters", sa.Column(column, sa.String(), nullable=True))
+        op.execute(f"UPDATE voters SET {column} = ({source})")
+        op.create_index(f"ix_voters_{column}", "voters", [column])
@@ -0,0 +1,39 @@
+"""Record the SHA-256 of uploaded PDFs and cache parsed rolls by it
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("upload_logs", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+    op.create_table(
+        "parsed_rolls",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("extract_mode", sa.String(), nullable=False),
+        sa.Column("voters", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_parsed_rolls_id", "parsed_rolls", ["id"])
+    op.create_index(
+        "uq_parsed_rolls_content_hash_extract_mode", "parsed_rolls", ["content_hash", "extract_mode"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_parsed_rolls_content_hash_extract_mode", table_name="parsed_rolls")
+    op.drop_index("ix_parsed_rolls_id", table_name="parsed_rolls")
+    op.drop_table("parsed_rolls")
+    op.drop_column("upload_logs", "content_hash")
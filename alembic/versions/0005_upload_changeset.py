@@ -0,0 +1,22 @@
+"""Store the changeset summary of revised rolls on upload logs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("upload_logs", sa.Column("changeset", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("upload_logs", "changeset")
@@ -0,0 +1,28 @@
+"""Record per-stage processing times and page, line and voter counts on upload logs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("upload_logs", sa.Column("stage_timings", sa.JSON(), nullable=True))
+    op.add_column("upload_logs", sa.Column("page_count", sa.Integer(), nullable=True))
+    op.add_column("upload_logs", sa.Column("line_count", sa.Integer(), nullable=True))
+    op.add_column("upload_logs", sa.Column("parsed_voter_count", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("upload_logs", "parsed_voter_count")
+    op.drop_column("upload_logs", "line_count")
+    op.drop_column("upload_logs", "page_count")
+    op.drop_column("upload_logs", "stage_timings")
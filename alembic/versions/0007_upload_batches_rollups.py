@@ -0,0 +1,109 @@
+"""Upload batches and hierarchy rollup counters, filled from the existing data
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Houses and voters of every booth
+BOOTH_COUNTS = """
+    SELECT booths.id AS booth_id, booths.village_id,
+           COALESCE(house_counts.houses, 0) AS houses, COALESCE(voter_counts.voters, 0) AS voters
+    FROM booths
+    LEFT JOIN (
+        SELECT booth_id, COUNT(*) AS houses FROM houses GROUP BY booth_id
+    ) AS house_counts ON house_counts.booth_id = booths.id
+    LEFT JOIN (
+        SELECT houses.booth_id, COUNT(*) AS voters
+        FROM voters JOIN houses ON houses.id = voters.house_id
+        GROUP BY houses.booth_id
+    ) AS voter_counts ON voter_counts.booth_id = booths.id
+"""
+
+# One statement per level; each node counts everything below it
+ROLLUP_BACKFILL = [
+    f"""
+    SELECT 'state', 0,
+           (SELECT COUNT(*) FROM districts), (SELECT COUNT(*) FROM mandals), (SELECT COUNT(*) FROM villages),
+           COUNT(booth_counts.booth_id), COALESCE(SUM(booth_counts.houses), 0), COALESCE(SUM(booth_counts.voters), 0)
+    FROM ({BOOTH_COUNTS}) AS booth_counts
+    """,
+    f"""
+    SELECT 'district', districts.id, 0, COUNT(DISTINCT mandals.id), COUNT(DISTINCT villages.id),
+           COUNT(booth_counts.booth_id), COALESCE(SUM(booth_counts.houses), 0), COALESCE(SUM(booth_counts.voters), 0)
+    FROM districts
+    LEFT JOIN mandals ON mandals.district_id = districts.id
+    LEFT JOIN villages ON villages.mandal_id = mandals.id
+    LEFT JOIN ({BOOTH_COUNTS}) AS booth_counts ON booth_counts.village_id = villages.id
+    GROUP BY districts.id
+    """,
+    f"""
+    SELECT 'mandal', mandals.id, 0, 0, COUNT(DISTINCT villages.id),
+           COUNT(booth_counts.booth_id), COALESCE(SUM(booth_counts.houses), 0), COALESCE(SUM(booth_counts.voters), 0)
+    FROM mandals
+    LEFT JOIN villages ON villages.mandal_id = mandals.id
+    LEFT JOIN ({BOOTH_COUNTS}) AS booth_counts ON booth_counts.village_id = villages.id
+    GROUP BY mandals.id
+    """,
+    f"""
+    SELECT 'village', villages.id, 0, 0, 0,
+           COUNT(booth_counts.booth_id), COALESCE(SUM(booth_counts.houses), 0), COALESCE(SUM(booth_counts.voters), 0)
+    FROM villages
+    LEFT JOIN ({BOOTH_COUNTS}) AS booth_counts ON booth_counts.village_id = villages.id
+    GROUP BY villages.id
+    """,
+    f"""
+    SELECT 'booth', booth_counts.booth_id, 0, 0, 0, 0, booth_counts.houses, booth_counts.voters
+    FROM ({BOOTH_COUNTS}) AS booth_counts
+    """,
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_batches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("total_files", sa.Integer()),
+        sa.Column("files_completed", sa.Integer()),
+        sa.Column("files_failed", sa.Integer()),
+        sa.Column("files_skipped", sa.Integer()),
+        sa.Column("total_voters", sa.Integer()),
+        sa.Column("total_houses", sa.Integer()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_upload_batches_id", "upload_batches", ["id"])
+
+    op.create_table(
+        "hierarchy_rollups",
+        sa.Column("level", sa.String(), primary_key=True),
+        sa.Column("node_id", sa.Integer(), primary_key=True),
+        sa.Column("districts", sa.Integer(), nullable=False),
+        sa.Column("mandals", sa.Integer(), nullable=False),
+        sa.Column("villages", sa.Integer(), nullable=False),
+        sa.Column("booths", sa.Integer(), nullable=False),
+        sa.Column("houses", sa.Integer(), nullable=False),
+        sa.Column("voters", sa.Integer(), nullable=False),
+    )
+
+    # Count what is already there; the application keeps the rollups current from here on
+    for select in ROLLUP_BACKFILL:
+        op.execute(
+            "INSERT INTO hierarchy_rollups (level, node_id, districts, mandals, villages, booths, houses, voters)"
+            + select
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("hierarchy_rollups")
+    op.drop_index("ix_upload_batches_id", table_name="upload_batches")
+    op.drop_table("upload_batches")
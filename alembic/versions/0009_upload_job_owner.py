@@ -0,0 +1,37 @@
+"""Record the batch and the server process of queued upload jobs
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("upload_logs", sa.Column("upload_batch_id", sa.Integer(), nullable=True))
+    # SQLite cannot ALTER TABLE ... ADD CONSTRAINT; the model declares the foreign key
+    if op.get_bind().dialect.name != "sqlite":
+        op.create_foreign_key(
+            "fk_upload_logs_upload_batch_id_upload_batches", "upload_logs", "upload_batches",
+            ["upload_batch_id"], ["id"]
+        )
+    op.add_column("upload_logs", sa.Column("worker", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("upload_logs", "worker")
+    if op.get_bind().dialect.name != "sqlite":
+        op.drop_constraint("fk_upload_logs_upload_batch_id_upload_batches", "upload_logs", type_="foreignkey")
+        op.drop_column("upload_logs", "upload_batch_id")
+        return
+    # A database built by create_all has the foreign key in the table
+    # definition, which SQLite only drops by recreating the table
+    with op.batch_alter_table("upload_logs") as batch_op:
+        batch_op.drop_column("upload_batch_id")
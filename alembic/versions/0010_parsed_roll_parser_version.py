@@ -0,0 +1,50 @@
+"""Key cached parsed rolls by parser version as well
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def _create_parsed_rolls(key_columns) -> None:
+    columns = [
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("extract_mode", sa.String(), nullable=False),
+    ]
+    if "parser_version" in key_columns:
+        columns.append(sa.Column("parser_version", sa.Integer(), nullable=False))
+    columns += [
+        sa.Column("voters", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ]
+    op.create_table("parsed_rolls", *columns, sa.PrimaryKeyConstraint("id"))
+    op.create_index("ix_parsed_rolls_id", "parsed_rolls", ["id"])
+    op.create_index("uq_parsed_rolls_" + "_".join(key_columns), "parsed_rolls", key_columns, unique=True)
+
+
+def _drop_parsed_rolls(key_columns) -> None:
+    op.drop_index("uq_parsed_rolls_" + "_".join(key_columns), table_name="parsed_rolls")
+    op.drop_index("ix_parsed_rolls_id", table_name="parsed_rolls")
+    op.drop_table("parsed_rolls")
+
+
+# Which parsers produced the cached rolls is unknown, so the cache is
+# recreated empty (rather than altered) and files are parsed again on their
+# next upload
+def upgrade() -> None:
+    _drop_parsed_rolls(["content_hash", "extract_mode"])
+    _create_parsed_rolls(["content_hash", "extract_mode", "parser_version"])
+
+
+def downgrade() -> None:
+    _drop_parsed_rolls(["content_hash", "extract_mode", "parser_version"])
+    _create_parsed_rolls(["content_hash", "extract_mode"])
@@ -1,36 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import base64
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app import crud, schemas, models
-from app.database import get_db
-from app.services import HierarchyService, PDFProcessingService
+from typing import BinaryIO, Callable, List, Optional
+from app import async_crud, crud, schemas, models
+from app.cache import HierarchySnapshot, hierarchy_cache
+from app.database import SessionLocal, get_async_db, get_db
+from app.exports import EXPORT_FORMATS, export_chunks, iter_export_batches
+from app.services import HierarchyService, BatchUploadService
+from app.jobs import enqueue_voter_batch, enqueue_voter_upload, spooled_pdf_source
+from app.uploads import (
+    MAX_EXCEL_UPLOAD_MB, UploadError, read_upload, spool_pdf, spool_spreadsheet, spool_zip, spool_zip_pdfs
+)
 
 router = APIRouter()
 
-# Hierarchy endpoints
+# count=estimate stops counting text-search matches here and reports "N+"
+ESTIMATE_COUNT_CAP = 1000
+
+# Seconds browsers may reuse hierarchy responses before revalidating them
+HIERARCHY_CACHE_MAX_AGE = int(os.getenv("HIERARCHY_CACHE_MAX_AGE", "0"))
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """True when the client's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+def _hierarchy_response(request: Request, snapshot: HierarchySnapshot, items: List[dict]) -> Response:
+    """JSON response for a cached hierarchy list, or 304 if the client has it"""
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"max-age={HIERARCHY_CACHE_MAX_AGE}, must-revalidate"
+    }
+    if _not_modified(request, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=json.dumps(items, separators=(",", ":")),
+        media_type="application/json",
+        headers=headers
+    )
+
+async def _spool(spool: Callable[[BinaryIO], str], file: UploadFile) -> str:
+    """Spool an upload to disk with spool_pdf/spool_spreadsheet; refused files answer with their status"""
+    try:
+        return await run_in_threadpool(spool, file.file)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{file.filename}: {str(e)}")
+
+def _voter_response(voter: models.Voter, snapshot: HierarchySnapshot) -> dict:
+    """A voter's fields, with its location names looked up in the cached hierarchy"""
+    return {**schemas.Voter.model_validate(voter).model_dump(), **snapshot.location_names(voter.booth_id)}
+
+# Read-only endpoints are async and use AsyncSession; endpoints that write
+# through the sync crud/services code run it in the threadpool
+
+# Hierarchy endpoints (served from the in-process hierarchy cache)
 @router.get("/districts", response_model=List[schemas.DropdownItem])
-def get_districts(db: Session = Depends(get_db)):
+async def get_districts(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get all districts for dropdown"""
-    districts = crud.get_districts(db)
-    return [{"id": d.id, "name": d.name} for d in districts]
+    snapshot = await hierarchy_cache.get_async(db)
+    return _hierarchy_response(request, snapshot, snapshot.districts)
 
 @router.get("/districts/{district_id}/mandals", response_model=List[schemas.DropdownItem])
-def get_mandals_by_district(district_id: int, db: Session = Depends(get_db)):
+async def get_mandals_by_district(district_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get mandals for a district"""
-    mandals = crud.get_mandals_by_district(db, district_id)
-    return [{"id": m.id, "name": m.name} for m in mandals]
+    snapshot = await hierarchy_cache.get_async(db)
+    return _hierarchy_response(request, snapshot, snapshot.mandals.get(district_id, []))
 
 @router.get("/mandals/{mandal_id}/villages", response_model=List[schemas.DropdownItem])
-def get_villages_by_mandal(mandal_id: int, db: Session = Depends(get_db)):
+async def get_villages_by_mandal(mandal_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get villages for a mandal"""
-    villages = crud.get_villages_by_mandal(db, mandal_id)
-    return [{"id": v.id, "name": v.name} for v in villages]
+    snapshot = await hierarchy_cache.get_async(db)
+    return _hierarchy_response(request, snapshot, snapshot.villages.get(mandal_id, []))
 
 @router.get("/villages/{village_id}/booths", response_model=List[schemas.DropdownItem])
-def get_booths_by_village(village_id: int, db: Session = Depends(get_db)):
+async def get_booths_by_village(village_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get booths for a village"""
-    booths = crud.get_booths_by_village(db, village_id)
-    return [{"id": b.id, "name": f"{b.booth_number} - {b.booth_name}"} for b in booths]
+    snapshot = await hierarchy_cache.get_async(db)
+    return _hierarchy_response(request, snapshot, snapshot.booths.get(village_id, []))
+
+@router.get("/hierarchy/tree")
+async def get_hierarchy_tree(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    The whole District -> Mandal -> Village -> Booth tree in one response
+    Gzip-compressed for clients that accept it
+    """
+    snapshot = await hierarchy_cache.get_async(db)
+    gzipped = "gzip" in request.headers.get("accept-encoding", "")
+    # Each encoding is a different representation, so it gets its own ETag
+    etag = snapshot.etag[:-1] + '-gzip"' if gzipped else snapshot.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"max-age={HIERARCHY_CACHE_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding"
+    }
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.tree_gzip, media_type="application/json", headers=headers)
+    return Response(content=snapshot.tree_json, media_type="application/json", headers=headers)
 
 # Booth management
 @router.post("/booths", response_model=schemas.Booth)
@@ -49,28 +127,55 @@ def create_booth(booth: schemas.BoothCreate, db: Session = Depends(get_db)):
     return crud.create_booth(db, booth)
 
 @router.get("/booths/{booth_id}", response_model=schemas.Booth)
-def get_booth(booth_id: int, db: Session = Depends(get_db)):
+async def get_booth(booth_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get booth details"""
-    booth = crud.get_booth(db, booth_id)
+    booth = await async_crud.get_booth(db, booth_id, with_location=True)
     if not booth:
         raise HTTPException(status_code=404, detail="Booth not found")
     return booth
 
-# Excel hierarchy import
+# Excel/CSV hierarchy import
 @router.post("/import-hierarchy")
 async def import_hierarchy(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    """Import administrative hierarchy from Excel file"""
-    if not file.filename.endswith(('.xlsx', '.xls')):
+    """Import administrative hierarchy from an Excel or CSV file"""
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(
             status_code=400,
-            detail="File must be an Excel file (.xlsx or .xls)"
+            detail="File must be an Excel or CSV file (.xlsx, .xls or .csv)"
         )
     
-    file_content = await file.read()
-    result = HierarchyService.import_hierarchy_from_excel(db, file_content)
+    spreadsheet_path = await _spool(lambda fileobj: spool_spreadsheet(fileobj, file.filename), file)
+    try:
+        result = await run_in_threadpool(HierarchyService.import_hierarchy, db, spreadsheet_path)
+    finally:
+        os.remove(spreadsheet_path)
+    
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['message'])
+    
+    return result
+
+# Excel/CSV booth import
+@router.post("/import-booths")
+async def import_booths(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Import booths (District, Mandal, Village, Booth Number, Booth Name) from an Excel or CSV file"""
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be an Excel or CSV file (.xlsx, .xls or .csv)"
+        )
+    
+    spreadsheet_path = await _spool(lambda fileobj: spool_spreadsheet(fileobj, file.filename), file)
+    try:
+        result = await run_in_threadpool(HierarchyService.import_booths, db, spreadsheet_path)
+    finally:
+        os.remove(spreadsheet_path)
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['message'])
@@ -78,13 +183,18 @@ async def import_hierarchy(
     return result
 
 # PDF voter upload
-@router.post("/upload-voters")
+@router.post("/upload-voters", status_code=202)
 async def upload_voters(
     booth_id: int = Form(...),
     file: UploadFile = File(...),
+    revision: bool = Form(False),
     db: Session = Depends(get_db)
 ):
-    """Upload and process voter PDF for a booth"""
+    """
+    Queue a voter PDF of a booth for processing
+    Poll /upload-logs/{upload_log_id} for progress; revision=true applies the
+    PDF as a revised roll (updates, house moves and removals included)
+    """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(
             status_code=400,
@@ -92,32 +202,212 @@ async def upload_voters(
         )
     
     # Verify booth exists
-    booth = crud.get_booth(db, booth_id)
+    booth = await run_in_threadpool(crud.get_booth, db, booth_id)
     if not booth:
         raise HTTPException(status_code=404, detail="Booth not found")
     
-    file_content = await file.read()
-    result = PDFProcessingService.process_voter_pdf(
-        db, booth_id, file.filename, file_content
-    )
+    pdf_path = await _spool(spool_pdf, file)
+    upload_log = await run_in_threadpool(enqueue_voter_upload, db, booth_id, file.filename, pdf_path, revision)
     
-    if not result['success']:
-        raise HTTPException(status_code=400, detail=result['message'])
+    return {
+        'success': True,
+        'message': 'Upload queued for processing',
+        'upload_log_id': upload_log.id,
+        'status': upload_log.status
+    }
+
+@router.post("/upload-voters/batch", status_code=202)
+async def upload_voters_batch(
+    files: List[UploadFile] = File(...),
+    manifest: UploadFile = File(...),
+    revision: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a batch of voter PDFs - loose PDFs and/or ZIP archives of PDFs
+    The manifest CSV maps each PDF filename to its booth with the columns
+    filename, booth_number and village_id (or District, Mandal, Village)
+    """
+    try:
+        manifest_content = await run_in_threadpool(read_upload, manifest.file, MAX_EXCEL_UPLOAD_MB)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{manifest.filename}: {str(e)}")
+    try:
+        booths_by_file, manifest_errors = await run_in_threadpool(
+            BatchUploadService.resolve_manifest, db, manifest_content
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest: {str(e)}")
     
-    return result
+    sources = []
+    try:
+        for file in files:
+            if file.filename.lower().endswith('.zip'):
+                # Each PDF entry is extracted and checked like an uploaded PDF
+                zip_path = await _spool(spool_zip, file)
+                try:
+                    pdfs = await run_in_threadpool(spool_zip_pdfs, zip_path)
+                except UploadError as e:
+                    raise HTTPException(status_code=e.status_code, detail=f"{file.filename}: {str(e)}")
+                finally:
+                    os.remove(zip_path)
+                sources.extend(spooled_pdf_source(filename, path) for filename, path in pdfs)
+            elif file.filename.lower().endswith('.pdf'):
+                sources.append(spooled_pdf_source(file.filename, await _spool(spool_pdf, file)))
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{file.filename}: files must be PDFs or ZIP archives of PDFs"
+                )
+    except HTTPException:
+        # Nothing is queued, so the files spooled so far are released here
+        for _, _, release in sources:
+            if release:
+                release()
+        raise
+    
+    batch_name = files[0].filename if len(files) == 1 else f"{len(files)} files"
+    result = await run_in_threadpool(enqueue_voter_batch, db, batch_name, sources, booths_by_file, revision)
+    
+    return {
+        'success': True,
+        'message': f"Queued {len(result['upload_log_ids'])} of {len(sources)} PDFs for processing",
+        'manifest_errors': manifest_errors,
+        **result
+    }
+
+@router.get("/upload-batches/{upload_batch_id}", response_model=schemas.UploadBatch)
+async def get_upload_batch(upload_batch_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get the summary of a batch upload"""
+    upload_batch = await async_crud.get_upload_batch(db, upload_batch_id)
+    if not upload_batch:
+        raise HTTPException(status_code=404, detail="Upload batch not found")
+    return upload_batch
 
 # Voter data viewing
 @router.get("/booths/{booth_id}/summary")
-def get_booth_summary(booth_id: int, db: Session = Depends(get_db)):
-    """Get voter summary for a booth grouped by house"""
-    summary = crud.get_booth_summary(db, booth_id)
+async def get_booth_summary(
+    booth_id: int,
+    houses_only: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get voter summary for a booth grouped by house
+    houses_only returns per-house counts without voter rows; skip/limit page through houses
+    """
+    summary = await async_crud.get_booth_summary(db, booth_id, houses_only=houses_only, skip=skip, limit=limit)
     if not summary:
         raise HTTPException(status_code=404, detail="Booth not found")
     
+    snapshot = await hierarchy_cache.get_async(db)
+    for house in summary["houses"]:
+        house["voters"] = [_voter_response(voter, snapshot) for voter in house["voters"]]
     return summary
 
+def _encode_cursor(house_number: str, voter_pk: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([house_number, voter_pk]).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        house_number, voter_pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(house_number), int(voter_pk)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/booths/{booth_id}/summary/page")
+async def get_booth_summary_page(
+    booth_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Keyset-paginated voter summary for a booth, ordered by (house number, voter)
+    Pass next_cursor back as cursor to get the following page; a house can
+    continue on the next page
+    """
+    if not await async_crud.get_booth(db, booth_id):
+        raise HTTPException(status_code=404, detail="Booth not found")
+    
+    after = _decode_cursor(cursor) if cursor else None
+    rows = await async_crud.get_booth_voter_rows(db, booth_id, after=after, limit=limit + 1)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].house_number, rows[-1].id)
+    
+    location = (await hierarchy_cache.get_async(db)).location_names(booth_id)
+    return {
+        "booth_id": booth_id,
+        "houses": list(crud.group_voter_rows_by_house(rows, location)),
+        "next_cursor": next_cursor
+    }
+
+@router.get("/booths/{booth_id}/summary/stream")
+def stream_booth_summary(booth_id: int, db: Session = Depends(get_db)):
+    """Stream the voter summary of a booth as NDJSON, one house per line"""
+    if not crud.get_booth(db, booth_id):
+        raise HTTPException(status_code=404, detail="Booth not found")
+    
+    def house_lines():
+        # The stream outlives the request dependencies, so it owns its session
+        stream_db = SessionLocal()
+        try:
+            location = hierarchy_cache.get(stream_db).location_names(booth_id)
+            rows = crud.iter_booth_voter_rows(stream_db, booth_id)
+            for house in crud.group_voter_rows_by_house(rows, location):
+                yield json.dumps(jsonable_encoder(house)) + "\n"
+        finally:
+            stream_db.close()
+    
+    return StreamingResponse(house_lines(), media_type="application/x-ndjson")
+
+@router.get("/export/voters")
+def export_voters(
+    format: str = Query("csv", pattern="^(csv|ndjson|xlsx|parquet)$"),
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    village_id: Optional[int] = None,
+    booth_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Export the voters of a district, mandal, village or booth (the most
+    specific id given) as CSV, NDJSON, XLSX or Parquet
+    
+    Rows are streamed from a server-side cursor in EXPORT_BATCH_SIZE
+    batches; XLSX and Parquet files are written batch by batch to a
+    temporary file first, as both formats need their whole body to be
+    finished before it can be sent.
+    """
+    scopes = [("booth", booth_id), ("village", village_id), ("mandal", mandal_id), ("district", district_id)]
+    level, node_id = next(((level, node_id) for level, node_id in scopes if node_id is not None), (None, None))
+    if level is None:
+        raise HTTPException(status_code=400, detail="district_id, mandal_id, village_id or booth_id is required")
+    if not db.get(crud.HIERARCHY_LEVEL_MODELS[level], node_id):
+        raise HTTPException(status_code=404, detail=f"{level.capitalize()} not found")
+    
+    def chunks():
+        # The stream outlives the request dependencies, so it owns its session
+        stream_db = SessionLocal()
+        try:
+            snapshot = hierarchy_cache.get(stream_db)
+            yield from export_chunks(format, iter_export_batches(stream_db, level, node_id, snapshot))
+        finally:
+            stream_db.close()
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        chunks(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="voters-{level}-{node_id}.{extension}"'}
+    )
+
 @router.get("/voters/search")
-def search_voters(
+async def search_voters(
     district_id: int = None,
     mandal_id: int = None,
     village_id: int = None,
@@ -126,60 +416,116 @@ def search_voters(
     voter_id: str = None,
     name: str = None,
     skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=1000),
+    after_id: Optional[int] = None,
+    count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Search voters with filters"""
-    query = db.query(models.Voter)
-    
-    # Apply filters
-    if voter_id:
-        query = query.filter(models.Voter.voter_id.ilike(f"%{voter_id}%"))
-    if name:
-        query = query.filter(models.Voter.name.ilike(f"%{name}%"))
-    if house_number:
-        query = query.filter(models.Voter.house_number.ilike(f"%{house_number}%"))
-    if booth_id:
-        query = query.join(models.House).filter(models.House.booth_id == booth_id)
-    elif village_id:
-        query = query.join(models.House).join(models.Booth).filter(models.Booth.village_id == village_id)
-    elif mandal_id:
-        query = query.join(models.House).join(models.Booth).join(models.Village).filter(models.Village.mandal_id == mandal_id)
-    elif district_id:
-        query = query.join(models.House).join(models.Booth).join(models.Village).join(models.Mandal).filter(models.Mandal.district_id == district_id)
+    """
+    Search voters with filters
+    
+    after_id pages by voter id (pass the previous page's next_after_id)
+    instead of skip. count=exact counts every match; count=estimate reads
+    the hierarchy rollup totals for location-only searches and caps
+    text-search counts at ESTIMATE_COUNT_CAP; count=none skips counting.
+    """
+    statement = async_crud.voter_search_statement(
+        db,
+        district_id=district_id,
+        mandal_id=mandal_id,
+        village_id=village_id,
+        booth_id=booth_id,
+        house_number=house_number,
+        voter_id=voter_id,
+        name=name
+    )
     
-    total = query.count()
-    voters = query.offset(skip).limit(limit).all()
+    total = None
+    total_is_estimate = False
+    if count == "exact":
+        total = await async_crud.count_voters(db, statement)
+    elif count == "estimate":
+        if not (house_number or voter_id or name):
+            scope = next(
+                ((level, node_id) for level, node_id in [
+                    ("booth", booth_id), ("village", village_id),
+                    ("mandal", mandal_id), ("district", district_id)
+                ] if node_id),
+                ("state", 0)
+            )
+            total = (await async_crud.get_rollup(db, *scope))["voters"]
+        else:
+            total = await async_crud.count_voters_capped(db, statement, ESTIMATE_COUNT_CAP)
+            total_is_estimate = total >= ESTIMATE_COUNT_CAP
     
+    statement = statement.order_by(models.Voter.id)
+    if after_id is not None:
+        voters = await async_crud.get_voters(db, statement.where(models.Voter.id > after_id).limit(limit))
+    else:
+        voters = await async_crud.get_voters(db, statement.offset(skip).limit(limit))
+    
+    snapshot = await hierarchy_cache.get_async(db)
     return {
-        "voters": voters,
+        "voters": [_voter_response(voter, snapshot) for voter in voters],
         "total": total,
+        "total_is_estimate": total_is_estimate,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_after_id": voters[-1].id if voters and len(voters) == limit else None
     }
 
 # Upload logs
 @router.get("/upload-logs", response_model=List[schemas.UploadLog])
-def get_upload_logs(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+async def get_upload_logs(skip: int = 0, limit: int = 20, db: AsyncSession = Depends(get_async_db)):
     """Get upload logs"""
-    return crud.get_upload_logs(db, skip, limit)
+    return await async_crud.get_upload_logs(db, skip, limit)
+
+@router.get("/upload-logs/{upload_log_id}", response_model=schemas.UploadLog)
+async def get_upload_log(upload_log_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get one upload log, e.g. to poll a queued upload"""
+    upload_log = await async_crud.get_upload_log(db, upload_log_id)
+    if not upload_log:
+        raise HTTPException(status_code=404, detail="Upload log not found")
+    return upload_log
 
 # Statistics
 @router.get("/stats")
-def get_statistics(db: Session = Depends(get_db)):
+async def get_statistics(db: AsyncSession = Depends(get_async_db)):
     """Get overall statistics"""
-    districts_count = db.query(models.District).count()
-    mandals_count = db.query(models.Mandal).count()
-    villages_count = db.query(models.Village).count()
-    booths_count = db.query(models.Booth).count()
-    houses_count = db.query(models.House).count()
-    voters_count = db.query(models.Voter).count()
+    return await async_crud.get_rollup(db, "state")
+
+@router.get("/rollups")
+async def get_rollups(
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    village_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Drill-down counts for a hierarchy node and each of its children
+    Without filters: the state and its districts
+    """
+    snapshot = await hierarchy_cache.get_async(db)
+    if village_id:
+        level, node_id, child_level = "village", village_id, "booth"
+        children = snapshot.booths.get(village_id, [])
+    elif mandal_id:
+        level, node_id, child_level = "mandal", mandal_id, "village"
+        children = snapshot.villages.get(mandal_id, [])
+    elif district_id:
+        level, node_id, child_level = "district", district_id, "mandal"
+        children = snapshot.mandals.get(district_id, [])
+    else:
+        level, node_id, child_level = "state", 0, "district"
+        children = snapshot.districts
     
+    child_rollups = await async_crud.get_rollups(db, child_level, [child["id"] for child in children])
     return {
-        "districts": districts_count,
-        "mandals": mandals_count,
-        "villages": villages_count,
-        "booths": booths_count,
-        "houses": houses_count,
-        "voters": voters_count
+        "level": level,
+        "node_id": node_id,
+        "counts": await async_crud.get_rollup(db, level, node_id),
+        "children": [
+            {"level": child_level, **child, **child_rollups[child["id"]]}
+            for child in children
+        ]
     }
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Async versions of the read-only crud functions used by the request handlers
+Queries are the statements built in app.crud, run on an AsyncSession
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Any, Dict, List, Optional, Tuple
+from app import crud, models
+
+# Booth CRUD operations
+async def get_booth(db: AsyncSession, booth_id: int, with_location: bool = False):
+    """Get a booth; with_location also loads its village, mandal and district"""
+    statement = select(models.Booth).where(models.Booth.id == booth_id)
+    if with_location:
+        statement = statement.options(
+            joinedload(models.Booth.village).joinedload(models.Village.mandal).joinedload(models.Mandal.district)
+        )
+    return (await db.scalars(statement)).first()
+
+# Voter search
+def voter_search_statement(db: AsyncSession, **filters):
+    """select() of the voters matching the search filters (see crud.filter_voter_search)"""
+    return crud.filter_voter_search(select(models.Voter), db.sync_session.get_bind(), **filters)
+
+async def count_voters(db: AsyncSession, statement) -> int:
+    return await db.scalar(select(func.count()).select_from(statement.subquery()))
+
+async def count_voters_capped(db: AsyncSession, statement, cap: int) -> int:
+    return await db.scalar(crud.capped_count_statement(statement, cap))
+
+async def get_voters(db: AsyncSession, statement) -> List[models.Voter]:
+    return list(await db.scalars(statement))
+
+# Upload Log CRUD operations
+async def get_upload_logs(db: AsyncSession, skip: int = 0, limit: int = 100, with_location: bool = False):
+    """Newest upload logs first; with_location loads each booth's location"""
+    statement = select(models.UploadLog).order_by(models.UploadLog.id.desc()).offset(skip).limit(limit)
+    if with_location:
+        statement = statement.options(
+            joinedload(models.UploadLog.booth).joinedload(models.Booth.village)
+            .joinedload(models.Village.mandal).joinedload(models.Mandal.district)
+        )
+    return list(await db.scalars(statement))
+
+async def get_upload_log(db: AsyncSession, upload_log_id: int):
+    return await db.get(models.UploadLog, upload_log_id)
+
+async def get_upload_batch(db: AsyncSession, upload_batch_id: int):
+    return await db.get(models.UploadBatch, upload_batch_id)
+
+# Statistics functions
+async def get_booth_summary(
+    db: AsyncSession,
+    booth_id: int,
+    houses_only: bool = False,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    with_location: bool = False
+):
+    """Get summary of voters grouped by house for a booth (see crud.get_booth_summary)"""
+    booth = await get_booth(db, booth_id, with_location=with_location)
+    if not booth:
+        return None
+
+    house_counts = (await db.execute(crud.booth_house_counts_statement(booth_id))).all()
+    page, house_ids = crud.page_booth_houses(house_counts, skip, limit)
+
+    voters = []
+    if not houses_only and page:
+        voters = await db.scalars(crud.booth_voters_statement(booth_id, house_ids))
+    return crud.build_booth_summary(booth, house_counts, page, voters)
+
+async def get_booth_voter_rows(db: AsyncSession, booth_id: int, after: Optional[Tuple[str, int]] = None, limit: int = 500):
+    """One keyset page of a booth's voter rows, starting after (house_number, voter id)"""
+    return (await db.execute(crud.booth_voter_rows_statement(booth_id, after).limit(limit))).all()
+
+# Hierarchy rollup counters
+async def get_rollups(db: AsyncSession, level: str, node_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Map node_id -> counts for the given nodes of a level (missing nodes count zero)"""
+    rows = []
+    for statement in crud.rollups_statements(level, node_ids):
+        rows.extend(await db.scalars(statement))
+    return crud.rollup_counts(node_ids, rows)
+
+async def get_rollup(db: AsyncSession, level: str, node_id: int = 0) -> Dict[str, int]:
+    return (await get_rollups(db, level, [node_id]))[node_id]
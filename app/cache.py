@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import models
+
+# Seconds a process trusts its cached hierarchy before re-reading the shared
+# version counter (0 checks on every request); changes made by the process
+# itself are seen at once
+HIERARCHY_VERSION_TTL = float(os.getenv("HIERARCHY_VERSION_TTL", "1"))
+
+_VERSION_STATEMENT = select(models.HierarchyVersion.version).where(models.HierarchyVersion.id == 1)
+
+def bump_hierarchy_version(db: Session):
+    """
+    Mark the cached District -> Mandal -> Village -> Booth tree as stale in
+    every process; call before committing the hierarchy change
+    """
+    db.execute(
+        update(models.HierarchyVersion)
+        .where(models.HierarchyVersion.id == 1)
+        .values(version=models.HierarchyVersion.version + 1)
+    )
+    db.info["hierarchy_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _expire_after_commit(session: Session):
+    # This process sees its own change at once, without waiting out the TTL
+    if session.info.pop("hierarchy_changed", False):
+        hierarchy_cache.expire()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop("hierarchy_changed", None)
+
+# Districts, mandals, villages and booths, each level in id order
+_TREE_STATEMENTS = [
+    select(models.District.id, models.District.name).order_by(models.District.id),
+    select(models.Mandal.id, models.Mandal.name, models.Mandal.district_id).order_by(models.Mandal.id),
+    select(models.Village.id, models.Village.name, models.Village.mandal_id).order_by(models.Village.id),
+    select(
+        models.Booth.id, models.Booth.booth_number, models.Booth.booth_name, models.Booth.village_id
+    ).order_by(models.Booth.id),
+]
+
+# Location fields of a voter that are resolved from its booth
+LOCATION_NAMES = ["district_name", "mandal_name", "village_name", "booth_number"]
+
+class HierarchySnapshot:
+    """The whole hierarchy as dropdown lists keyed by parent id"""
+
+    def __init__(self, version: int, districts: List[Dict], mandals: Dict[int, List[Dict]],
+                 villages: Dict[int, List[Dict]], booths: Dict[int, List[Dict]],
+                 booth_locations: Dict[int, Dict[str, str]]):
+        self.version = version
+        self.districts = districts
+        self.mandals = mandals
+        self.villages = villages
+        self.booths = booths
+        self.booth_locations = booth_locations
+
+        tree = {"districts": [
+            {**district, "mandals": [
+                {**mandal, "villages": [
+                    {**village, "booths": booths.get(village["id"], [])}
+                    for village in villages.get(mandal["id"], [])
+                ]}
+                for mandal in mandals.get(district["id"], [])
+            ]}
+            for district in districts
+        ]}
+        self.tree_json = json.dumps(tree, separators=(",", ":")).encode()
+        self.tree_gzip = gzip.compress(self.tree_json)
+        # Content hash, so ETags stay valid across restarts and worker processes
+        self.etag = '"' + hashlib.sha1(self.tree_json).hexdigest() + '"'
+
+    def location_names(self, booth_id: Optional[int]) -> Dict[str, Optional[str]]:
+        """District, mandal and village names and booth number of a booth's voters"""
+        return self.booth_locations.get(booth_id) or dict.fromkeys(LOCATION_NAMES)
+
+class HierarchyCache:
+    """
+    In-process copy of the hierarchy, reloaded when the version counter in
+    the database moves
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def expire(self):
+        """Re-read the version counter on the next get"""
+        self._checked_at = 0.0
+
+    def _fresh(self) -> Optional[HierarchySnapshot]:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < HIERARCHY_VERSION_TTL:
+            return snapshot
+        return None
+
+    def _current(self, version: int) -> Optional[HierarchySnapshot]:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            self._checked_at = time.monotonic()
+            return snapshot
+        return None
+
+    def get(self, db: Session) -> HierarchySnapshot:
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        version = db.execute(_VERSION_STATEMENT).scalar() or 0
+        snapshot = self._current(version)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            snapshot = self._current(version)
+            if snapshot is None:
+                # Built with the version read before the load: a bump during the
+                # load forces another reload
+                checked_at = time.monotonic()
+                snapshot = self._build(version, [db.execute(statement).all() for statement in _TREE_STATEMENTS])
+                self._snapshot, self._checked_at = snapshot, checked_at
+            return snapshot
+
+    async def get_async(self, db: AsyncSession) -> HierarchySnapshot:
+        """get() for async handlers; concurrent reloads race harmlessly instead of locking"""
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+        version = (await db.execute(_VERSION_STATEMENT)).scalar() or 0
+        snapshot = self._current(version)
+        if snapshot is not None:
+            return snapshot
+        checked_at = time.monotonic()
+        rows = [(await db.execute(statement)).all() for statement in _TREE_STATEMENTS]
+        snapshot = self._build(version, rows)
+        self._snapshot, self._checked_at = snapshot, checked_at
+        return snapshot
+
+    @staticmethod
+    def _build(version: int, rows: List[List]) -> HierarchySnapshot:
+        district_rows, mandal_rows, village_rows, booth_rows = rows
+        districts = [{"id": id, "name": name} for id, name in district_rows]
+        district_names = dict(district_rows)
+        mandals = defaultdict(list)
+        mandal_locations = {}
+        for id, name, district_id in mandal_rows:
+            mandals[district_id].append({"id": id, "name": name})
+            mandal_locations[id] = (district_names.get(district_id), name)
+        villages = defaultdict(list)
+        village_locations = {}
+        for id, name, mandal_id in village_rows:
+            villages[mandal_id].append({"id": id, "name": name})
+            village_locations[id] = mandal_locations.get(mandal_id, (None, None)) + (name,)
+        booths = defaultdict(list)
+        booth_locations = {}
+        for id, booth_number, booth_name, village_id in booth_rows:
+            booths[village_id].append({"id": id, "name": f"{booth_number} - {booth_name}"})
+            booth_locations[id] = dict(zip(
+                LOCATION_NAMES, village_locations.get(village_id, (None, None, None)) + (booth_number,)
+            ))
+        return HierarchySnapshot(version, districts, dict(mandals), dict(villages), dict(booths), booth_locations)
+
+hierarchy_cache = HierarchyCache()
@@ -1,7 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
-from app import models, schemas
+from collections import defaultdict
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from app import models, schemas, search
+from app.cache import bump_hierarchy_version
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK_SIZE = 500
+
+# Dialects with INSERT ... ON CONFLICT; other backends use select-then-write
+ON_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
 # District CRUD operations
 def get_district(db: Session, district_id: int):
@@ -16,6 +25,8 @@ def get_districts(db: Session, skip: int = 0, limit: int = 100):
 def create_district(db: Session, district: schemas.DistrictCreate):
     db_district = models.District(**district.dict())
     db.add(db_district)
+    add_to_rollups(db, [("state", 0)], districts=1)
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(db_district)
     return db_district
@@ -35,6 +46,8 @@ def get_mandal_by_name_and_district(db: Session, name: str, district_id: int):
 def create_mandal(db: Session, mandal: schemas.MandalCreate):
     db_mandal = models.Mandal(**mandal.dict())
     db.add(db_mandal)
+    add_to_rollups(db, get_rollup_path(db, district_id=mandal.district_id), mandals=1)
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(db_mandal)
     return db_mandal
@@ -54,10 +67,76 @@ def get_village_by_name_and_mandal(db: Session, name: str, mandal_id: int):
 def create_village(db: Session, village: schemas.VillageCreate):
     db_village = models.Village(**village.dict())
     db.add(db_village)
+    add_to_rollups(db, get_rollup_path(db, mandal_id=village.mandal_id), villages=1)
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(db_village)
     return db_village
 
+# Bulk hierarchy helpers (no commit - the caller owns the transaction)
+def get_district_id_map(db: Session) -> Dict[str, int]:
+    """Map district name -> id for every district"""
+    return {name: id for id, name in db.query(models.District.id, models.District.name)}
+
+def get_mandal_id_map(db: Session, district_ids: Optional[Iterable[int]] = None) -> Dict[Tuple[int, str], int]:
+    """Map (district_id, mandal name) -> id for every mandal, or those of some districts"""
+    query = db.query(models.Mandal.id, models.Mandal.district_id, models.Mandal.name)
+    if district_ids is not None:
+        query = query.filter(models.Mandal.district_id.in_(list(district_ids)))
+    return {(district_id, name): id for id, district_id, name in query}
+
+def get_village_id_map(db: Session, mandal_ids: Optional[Iterable[int]] = None) -> Dict[Tuple[int, str], int]:
+    """Map (mandal_id, village name) -> id for every village, or those of some mandals"""
+    query = db.query(models.Village.id, models.Village.mandal_id, models.Village.name)
+    if mandal_ids is not None:
+        query = query.filter(models.Village.mandal_id.in_(list(mandal_ids)))
+    return {(mandal_id, name): id for id, mandal_id, name in query}
+
+def get_village_name_index(db: Session) -> Dict[Tuple[str, str, str], Tuple[int, int, int]]:
+    """Map (district, mandal, village name) -> (village_id, mandal_id, district_id) for every village"""
+    rows = db.query(
+        models.District.name, models.Mandal.name, models.Village.name,
+        models.Village.id, models.Mandal.id, models.District.id
+    ).join(models.Mandal, models.Mandal.district_id == models.District.id).join(
+        models.Village, models.Village.mandal_id == models.Mandal.id
+    )
+    return {
+        (district, mandal, village): (village_id, mandal_id, district_id)
+        for district, mandal, village, village_id, mandal_id, district_id in rows
+    }
+
+def get_booth_keys(db: Session) -> Set[Tuple[int, str]]:
+    """(village_id, booth_number) of every booth"""
+    return set(db.query(models.Booth.village_id, models.Booth.booth_number).tuples())
+
+def bulk_insert(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    """Insert many rows of a model with a single executemany"""
+    if rows:
+        db.execute(insert(model), rows)
+    return len(rows)
+
+def on_conflict_insert(db: Session, model):
+    """The dialect's INSERT supporting ON CONFLICT clauses, or None if it has none"""
+    dialect = db.get_bind().dialect
+    upsert = ON_CONFLICT_INSERTS.get(dialect.name)
+    # SQLite gained ON CONFLICT DO UPDATE in 3.24 and RETURNING in 3.35
+    if upsert is None or not dialect.insert_executemany_returning:
+        return None
+    return upsert(model)
+
+def bulk_insert_ignoring_conflicts(db: Session, model, rows: List[Dict[str, Any]], conflict_columns: List[str]) -> int:
+    """
+    Insert many rows, skipping rows that clash on the unique conflict_columns
+    Returns the number of rows actually inserted
+    """
+    if not rows:
+        return 0
+    upsert = on_conflict_insert(db, model)
+    if upsert is None:
+        return bulk_insert(db, model, rows)
+    stmt = upsert.on_conflict_do_nothing(index_elements=conflict_columns).returning(model.id)
+    return len(db.execute(stmt, rows).all())
+
 # Booth CRUD operations
 def get_booth(db: Session, booth_id: int):
     return db.query(models.Booth).filter(models.Booth.id == booth_id).first()
@@ -65,6 +144,20 @@ def get_booth(db: Session, booth_id: int):
 def get_booths_by_village(db: Session, village_id: int):
     return db.query(models.Booth).filter(models.Booth.village_id == village_id).all()
 
+def get_booth_id_map(db: Session, village_ids: List[int]) -> Dict[Tuple[int, str], int]:
+    """Map (village_id, booth_number) -> id for the booths of the given villages"""
+    booth_ids = {}
+    unique_ids = list(dict.fromkeys(village_ids))
+    for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+        chunk = unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+        booth_ids.update(
+            ((village_id, booth_number), id)
+            for id, village_id, booth_number in db.query(
+                models.Booth.id, models.Booth.village_id, models.Booth.booth_number
+            ).filter(models.Booth.village_id.in_(chunk))
+        )
+    return booth_ids
+
 def get_booth_by_number_and_village(db: Session, booth_number: str, village_id: int):
     return db.query(models.Booth).filter(
         and_(models.Booth.booth_number == booth_number, models.Booth.village_id == village_id)
@@ -73,6 +166,8 @@ def get_booth_by_number_and_village(db: Session, booth_number: str, village_id:
 def create_booth(db: Session, booth: schemas.BoothCreate):
     db_booth = models.Booth(**booth.dict())
     db.add(db_booth)
+    add_to_rollups(db, get_rollup_path(db, village_id=booth.village_id), booths=1)
+    bump_hierarchy_version(db)
     db.commit()
     db.refresh(db_booth)
     return db_booth
@@ -92,6 +187,7 @@ def get_house_by_number_and_booth(db: Session, house_number: str, booth_id: int)
 def create_house(db: Session, house: schemas.HouseCreate):
     db_house = models.House(**house.dict())
     db.add(db_house)
+    add_to_rollups(db, get_rollup_path(db, booth_id=house.booth_id), houses=1)
     db.commit()
     db.refresh(db_house)
     return db_house
@@ -103,6 +199,49 @@ def get_or_create_house(db: Session, house_number: str, booth_id: int):
         house = create_house(db, house_data)
     return house
 
+def get_house_id_map(db: Session, booth_id: int) -> Dict[str, int]:
+    """Map house number -> id for every house in a booth"""
+    return {
+        house_number: id
+        for id, house_number in db.query(models.House.id, models.House.house_number).filter(
+            models.House.booth_id == booth_id
+        )
+    }
+
+def upsert_houses(db: Session, booth_id: int, house_numbers: List[str]) -> Tuple[Dict[str, int], int]:
+    """
+    Create any missing houses of a booth in one batch (no commit)
+    Returns (house number -> id for the whole booth, number of houses created)
+    """
+    house_ids = get_house_id_map(db, booth_id)
+    missing = [number for number in dict.fromkeys(house_numbers) if number not in house_ids]
+    created = 0
+    if missing:
+        # Houses added by a concurrent upload of the same booth are skipped
+        created = bulk_insert_ignoring_conflicts(db, models.House, [
+            {'house_number': number, 'booth_id': booth_id} for number in missing
+        ], ['booth_id', 'house_number'])
+        house_ids = get_house_id_map(db, booth_id)
+    return house_ids, created
+
+def delete_empty_houses(db: Session, house_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Delete those of the given houses that have no voters left (no commit)
+    Returns booth_id -> number of houses deleted
+    """
+    deleted = defaultdict(int)
+    unique_ids = list(dict.fromkeys(house_ids))
+    for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+        empty = db.query(models.House.id, models.House.booth_id).filter(
+            models.House.id.in_(unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE]),
+            ~select(models.Voter.id).where(models.Voter.house_id == models.House.id).exists()
+        ).all()
+        if empty:
+            db.query(models.House).filter(models.House.id.in_([id for id, _ in empty])).delete(synchronize_session=False)
+        for _, booth_id in empty:
+            deleted[booth_id] += 1
+    return dict(deleted)
+
 # Voter CRUD operations
 def get_voter(db: Session, voter_id: int):
     return db.query(models.Voter).filter(models.Voter.id == voter_id).first()
@@ -110,25 +249,136 @@ def get_voter(db: Session, voter_id: int):
 def get_voter_by_voter_id(db: Session, voter_id: str):
     return db.query(models.Voter).filter(models.Voter.voter_id == voter_id).first()
 
+def get_existing_voter_ids(db: Session, voter_ids: List[str]) -> set:
+    """Return the subset of voter_ids already in the database"""
+    existing = set()
+    unique_ids = list(dict.fromkeys(voter_ids))
+    for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+        chunk = unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+        existing.update(
+            row[0] for row in db.query(models.Voter.voter_id).filter(models.Voter.voter_id.in_(chunk))
+        )
+    return existing
+
+# Columns a roll revision compares voters on
+VOTER_RECORD_COLUMNS = (
+    models.Voter.id, models.Voter.voter_id, models.Voter.name, models.Voter.age,
+    models.Voter.gender, models.Voter.house_id, models.Voter.booth_id
+)
+
+def get_booth_voter_records(db: Session, booth_id: int) -> Dict[str, Any]:
+    """Map voter_id -> (id, voter_id, name, age, gender, house_id, booth_id) row for a booth's voters"""
+    rows = db.execute(select(*VOTER_RECORD_COLUMNS).where(models.Voter.booth_id == booth_id))
+    return {row.voter_id: row for row in rows}
+
+def get_voter_records(db: Session, voter_ids: List[str]) -> Dict[str, Any]:
+    """The same rows as get_booth_voter_records for the given voter_ids, wherever they are registered"""
+    records = {}
+    unique_ids = list(dict.fromkeys(voter_ids))
+    for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+        chunk = unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+        records.update(
+            (row.voter_id, row)
+            for row in db.execute(select(*VOTER_RECORD_COLUMNS).where(models.Voter.voter_id.in_(chunk)))
+        )
+    return records
+
 def get_voters_by_house(db: Session, house_id: int):
     return db.query(models.Voter).filter(models.Voter.house_id == house_id).all()
 
 def get_voters_by_booth(db: Session, booth_id: int):
-    return db.query(models.Voter).join(models.House).filter(models.House.booth_id == booth_id).all()
+    return db.query(models.Voter).filter(models.Voter.booth_id == booth_id).all()
+
+def filter_voter_search(
+    query,
+    bind,
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    village_id: Optional[int] = None,
+    booth_id: Optional[int] = None,
+    house_number: Optional[str] = None,
+    voter_id: Optional[str] = None,
+    name: Optional[str] = None,
+    use_fts: bool = True
+):
+    """
+    Apply the voter search filters to a Query or select() of Voter
+    Text filters use the full-text index when the bind's database has one
+    """
+    query = query.filter(*search.voter_text_criteria(
+        bind,
+        {"voter_id": voter_id, "name": name, "house_number": house_number},
+        use_fts=use_fts
+    ))
+    
+    # Voters carry their hierarchy ids, so each level is one indexed filter
+    if booth_id:
+        query = query.filter(models.Voter.booth_id == booth_id)
+    elif village_id:
+        query = query.filter(models.Voter.village_id == village_id)
+    elif mandal_id:
+        query = query.filter(models.Voter.mandal_id == mandal_id)
+    elif district_id:
+        query = query.filter(models.Voter.district_id == district_id)
+    
+    return query
+
+def search_voters_query(
+    db: Session,
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    village_id: Optional[int] = None,
+    booth_id: Optional[int] = None,
+    house_number: Optional[str] = None,
+    voter_id: Optional[str] = None,
+    name: Optional[str] = None,
+    use_fts: bool = True
+):
+    """Voter query for the search filters; text filters use the full-text index when available"""
+    return filter_voter_search(
+        db.query(models.Voter), db.get_bind(),
+        district_id=district_id, mandal_id=mandal_id, village_id=village_id, booth_id=booth_id,
+        house_number=house_number, voter_id=voter_id, name=name, use_fts=use_fts
+    )
+
+def capped_count_statement(statement, cap: int):
+    """COUNT of a voter select(), stopping at cap"""
+    return select(func.count()).select_from(
+        statement.with_only_columns(models.Voter.id).limit(cap).subquery()
+    )
+
+def count_capped(query, cap: int) -> int:
+    """Count the rows of a query, stopping at cap"""
+    return query.session.execute(capped_count_statement(query.statement, cap)).scalar()
 
 def create_voter(db: Session, voter: schemas.VoterCreate):
-    db_voter = models.Voter(**voter.dict())
+    path = get_rollup_path(db, booth_id=get_house(db, voter.house_id).booth_id)
+    # The path's levels below the state are the voter's hierarchy ids
+    db_voter = models.Voter(**voter.dict(), **{f"{level}_id": node_id for level, node_id in path[1:]})
     db.add(db_voter)
+    add_to_rollups(db, path, voters=1)
     db.commit()
     db.refresh(db_voter)
     return db_voter
 
-def bulk_create_voters(db: Session, voters: List[schemas.VoterCreate]):
-    """Bulk insert voters for better performance"""
-    db_voters = [models.Voter(**voter.dict()) for voter in voters]
-    db.add_all(db_voters)
-    db.commit()
-    return len(db_voters)
+def bulk_create_voters(db: Session, voters: List[Dict[str, Any]]) -> int:
+    """
+    Bulk insert voter rows with a single executemany (no commit)
+    Voter IDs inserted concurrently by another upload are skipped, not fatal
+    """
+    return bulk_insert_ignoring_conflicts(db, models.Voter, voters, ["voter_id"])
+
+def bulk_update_voters(db: Session, voters: List[Dict[str, Any]]):
+    """Update voters by primary key with executemany (no commit); every row needs its 'id'"""
+    if voters:
+        db.execute(update(models.Voter), voters)
+
+def bulk_delete_voters(db: Session, ids: List[int]):
+    """Delete voters by primary key (no commit)"""
+    for start in range(0, len(ids), IN_CLAUSE_CHUNK_SIZE):
+        db.query(models.Voter).filter(
+            models.Voter.id.in_(ids[start:start + IN_CLAUSE_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
 
 # Upload Log CRUD operations
 def create_upload_log(db: Session, upload_log: schemas.UploadLogCreate):
@@ -138,44 +388,419 @@ def create_upload_log(db: Session, upload_log: schemas.UploadLogCreate):
     db.refresh(db_upload_log)
     return db_upload_log
 
-def update_upload_log(db: Session, upload_log_id: int, total_voters: int, total_houses: int, status: str, error_message: str = None):
+def update_upload_log(
+    db: Session,
+    upload_log_id: int,
+    total_voters: int,
+    total_houses: int,
+    status: str,
+    error_message: str = None,
+    changeset: Optional[Dict[str, int]] = None,
+    stage_timings: Optional[Dict[str, float]] = None,
+    page_count: Optional[int] = None,
+    line_count: Optional[int] = None,
+    parsed_voter_count: Optional[int] = None
+):
     db_upload_log = db.query(models.UploadLog).filter(models.UploadLog.id == upload_log_id).first()
     if db_upload_log:
         db_upload_log.total_voters = total_voters
         db_upload_log.total_houses = total_houses
         db_upload_log.status = status
         db_upload_log.error_message = error_message
+        db_upload_log.changeset = changeset
+        db_upload_log.stage_timings = stage_timings
+        db_upload_log.page_count = page_count
+        db_upload_log.line_count = line_count
+        db_upload_log.parsed_voter_count = parsed_voter_count
+        db.commit()
+        db.refresh(db_upload_log)
+    return db_upload_log
+
+def update_upload_log_status(db: Session, upload_log_id: int, status: str):
+    db_upload_log = get_upload_log(db, upload_log_id)
+    if db_upload_log:
+        db_upload_log.status = status
         db.commit()
         db.refresh(db_upload_log)
     return db_upload_log
 
+def get_upload_log(db: Session, upload_log_id: int):
+    return db.query(models.UploadLog).filter(models.UploadLog.id == upload_log_id).first()
+
+def get_unfinished_upload_logs(db: Session):
+    """Upload jobs that are queued or processing, run by a recorded server process"""
+    return db.query(models.UploadLog).filter(
+        models.UploadLog.worker.isnot(None),
+        or_(models.UploadLog.status == "queued", models.UploadLog.status.like("processing%"))
+    ).all()
+
 def get_upload_logs(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.UploadLog).offset(skip).limit(limit).all()
+    return db.query(models.UploadLog).order_by(models.UploadLog.id.desc()).offset(skip).limit(limit).all()
+
+def set_upload_log_content_hash(db: Session, upload_log_id: int, content_hash: str):
+    db.query(models.UploadLog).filter(models.UploadLog.id == upload_log_id).update(
+        {models.UploadLog.content_hash: content_hash}, synchronize_session=False
+    )
+    db.commit()
+
+def get_last_completed_upload(db: Session, booth_id: int):
+    """The booth's most recent upload whose voters were loaded"""
+    return db.query(models.UploadLog).filter(
+        models.UploadLog.booth_id == booth_id,
+        models.UploadLog.status == "completed"
+    ).order_by(models.UploadLog.id.desc()).first()
+
+# Parsed roll CRUD operations
+def get_parsed_roll(
+    db: Session, content_hash: str, extract_mode: str, parser_version: int
+) -> Optional[List[Dict[str, Any]]]:
+    """The cached voter records of a PDF, if these parsers parsed it before"""
+    return db.query(models.ParsedRoll.voters).filter(
+        models.ParsedRoll.content_hash == content_hash,
+        models.ParsedRoll.extract_mode == extract_mode,
+        models.ParsedRoll.parser_version == parser_version
+    ).scalar()
+
+def save_parsed_roll(
+    db: Session, content_hash: str, extract_mode: str, parser_version: int, voters: List[Dict[str, Any]]
+):
+    """
+    Cache the voter records of a PDF (a concurrent upload of the same file may
+    already have), replacing what other parser versions made of it
+    """
+    db.query(models.ParsedRoll).filter(
+        models.ParsedRoll.content_hash == content_hash,
+        models.ParsedRoll.extract_mode == extract_mode,
+        models.ParsedRoll.parser_version != parser_version
+    ).delete(synchronize_session=False)
+    bulk_insert_ignoring_conflicts(db, models.ParsedRoll, [
+        {'content_hash': content_hash, 'extract_mode': extract_mode, 'parser_version': parser_version, 'voters': voters}
+    ], ['content_hash', 'extract_mode', 'parser_version'])
+    db.commit()
+
+# Upload Batch CRUD operations
+def create_upload_batch(db: Session, upload_batch: schemas.UploadBatchCreate):
+    db_upload_batch = models.UploadBatch(**upload_batch.dict())
+    db.add(db_upload_batch)
+    db.commit()
+    db.refresh(db_upload_batch)
+    return db_upload_batch
+
+def get_upload_batch(db: Session, upload_batch_id: int):
+    return db.query(models.UploadBatch).filter(models.UploadBatch.id == upload_batch_id).first()
+
+def record_upload_batch_result(db: Session, upload_batch_id: int, success: bool, total_voters: int = 0, total_houses: int = 0):
+    """Count one finished file of a batch and close the batch after the last one"""
+    batch = models.UploadBatch
+    # Increment in SQL - files of the same batch finish on different threads
+    db.query(batch).filter(batch.id == upload_batch_id).update({
+        batch.files_completed: batch.files_completed + (1 if success else 0),
+        batch.files_failed: batch.files_failed + (0 if success else 1),
+        batch.total_voters: batch.total_voters + total_voters,
+        batch.total_houses: batch.total_houses + total_houses
+    }, synchronize_session=False)
+    db.commit()
+    
+    db_upload_batch = get_upload_batch(db, upload_batch_id)
+    if db_upload_batch and db_upload_batch.files_completed + db_upload_batch.files_failed >= db_upload_batch.total_files:
+        if not db_upload_batch.files_failed and not db_upload_batch.files_skipped:
+            db_upload_batch.status = "completed"
+        elif db_upload_batch.files_completed:
+            db_upload_batch.status = "completed_with_errors"
+        else:
+            db_upload_batch.status = "failed"
+        db.commit()
+    return db_upload_batch
 
 # Statistics functions
-def get_booth_summary(db: Session, booth_id: int):
-    """Get summary of voters grouped by house for a booth"""
+def booth_house_counts_statement(booth_id: int):
+    """(house id, house number, voter count) of every house of a booth with voters"""
+    return select(
+        models.House.id, models.House.house_number, func.count(models.Voter.id)
+    ).join(models.Voter).where(
+        models.House.booth_id == booth_id
+    ).group_by(models.House.id).order_by(models.House.id)
+
+def booth_voters_statement(booth_id: int, house_ids: Optional[List[int]] = None):
+    """Voters of a booth (or of the given houses of it) in house order"""
+    statement = select(models.Voter).where(models.Voter.booth_id == booth_id)
+    if house_ids is not None:
+        statement = statement.where(models.Voter.house_id.in_(house_ids))
+    return statement.order_by(models.Voter.house_id, models.Voter.id)
+
+def page_booth_houses(house_counts: List, skip: int = 0, limit: Optional[int] = None) -> Tuple[List, Optional[List[int]]]:
+    """
+    The skip/limit page of a booth's house counts, and the house ids whose
+    voters to load (None when the page covers the whole booth)
+    """
+    page = house_counts[skip:skip + limit if limit is not None else None]
+    house_ids = [house_id for house_id, _, _ in page] if len(page) < len(house_counts) else None
+    return page, house_ids
+
+def build_booth_summary(booth, house_counts: List, page: List, voters: Iterable) -> Dict[str, Any]:
+    """Summary dict of a booth from its house counts and the page's voters"""
+    voters_by_house = {house_id: [] for house_id, _, _ in page}
+    for voter in voters:
+        voters_by_house[voter.house_id].append(voter)
+    
+    return {
+        "booth": booth,
+        "houses": [
+            {
+                "house_number": house_number,
+                "voters": voters_by_house[house_id],
+                "total_voters": voter_count
+            }
+            for house_id, house_number, voter_count in page
+        ],
+        "total_houses": len(house_counts),
+        "total_voters": sum(voter_count for _, _, voter_count in house_counts)
+    }
+
+def get_booth_summary(db: Session, booth_id: int, houses_only: bool = False, skip: int = 0, limit: Optional[int] = None):
+    """
+    Get summary of voters grouped by house for a booth
+    
+    houses_only skips loading voter rows (each house gets an empty voters
+    list); skip/limit page through the houses. Totals always cover the booth.
+    """
     booth = get_booth(db, booth_id)
     if not booth:
         return None
     
-    houses = get_houses_by_booth(db, booth_id)
-    house_summaries = []
+    # One grouped query gives the house order and every house's voter count
+    house_counts = db.execute(booth_house_counts_statement(booth_id)).all()
+    page, house_ids = page_booth_houses(house_counts, skip, limit)
     
-    total_voters = 0
-    for house in houses:
-        voters = get_voters_by_house(db, house.id)
-        if voters:
-            house_summaries.append({
-                "house_number": house.house_number,
-                "voters": voters,
-                "total_voters": len(voters)
-            })
-            total_voters += len(voters)
+    voters = []
+    if not houses_only and page:
+        voters = db.scalars(booth_voters_statement(booth_id, house_ids))
+    return build_booth_summary(booth, house_counts, page, voters)
+
+
+def booth_voter_rows_statement(booth_id: int, after: Optional[Tuple[str, int]] = None):
+    """
+    Voter rows of a booth as plain column tuples, keyed by (house_number, id)
+    after starts the rows past a (house_number, voter id) keyset position
+    """
+    statement = select(
+        *models.Voter.__table__.columns,
+        models.House.house_number
+    ).join(models.House).where(
+        models.House.booth_id == booth_id
+    ).order_by(models.House.house_number, models.Voter.id)
+    if after:
+        house_number, voter_pk = after
+        statement = statement.where(or_(
+            models.House.house_number > house_number,
+            and_(models.House.house_number == house_number, models.Voter.id > voter_pk)
+        ))
+    return statement
+
+def get_booth_voter_rows(db: Session, booth_id: int, after: Optional[Tuple[str, int]] = None, limit: int = 500):
+    """One keyset page of a booth's voter rows, starting after (house_number, voter id)"""
+    return db.execute(booth_voter_rows_statement(booth_id, after).limit(limit)).all()
+
+def iter_booth_voter_rows(db: Session, booth_id: int, batch_size: int = 1000):
+    """Stream all voter rows of a booth without materializing them"""
+    return db.execute(booth_voter_rows_statement(booth_id).execution_options(yield_per=batch_size))
+
+# Hierarchy levels a voter carries the id of
+HIERARCHY_LEVEL_MODELS = {
+    "district": models.District,
+    "mandal": models.Mandal,
+    "village": models.Village,
+    "booth": models.Booth,
+}
+
+def voter_export_statement(level: str, node_id: int):
+    """
+    (voter_id, name, age, gender, house_number, booth_id) of every voter below
+    a hierarchy node, in id order - the ix_voters_<level>_id_id index order
+    """
+    return select(
+        models.Voter.voter_id, models.Voter.name, models.Voter.age, models.Voter.gender,
+        models.House.house_number, models.Voter.booth_id
+    ).join(models.House, models.House.id == models.Voter.house_id).where(
+        getattr(models.Voter, f"{level}_id") == node_id
+    ).order_by(models.Voter.id)
+
+def iter_voter_export_rows(db: Session, level: str, node_id: int, batch_size: int = 5000):
+    """Stream the export rows of a hierarchy node through a server-side cursor"""
+    return db.execute(voter_export_statement(level, node_id).execution_options(yield_per=batch_size))
+
+def group_voter_rows_by_house(rows: Iterable, location: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Group consecutive voter rows of the same house into summary dicts
+    location adds the same fields (the booth's location names) to every voter
+    """
+    house = None
+    for row in rows:
+        voter = dict(row._mapping, **(location or {}))
+        house_number = voter["house_number"]
+        if house is None or house["house_number"] != house_number:
+            if house is not None:
+                yield house
+            house = {"house_number": house_number, "voters": [], "total_voters": 0}
+        house["voters"].append(voter)
+        house["total_voters"] += 1
+    if house is not None:
+        yield house
+
+
+# Hierarchy rollup counters (no commit - they change in the writer's transaction)
+ROLLUP_COUNTS = ["districts", "mandals", "villages", "booths", "houses", "voters"]
+
+def get_rollup_path(
+    db: Session,
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    village_id: Optional[int] = None,
+    booth_id: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    """Rollup keys from the state down to the most specific node given"""
+    if booth_id is not None:
+        village_id, mandal_id, district_id = db.query(
+            models.Booth.village_id, models.Village.mandal_id, models.Mandal.district_id
+        ).join(models.Village, models.Booth.village_id == models.Village.id).join(
+            models.Mandal, models.Village.mandal_id == models.Mandal.id
+        ).filter(models.Booth.id == booth_id).one()
+    elif village_id is not None:
+        mandal_id, district_id = db.query(models.Village.mandal_id, models.Mandal.district_id).join(
+            models.Mandal, models.Village.mandal_id == models.Mandal.id
+        ).filter(models.Village.id == village_id).one()
+    elif mandal_id is not None:
+        district_id = db.query(models.Mandal.district_id).filter(models.Mandal.id == mandal_id).scalar()
     
-    return {
-        "booth": booth,
-        "houses": house_summaries,
-        "total_houses": len(house_summaries),
-        "total_voters": total_voters
-    }
\ No newline at end of file
+    path = [("state", 0)]
+    for level, node_id in [("district", district_id), ("mandal", mandal_id), ("village", village_id), ("booth", booth_id)]:
+        if node_id is None:
+            break
+        path.append((level, node_id))
+    return path
+
+def apply_rollup_deltas(db: Session, deltas: Dict[Tuple[str, int], Dict[str, int]]):
+    """
+    Add count deltas to rollup rows, creating missing rows
+    One upsert where the dialect has ON CONFLICT, else insert-missing + update
+    """
+    deltas = {key: counts for key, counts in deltas.items() if any(counts.values())}
+    if not deltas:
+        return
+    
+    rollups = models.HierarchyRollup.__table__
+    upsert = on_conflict_insert(db, models.HierarchyRollup)
+    if upsert is not None:
+        db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=["level", "node_id"],
+                set_={count: rollups.c[count] + upsert.excluded[count] for count in ROLLUP_COUNTS}
+            ),
+            [
+                {"level": level, "node_id": node_id, **{count: counts.get(count, 0) for count in ROLLUP_COUNTS}}
+                for (level, node_id), counts in deltas.items()
+            ]
+        )
+        return
+    
+    node_ids_by_level = defaultdict(list)
+    for level, node_id in deltas:
+        node_ids_by_level[level].append(node_id)
+    existing = set()
+    for level, node_ids in node_ids_by_level.items():
+        for start in range(0, len(node_ids), IN_CLAUSE_CHUNK_SIZE):
+            existing.update(db.execute(
+                rollups.select().with_only_columns(rollups.c.level, rollups.c.node_id).where(
+                    rollups.c.level == level,
+                    rollups.c.node_id.in_(node_ids[start:start + IN_CLAUSE_CHUNK_SIZE])
+                )
+            ).tuples())
+    
+    bulk_insert(db, models.HierarchyRollup, [
+        {"level": level, "node_id": node_id, **{count: 0 for count in ROLLUP_COUNTS}}
+        for level, node_id in deltas if (level, node_id) not in existing
+    ])
+    db.execute(
+        update(rollups).where(
+            rollups.c.level == bindparam("b_level"),
+            rollups.c.node_id == bindparam("b_node_id")
+        ).values({count: rollups.c[count] + bindparam(f"d_{count}") for count in ROLLUP_COUNTS}),
+        [
+            {"b_level": level, "b_node_id": node_id, **{f"d_{count}": counts.get(count, 0) for count in ROLLUP_COUNTS}}
+            for (level, node_id), counts in deltas.items()
+        ]
+    )
+
+def add_to_rollups(db: Session, path: List[Tuple[str, int]], **counts: int):
+    """Add the same counts to every node of a rollup path"""
+    apply_rollup_deltas(db, {key: counts for key in path})
+
+def rollups_statements(level: str, node_ids: List[int]) -> Iterator:
+    """Rollup rows of the given nodes of a level, in IN-clause sized chunks"""
+    for start in range(0, len(node_ids), IN_CLAUSE_CHUNK_SIZE):
+        yield select(models.HierarchyRollup).where(
+            models.HierarchyRollup.level == level,
+            models.HierarchyRollup.node_id.in_(node_ids[start:start + IN_CLAUSE_CHUNK_SIZE])
+        )
+
+def rollup_counts(node_ids: List[int], rows: Iterable) -> Dict[int, Dict[str, int]]:
+    """Map node_id -> counts from rollup rows (missing nodes count zero)"""
+    rollups = {node_id: dict.fromkeys(ROLLUP_COUNTS, 0) for node_id in node_ids}
+    for row in rows:
+        rollups[row.node_id] = {count: getattr(row, count) for count in ROLLUP_COUNTS}
+    return rollups
+
+def get_rollups(db: Session, level: str, node_ids: List[int]) -> Dict[int, Dict[str, int]]:
+    """Map node_id -> counts for the given nodes of a level (missing nodes count zero)"""
+    rows = [row for statement in rollups_statements(level, node_ids) for row in db.scalars(statement)]
+    return rollup_counts(node_ids, rows)
+
+def get_rollup(db: Session, level: str, node_id: int = 0) -> Dict[str, int]:
+    return get_rollups(db, level, [node_id])[node_id]
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute every rollup row from the base tables (no commit)"""
+    mandal_district = dict(db.query(models.Mandal.id, models.Mandal.district_id))
+    village_mandal = dict(db.query(models.Village.id, models.Village.mandal_id))
+    booth_village = dict(db.query(models.Booth.id, models.Booth.village_id))
+    
+    def district_path(district_id):
+        return [("state", 0), ("district", district_id)]
+    
+    def mandal_path(mandal_id):
+        return district_path(mandal_district[mandal_id]) + [("mandal", mandal_id)]
+    
+    def village_path(village_id):
+        return mandal_path(village_mandal[village_id]) + [("village", village_id)]
+    
+    def booth_path(booth_id):
+        return village_path(booth_village[booth_id]) + [("booth", booth_id)]
+    
+    rollups = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTS, 0))
+    
+    def add(path, count, amount=1):
+        for key in path:
+            rollups[key][count] += amount
+    
+    rollups[("state", 0)]
+    for (district_id,) in db.query(models.District.id):
+        add([("state", 0)], "districts")
+        rollups[("district", district_id)]
+    for mandal_id, district_id in mandal_district.items():
+        add(district_path(district_id), "mandals")
+        rollups[("mandal", mandal_id)]
+    for village_id, mandal_id in village_mandal.items():
+        add(mandal_path(mandal_id), "villages")
+        rollups[("village", village_id)]
+    for booth_id, village_id in booth_village.items():
+        add(village_path(village_id), "booths")
+        rollups[("booth", booth_id)]
+    for booth_id, houses in db.query(models.House.booth_id, func.count(models.House.id)).group_by(models.House.booth_id):
+        add(booth_path(booth_id), "houses", houses)
+    for booth_id, voters in db.query(models.House.booth_id, func.count(models.Voter.id)).join(models.Voter).group_by(models.House.booth_id):
+        add(booth_path(booth_id), "voters", voters)
+    
+    db.query(models.HierarchyRollup).delete()
+    return bulk_insert(db, models.HierarchyRollup, [
+        {"level": level, "node_id": node_id, **counts} for (level, node_id), counts in rollups.items()
+    ])
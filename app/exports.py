@@ -0,0 +1,130 @@
+"""
+Voter exports
+Rows are read through a server-side cursor and written out one batch at a
+time, so memory stays flat however many voters the exported scope has
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import Callable, Iterator, List, Tuple
+from sqlalchemy.orm import Session
+from app import crud
+from app.cache import HierarchySnapshot
+
+# Voter rows fetched from the cursor and written per batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+# Bytes per chunk when sending a finished XLSX or Parquet file
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Rows per worksheet, under Excel's limit of 1,048,576 (header included)
+XLSX_MAX_ROWS = 1000000
+
+EXPORT_COLUMNS = [
+    "voter_id", "name", "age", "gender", "house_number",
+    "booth_number", "village_name", "mandal_name", "district_name"
+]
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+def iter_export_batches(db: Session, level: str, node_id: int, snapshot: HierarchySnapshot) -> Iterator[List[Tuple]]:
+    """The voters of a hierarchy node as lists of row tuples in EXPORT_COLUMNS order"""
+    rows = crud.iter_voter_export_rows(db, level, node_id, EXPORT_BATCH_SIZE)
+    locations = {}
+    for partition in rows.partitions():
+        batch = []
+        for voter_id, name, age, gender, house_number, booth_id in partition:
+            location = locations.get(booth_id)
+            if location is None:
+                names = snapshot.location_names(booth_id)
+                location = locations[booth_id] = (
+                    names["booth_number"], names["village_name"], names["mandal_name"], names["district_name"]
+                )
+            batch.append((voter_id, name, age, gender, house_number) + location)
+        yield batch
+
+def csv_chunks(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def ndjson_chunks(batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in batch
+        ).encode("utf-8")
+
+def write_xlsx(batches: Iterator[List[Tuple]], path: str):
+    """Write-only workbook: openpyxl streams the rows to disk as they are appended"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    for batch in batches:
+        for row in batch:
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet("Voters" if sheet is None else f"Voters {len(workbook.sheetnames) + 1}")
+                sheet.append(EXPORT_COLUMNS)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Voters").append(EXPORT_COLUMNS)
+    workbook.save(path)
+
+def write_parquet(batches: Iterator[List[Tuple]], path: str):
+    """One Parquet row group per batch (needs pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, pa.int32() if column == "age" else pa.string()) for column in EXPORT_COLUMNS
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+
+def file_chunks(write: Callable[[Iterator[List[Tuple]], str], None], batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """Write a whole file with write(batches, path) to a temporary file, then send it in chunks"""
+    fd, path = tempfile.mkstemp(suffix=".export")
+    os.close(fd)
+    try:
+        write(batches, path)
+        with open(path, "rb") as exported:
+            for chunk in iter(lambda: exported.read(EXPORT_CHUNK_SIZE), b""):
+                yield chunk
+    finally:
+        os.remove(path)
+
+def export_chunks(export_format: str, batches: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """The bytes of an export in one of EXPORT_FORMATS"""
+    if export_format == "csv":
+        return csv_chunks(batches)
+    if export_format == "ndjson":
+        return ndjson_chunks(batches)
+    if export_format == "xlsx":
+        return file_chunks(write_xlsx, batches)
+    if export_format == "parquet":
+        return file_chunks(write_parquet, batches)
+    raise ValueError(f"Unknown export format {export_format!r}")
@@ -0,0 +1,158 @@
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app import crud, schemas
+from app.database import SessionLocal
+from app.services import PDFFile, PDFProcessingService
+from app.uploads import process_alive, sweep_spool_dir
+
+logger = logging.getLogger(__name__)
+
+# Voter PDFs processed at the same time; further uploads wait in the queue
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+
+_upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+# Recorded on the upload logs of queued jobs, so a restarted server can tell
+# which unfinished jobs died with their process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# (filename, load, release) - load() returns the PDF's path or bytes and runs
+# on the worker; release() is called once the job is done with the source
+PDFSource = Tuple[str, Callable[[], PDFFile], Optional[Callable[[], None]]]
+
+def spooled_pdf_source(filename: str, pdf_path: str) -> PDFSource:
+    """Source for a PDF spooled to disk; the file is removed once the job is done"""
+    return filename, lambda: pdf_path, partial(os.remove, pdf_path)
+
+def enqueue_voter_upload(db: Session, booth_id: int, filename: str, pdf_path: str, revision: bool = False):
+    """
+    Queue a spooled voter PDF for background processing
+    The job removes the file once it is done; returns the UploadLog that tracks it
+    revision=True applies the PDF as a revised roll of the booth
+    """
+    try:
+        return _enqueue(db, booth_id, spooled_pdf_source(filename, pdf_path), revision=revision)
+    except Exception:
+        os.remove(pdf_path)
+        raise
+
+def enqueue_voter_batch(
+    db: Session,
+    batch_name: str,
+    sources: List[PDFSource],
+    booths_by_file: Dict[str, int],
+    revision: bool = False
+) -> Dict[str, Any]:
+    """
+    Queue every PDF of a batch whose filename the manifest maps to a booth
+    Files without a manifest entry are skipped and counted on the batch
+    """
+    queued = [source for source in sources if source[0] in booths_by_file]
+    skipped = [source for source in sources if source[0] not in booths_by_file]
+    for _, _, release in skipped:
+        if release:
+            release()
+
+    upload_batch = crud.create_upload_batch(db, schemas.UploadBatchCreate(
+        filename=batch_name,
+        total_files=len(queued),
+        files_skipped=len(skipped),
+        status="processing" if queued else "failed"
+    ))
+    upload_log_ids = [
+        _enqueue(db, booths_by_file[source[0]], source, upload_batch.id, revision).id
+        for source in queued
+    ]
+
+    return {
+        'upload_batch_id': upload_batch.id,
+        'upload_log_ids': upload_log_ids,
+        'skipped_files': [filename for filename, _, _ in skipped]
+    }
+
+def _enqueue(
+    db: Session,
+    booth_id: int,
+    source: PDFSource,
+    upload_batch_id: Optional[int] = None,
+    revision: bool = False
+):
+    upload_log = crud.create_upload_log(db, schemas.UploadLogCreate(
+        filename=source[0],
+        booth_id=booth_id,
+        status="queued",
+        upload_batch_id=upload_batch_id,
+        worker=WORKER_ID
+    ))
+    _upload_executor.submit(_run_voter_upload, upload_log.id, booth_id, source, upload_batch_id, revision)
+    return upload_log
+
+def _run_voter_upload(
+    upload_log_id: int,
+    booth_id: int,
+    source: PDFSource,
+    upload_batch_id: Optional[int],
+    revision: bool = False
+):
+    """Process one queued upload on a worker thread with its own session"""
+    filename, load, release = source
+    db = SessionLocal()
+    result = {'success': False}
+    try:
+        try:
+            result = PDFProcessingService.process_voter_pdf(
+                db, booth_id, filename, load(), upload_log_id=upload_log_id, revision=revision
+            )
+        except Exception as e:
+            logger.exception("Upload job %s failed", upload_log_id)
+            crud.update_upload_log(db, upload_log_id, 0, 0, "failed", str(e))
+        finally:
+            if release:
+                release()
+        
+        if upload_batch_id is not None:
+            stats = result.get('stats') or {}
+            crud.record_upload_batch_result(
+                db, upload_batch_id, result['success'],
+                stats.get('total_voters', 0), stats.get('total_houses', 0)
+            )
+    except Exception:
+        logger.exception("Recording upload job %s failed", upload_log_id)
+    finally:
+        db.close()
+
+def _worker_gone(worker: str) -> bool:
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        # Another host's jobs are left to that host
+        return False
+    # An earlier process with this pid is gone too: nothing is queued before startup
+    return int(pid) == os.getpid() or not process_alive(int(pid))
+
+def recover_interrupted_uploads(db: Session) -> int:
+    """
+    Fail the queued and processing jobs of server processes on this host that
+    are gone (restarted or killed), count them on their batches and remove
+    the uploads those processes left spooled; call on startup. Returns the
+    number of jobs failed
+    """
+    interrupted = [
+        upload_log for upload_log in crud.get_unfinished_upload_logs(db)
+        if _worker_gone(upload_log.worker)
+    ]
+    for upload_log in interrupted:
+        crud.update_upload_log(db, upload_log.id, 0, 0, "failed", "Interrupted by a server restart")
+        if upload_log.upload_batch_id is not None:
+            crud.record_upload_batch_result(db, upload_log.upload_batch_id, False)
+    removed = sweep_spool_dir()
+    if interrupted or removed:
+        logger.warning(
+            "Failed %d upload jobs interrupted by a restart, removed %d spooled uploads", len(interrupted), removed
+        )
+    return len(interrupted)
+
@@ -1,17 +1,36 @@
+import os
 from fastapi import FastAPI, Request, Depends, Form, UploadFile, File, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import uvicorn
 
-from app.database import engine, get_db
-from app import models, crud, schemas
+from app.cache import hierarchy_cache
+from app.database import SessionLocal, dispose_async_engine, engine, get_async_db, get_db
+from app import async_crud, models, crud, schemas
 from app.api import router as api_router
-from app.services import HierarchyService, PDFProcessingService
+from app.services import HierarchyService
+from app.jobs import enqueue_voter_upload, recover_interrupted_uploads
+from app.uploads import spool_pdf, spool_spreadsheet
+from app.metrics import MetricsMiddleware, instrument_engine, registry as metrics_registry
+from app.migrations import init_database
+from app.search import ensure_voter_search_index
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Count and time the SQL statements of every engine, including the async
+# engine created on first use (startup work below is recorded as "background")
+instrument_engine(Engine)
+
+# Create or migrate the database tables
+init_database(engine)
+ensure_voter_search_index(engine)
+
+# Fail the upload jobs that died with an earlier server process
+with SessionLocal() as db:
+    recover_interrupted_uploads(db)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -20,6 +39,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-route latency and SQL metrics, served on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -29,22 +51,24 @@ templates = Jinja2Templates(directory="app/templates")
 # Include API routes
 app.include_router(api_router, prefix="/api", tags=["API"])
 
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request and SQL metrics in the Prometheus text format"""
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Admin Web Interface Routes
 @app.get("/", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
+async def admin_dashboard(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Admin dashboard home page"""
     # Get statistics
-    stats = {
-        "districts": db.query(models.District).count(),
-        "mandals": db.query(models.Mandal).count(),
-        "villages": db.query(models.Village).count(),
-        "booths": db.query(models.Booth).count(),
-        "houses": db.query(models.House).count(),
-        "voters": db.query(models.Voter).count(),
-    }
+    stats = await async_crud.get_rollup(db, "state")
     
     # Get recent upload logs
-    recent_uploads = crud.get_upload_logs(db, limit=5)
+    recent_uploads = await async_crud.get_upload_logs(db, limit=5)
     
     return templates.TemplateResponse(
         "dashboard.html",
@@ -64,11 +88,14 @@ async def import_hierarchy_web(
 ):
     """Web interface for importing hierarchy"""
     try:
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="File must be an Excel file")
+        if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+            raise HTTPException(status_code=400, detail="File must be an Excel or CSV file")
         
-        file_content = await file.read()
-        result = HierarchyService.import_hierarchy_from_excel(db, file_content)
+        spreadsheet_path = await run_in_threadpool(spool_spreadsheet, file.file, file.filename)
+        try:
+            result = await run_in_threadpool(HierarchyService.import_hierarchy, db, spreadsheet_path)
+        finally:
+            os.remove(spreadsheet_path)
         
         return templates.TemplateResponse(
             "hierarchy.html",
@@ -81,16 +108,16 @@ async def import_hierarchy_web(
         )
 
 @app.get("/booths", response_class=HTMLResponse)
-async def booth_management(request: Request, db: Session = Depends(get_db)):
+async def booth_management(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Booth management page"""
-    districts = crud.get_districts(db)
+    districts = (await hierarchy_cache.get_async(db)).districts
     return templates.TemplateResponse(
         "booths.html",
         {"request": request, "districts": districts}
     )
 
 @app.post("/booths/create")
-async def create_booth_web(
+def create_booth_web(
     request: Request,
     village_id: int = Form(...),
     booth_number: str = Form(...),
@@ -115,25 +142,50 @@ async def create_booth_web(
         return RedirectResponse(url=f"/booths/{booth.id}", status_code=303)
     
     except Exception as e:
-        districts = crud.get_districts(db)
+        districts = hierarchy_cache.get(db).districts
         return templates.TemplateResponse(
             "booths.html",
             {"request": request, "districts": districts, "error": str(e)}
         )
 
+@app.post("/booths/import")
+async def import_booths_web(
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """Web interface for importing booths"""
+    try:
+        if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+            raise HTTPException(status_code=400, detail="File must be an Excel or CSV file")
+        
+        spreadsheet_path = await run_in_threadpool(spool_spreadsheet, file.file, file.filename)
+        try:
+            result = await run_in_threadpool(HierarchyService.import_booths, db, spreadsheet_path)
+        finally:
+            os.remove(spreadsheet_path)
+        
+        context = {"import_success": result['success'], "import_message": result['message'], "import_stats": result['stats']}
+    except Exception as e:
+        context = {"import_success": False, "import_message": str(e), "import_stats": None}
+    
+    districts = (await run_in_threadpool(hierarchy_cache.get, db)).districts
+    return templates.TemplateResponse(
+        "booths.html",
+        {"request": request, "districts": districts, **context}
+    )
+
 @app.get("/booths/{booth_id}", response_class=HTMLResponse)
-async def booth_detail(request: Request, booth_id: int, db: Session = Depends(get_db)):
+async def booth_detail(request: Request, booth_id: int, db: AsyncSession = Depends(get_async_db)):
     """Booth detail page"""
-    booth = crud.get_booth(db, booth_id)
-    if not booth:
-        raise HTTPException(status_code=404, detail="Booth not found")
-    
     # Get booth summary
-    summary = crud.get_booth_summary(db, booth_id)
+    summary = await async_crud.get_booth_summary(db, booth_id, with_location=True)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Booth not found")
     
     return templates.TemplateResponse(
         "booth_detail.html",
-        {"request": request, "booth": booth, "summary": summary}
+        {"request": request, "booth": summary["booth"], "summary": summary}
     )
 
 @app.post("/booths/{booth_id}/upload")
@@ -141,6 +193,7 @@ async def upload_voters_web(
     request: Request,
     booth_id: int,
     file: UploadFile = File(...),
+    revision: bool = Form(False),
     db: Session = Depends(get_db)
 ):
     """Web interface for uploading voter PDFs"""
@@ -148,31 +201,34 @@ async def upload_voters_web(
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
-        booth = crud.get_booth(db, booth_id)
+        booth = await run_in_threadpool(crud.get_booth, db, booth_id)
         if not booth:
             raise HTTPException(status_code=404, detail="Booth not found")
         
-        file_content = await file.read()
-        result = PDFProcessingService.process_voter_pdf(db, booth_id, file.filename, file_content)
+        pdf_path = await run_in_threadpool(spool_pdf, file.file)
+        upload_log = await run_in_threadpool(enqueue_voter_upload, db, booth_id, file.filename, pdf_path, revision)
         
-        return RedirectResponse(url=f"/booths/{booth_id}?upload_result={result['success']}", status_code=303)
+        return RedirectResponse(
+            url=f"/booths/{booth_id}?upload_result=queued&upload_log_id={upload_log.id}",
+            status_code=303
+        )
     
     except Exception as e:
         return RedirectResponse(url=f"/booths/{booth_id}?error={str(e)}", status_code=303)
 
 @app.get("/voters", response_class=HTMLResponse)
-async def voter_search(request: Request, db: Session = Depends(get_db)):
+async def voter_search(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Voter search page"""
-    districts = crud.get_districts(db)
+    districts = (await hierarchy_cache.get_async(db)).districts
     return templates.TemplateResponse(
         "voters.html",
         {"request": request, "districts": districts}
     )
 
 @app.get("/upload-logs", response_class=HTMLResponse)
-async def upload_logs(request: Request, db: Session = Depends(get_db)):
+async def upload_logs(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Upload logs page"""
-    logs = crud.get_upload_logs(db, limit=50)
+    logs = await async_crud.get_upload_logs(db, limit=50, with_location=True)
     return templates.TemplateResponse(
         "upload_logs.html",
         {"request": request, "logs": logs}
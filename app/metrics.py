@@ -0,0 +1,249 @@
+"""
+Request and SQL metrics
+An ASGI middleware times every request and SQLAlchemy execution hooks
+count the statements it runs and the rows they change; /metrics serves the totals in the Prometheus text
+format. Statements run outside a request (upload jobs, startup) are
+recorded under the route "background".
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements and requests slower than this many milliseconds are logged
+# with a warning (0 turns the slow query / slow request log off)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+BACKGROUND_ROUTE = "background"
+
+class RequestStats:
+    """SQL work of one request, filled in by the cursor hooks"""
+
+    __slots__ = ("request_line", "statements", "sql_seconds", "rows_affected", "slow_statements")
+
+    def __init__(self, request_line: str):
+        self.request_line = request_line
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows_affected = 0
+        self.slow_statements = 0
+
+# The request being served; copied into the threadpool with the context
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, keyed by their label values"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_statements: Dict[Tuple[str, str], Histogram] = {}
+        self.statements: Dict[str, int] = defaultdict(int)
+        self.sql_seconds: Dict[str, float] = defaultdict(float)
+        self.rows_affected: Dict[str, int] = defaultdict(int)
+        self.slow_queries: Dict[str, int] = defaultdict(int)
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self.lock:
+            self.requests[(method, route, str(status))] += 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.request_statements[key] = Histogram(STATEMENT_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.request_statements[key].observe(stats.statements)
+            self._add_sql(route, stats.statements, stats.sql_seconds, stats.rows_affected, stats.slow_statements)
+
+    def record_statement(self, route: str, seconds: float, slow: bool):
+        with self.lock:
+            self._add_sql(route, 1, seconds, 0, int(slow))
+
+    def record_rows_affected(self, route: str, rows: int):
+        with self.lock:
+            self._add_sql(route, 0, 0.0, rows, 0)
+
+    def _add_sql(self, route: str, statements: int, seconds: float, rows_affected: int, slow_statements: int):
+        if statements:
+            self.statements[route] += statements
+            self.sql_seconds[route] += seconds
+        if rows_affected:
+            self.rows_affected[route] += rows_affected
+        if slow_statements:
+            self.slow_queries[route] += slow_statements
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self.lock:
+            _counter(lines, "politiq_http_requests_total", "HTTP requests by route and status", {
+                _labels(method=method, route=route, status=status): value
+                for (method, route, status), value in self.requests.items()
+            })
+            _histogram(lines, "politiq_http_request_duration_seconds", "HTTP request latency, until the last body byte", {
+                _labels(method=method, route=route): histogram for (method, route), histogram in self.latency.items()
+            })
+            _histogram(lines, "politiq_http_request_sql_statements", "SQL statements run per HTTP request", {
+                _labels(method=method, route=route): histogram
+                for (method, route), histogram in self.request_statements.items()
+            })
+            _counter(lines, "politiq_sql_statements_total", "SQL statements by route", {
+                _labels(route=route): value for route, value in self.statements.items()
+            })
+            _counter(lines, "politiq_sql_duration_seconds_total", "Time spent executing SQL statements by route", {
+                _labels(route=route): value for route, value in self.sql_seconds.items()
+            })
+            _counter(lines, "politiq_sql_rows_affected_total", "Rows inserted, updated or deleted by SQL statements by route", {
+                _labels(route=route): value for route, value in self.rows_affected.items()
+            })
+            _counter(lines, "politiq_sql_slow_statements_total", "SQL statements slower than SLOW_QUERY_MS by route", {
+                _labels(route=route): value for route, value in self.slow_queries.items()
+            })
+        return "\n".join(lines) + "\n"
+
+def _labels(**labels: str) -> str:
+    return ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+
+def _counter(lines: List[str], name: str, help_text: str, samples: Dict[str, float]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(samples.items()):
+        lines.append(f"{name}{{{labels}}} {value}")
+
+def _histogram(lines: List[str], name: str, help_text: str, histograms: Dict[str, Histogram]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+registry = MetricsRegistry()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._metrics_start
+    slow = SLOW_QUERY_MS > 0 and seconds * 1000 >= SLOW_QUERY_MS
+    stats = _current_request.get()
+    if stats is None:
+        registry.record_statement(BACKGROUND_ROUTE, seconds, slow)
+    else:
+        # Added to the route's totals when the request ends
+        stats.statements += 1
+        stats.sql_seconds += seconds
+        stats.slow_statements += slow
+    if slow:
+        logger.warning(
+            "Slow query (%.1f ms, %s): %s",
+            seconds * 1000, stats.request_line if stats else BACKGROUND_ROUTE, " ".join(statement.split())[:1000]
+        )
+
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    # Only changes are counted: drivers don't know how many rows a SELECT
+    # returns until they are fetched (SQLite reports -1). The result's
+    # rowcount, unlike the cursor's, includes every batch of a bulk
+    # INSERT ... RETURNING
+    context = result.context
+    if not (context.isinsert or context.isupdate or context.isdelete or not result.returns_rows):
+        return
+    rows = max(result.rowcount, 0)
+    if not rows:
+        return
+    stats = _current_request.get()
+    if stats is None:
+        registry.record_rows_affected(BACKGROUND_ROUTE, rows)
+    else:
+        stats.rows_affected += rows
+
+def instrument_engine(engine: Engine):
+    """
+    Count and time the statements of an engine (an async engine's
+    sync_engine), or of every engine when given the Engine class
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "after_execute", _after_execute)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording each request's latency, status and SQL work
+    A pure ASGI middleware rather than BaseHTTPMiddleware, so streamed
+    response bodies run inside the request's context and are timed to the end
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.route_paths: Optional[Dict[object, str]] = None
+
+    def _route(self, scope) -> Optional[str]:
+        # Starlette 0.27 puts the matched endpoint (or mounted app) in the
+        # scope but not the route, so map endpoints back to route paths
+        if self.route_paths is None:
+            self.route_paths = {}
+            for route in scope["app"].routes:
+                self.route_paths.setdefault(getattr(route, "endpoint", None) or getattr(route, "app", None), route.path)
+        return self.route_paths.get(scope.get("endpoint"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(f"{scope['method']} {scope['path']}")
+        token = _current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _current_request.reset(token)
+            route = self._route(scope) or "unmatched"
+            registry.record_request(scope["method"], route, status, seconds, stats)
+            if SLOW_REQUEST_MS > 0 and seconds * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request (%.1f ms): %s %s, %d SQL statements in %.1f ms",
+                    seconds * 1000, scope["method"], route, stats.statements, stats.sql_seconds * 1000
+                )
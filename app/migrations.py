@@ -0,0 +1,43 @@
+"""
+Schema migrations (Alembic revisions in alembic/versions)
+"""
+
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from app import models
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Revision matching the tables create_all built before migrations existed
+BASELINE_REVISION = "0001"
+
+def _alembic_config(connection) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    config.attributes["connection"] = connection
+    return config
+
+def init_database(engine: Engine):
+    """
+    Bring a database to the latest schema
+    Empty databases get create_all and are stamped current; databases
+    created before migrations are stamped at the baseline and upgraded
+    """
+    with engine.begin() as connection:
+        tables = set(inspect(connection).get_table_names())
+        config = _alembic_config(connection)
+        if not tables & set(models.Base.metadata.tables):
+            models.Base.metadata.create_all(bind=connection)
+            command.stamp(config, "head")
+            return
+        if "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+def upgrade_database(engine: Engine, revision: str = "head"):
+    """Apply the migrations up to a revision (e.g. to build an older schema)"""
+    with engine.begin() as connection:
+        command.upgrade(_alembic_config(connection), revision)
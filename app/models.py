@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, JSON, DDL, event, select
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -16,6 +16,7 @@ class District(Base):
 
 class Mandal(Base):
     __tablename__ = "mandals"
+    __table_args__ = (Index("uq_mandals_district_id_name", "district_id", "name", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -28,6 +29,7 @@ class Mandal(Base):
 
 class Village(Base):
     __tablename__ = "villages"
+    __table_args__ = (Index("uq_villages_mandal_id_name", "mandal_id", "name", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -40,6 +42,7 @@ class Village(Base):
 
 class Booth(Base):
     __tablename__ = "booths"
+    __table_args__ = (Index("uq_booths_village_id_booth_number", "village_id", "booth_number", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     booth_number = Column(String, nullable=False, index=True)
@@ -53,6 +56,7 @@ class Booth(Base):
 
 class House(Base):
     __tablename__ = "houses"
+    __table_args__ = (Index("uq_houses_booth_id_house_number", "booth_id", "house_number", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     house_number = Column(String, nullable=False, index=True)
@@ -65,20 +69,32 @@ class House(Base):
 
 class Voter(Base):
     __tablename__ = "voters"
+    __table_args__ = (
+        # Hierarchy filters scan one level's voters in id order
+        Index("ix_voters_booth_id_id", "booth_id", "id"),
+        Index("ix_voters_village_id_id", "village_id", "id"),
+        Index("ix_voters_mandal_id_id", "mandal_id", "id"),
+        Index("ix_voters_district_id_id", "district_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
     age = Column(Integer, nullable=True)
     gender = Column(String, nullable=True)
     voter_id = Column(String, unique=True, index=True, nullable=False)
-    house_id = Column(Integer, ForeignKey("houses.id"), nullable=False)
+    house_id = Column(Integer, ForeignKey("houses.id"), nullable=False, index=True)
     
-    # Derived fields for easy querying
-    district_name = Column(String, nullable=True, index=True)
-    mandal_name = Column(String, nullable=True, index=True)
-    village_name = Column(String, nullable=True, index=True)
-    booth_number = Column(String, nullable=True, index=True)
-    house_number = Column(String, nullable=True, index=True)
+    # Denormalized hierarchy ids, so location filters don't join up the tree;
+    # the location names are looked up in the cached hierarchy (app.cache)
+    booth_id = Column(Integer, ForeignKey("booths.id", name="fk_voters_booth_id_booths"), nullable=True)
+    village_id = Column(Integer, ForeignKey("villages.id", name="fk_voters_village_id_villages"), nullable=True)
+    mandal_id = Column(Integer, ForeignKey("mandals.id", name="fk_voters_mandal_id_mandals"), nullable=True)
+    district_id = Column(Integer, ForeignKey("districts.id", name="fk_voters_district_id_districts"), nullable=True)
+    
+    # Read from the voter's house (not stored on the voter row)
+    house_number = column_property(
+        select(House.house_number).where(House.id == house_id).correlate_except(House).scalar_subquery()
+    )
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -93,9 +109,83 @@ class UploadLog(Base):
     booth_id = Column(Integer, ForeignKey("booths.id"), nullable=False)
     total_voters = Column(Integer, default=0)
     total_houses = Column(Integer, default=0)
-    status = Column(String, default="processing")  # processing, completed, failed
+    status = Column(String, default="processing")  # processing, completed, duplicate, failed
     error_message = Column(Text, nullable=True)
+    # SHA-256 of the uploaded PDF
+    content_hash = Column(String(64), nullable=True)
+    # Counts of what a revised roll changed (added, updated, moved, transferred, removed, ...)
+    changeset = Column(JSON, nullable=True)
+    # Milliseconds spent per processing stage (hash, open, extract, parse, ..., total)
+    stage_timings = Column(JSON, nullable=True)
+    # What the PDF contained: pages, text lines and voters parsed
+    page_count = Column(Integer, nullable=True)
+    line_count = Column(Integer, nullable=True)
+    parsed_voter_count = Column(Integer, nullable=True)
+    # Queued jobs: the batch they belong to and the "host:pid" of the server process running them
+    upload_batch_id = Column(
+        Integer, ForeignKey("upload_batches.id", name="fk_upload_logs_upload_batch_id_upload_batches"), nullable=True
+    )
+    worker = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    booth = relationship("Booth")
\ No newline at end of file
+    booth = relationship("Booth")
+
+class ParsedRoll(Base):
+    """Voter records parsed from a PDF, so the same file is only parsed once per parser version"""
+    __tablename__ = "parsed_rolls"
+    __table_args__ = (
+        Index(
+            "uq_parsed_rolls_content_hash_extract_mode_parser_version",
+            "content_hash", "extract_mode", "parser_version", unique=True
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    extract_mode = Column(String, nullable=False)
+    parser_version = Column(Integer, nullable=False)
+    voters = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UploadBatch(Base):
+    __tablename__ = "upload_batches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False)
+    total_files = Column(Integer, default=0)
+    files_completed = Column(Integer, default=0)
+    files_failed = Column(Integer, default=0)
+    files_skipped = Column(Integer, default=0)
+    total_voters = Column(Integer, default=0)
+    total_houses = Column(Integer, default=0)
+    status = Column(String, default="processing")  # processing, completed, completed_with_errors, failed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class HierarchyRollup(Base):
+    """Maintained counts below one hierarchy node (level 'state' has node_id 0)"""
+    __tablename__ = "hierarchy_rollups"
+    
+    level = Column(String, primary_key=True)  # state, district, mandal, village, booth
+    node_id = Column(Integer, primary_key=True)
+    districts = Column(Integer, default=0, nullable=False)
+    mandals = Column(Integer, default=0, nullable=False)
+    villages = Column(Integer, default=0, nullable=False)
+    booths = Column(Integer, default=0, nullable=False)
+    houses = Column(Integer, default=0, nullable=False)
+    voters = Column(Integer, default=0, nullable=False)
+
+class HierarchyVersion(Base):
+    """
+    Single-row counter bumped in every transaction that changes the hierarchy,
+    so each server process can tell that its cached copy is stale
+    """
+    __tablename__ = "hierarchy_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+event.listen(
+    HierarchyVersion.__table__, "after_create",
+    DDL("INSERT INTO hierarchy_version (id, version) VALUES (1, 0)")
+)
@@ -0,0 +1,389 @@
+"""
+Voter roll parsers
+Each layout profile parses one roll format with precompiled patterns; a
+document's profile is picked once, by sniffing its first page of voters,
+or page by page when that page matches no profile
+"""
+
+import logging
+import re
+from bisect import bisect
+from functools import lru_cache
+from itertools import zip_longest
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Version of what the parsers make of a roll, part of the parsed roll cache
+# key: bump it whenever a profile or the layout detection changes, so rolls
+# cached by the previous parsers are parsed again
+PARSER_VERSION = 2
+
+# EPIC (voter ID) numbers: three letters and seven digits
+EPIC = r"[A-Z]{3}\d{7}"
+EPIC_RE = re.compile(EPIC)
+
+# Door numbers such as 14, 12-A or 1-2-345/A
+HOUSE_NUMBER = r"\d[\w/-]*"
+
+# Gender values as printed on English and Telugu rolls
+GENDERS = {
+    "M": "M", "MALE": "M", "పురుషుడు": "M",
+    "F": "F", "FEMALE": "F", "స్త్రీ": "F",
+    "TG": "O", "THIRD": "O", "OTHER": "O", "OTHERS": "O", "ఇతరులు": "O",
+}
+
+# Words whose tops are this close (in points) are on the same line
+LINE_TOLERANCE = 3
+
+# A page of positioned words: (page width, [(x0, top, text), ...])
+PageWords = Tuple[float, List[Tuple[float, float, str]]]
+
+# A page as the parsers receive it: its text, or its PageWords
+Page = TypeVar("Page")
+
+def words_to_lines(words: List[Tuple[float, float, str]]) -> List[str]:
+    """Text lines of positioned words, top to bottom and left to right"""
+    lines = []
+    line = []
+    line_top = None
+    for x0, top, text in sorted(words, key=lambda word: (word[1], word[0])):
+        if line_top is not None and top - line_top > LINE_TOLERANCE:
+            lines.append(" ".join(text for _, text in sorted(line)))
+            line = []
+        if not line:
+            line_top = top
+        line.append((x0, text))
+    if line:
+        lines.append(" ".join(text for _, text in sorted(line)))
+    return lines
+
+@lru_cache(maxsize=None)
+def column_boundaries(page_width: float, columns: int) -> Tuple[float, ...]:
+    """x positions splitting a page into equal-width columns"""
+    return tuple(page_width * column / columns for column in range(1, columns))
+
+def _label(*words: str) -> str:
+    """'Label :' pattern for any of the words, or two of them as 'Telugu / English :'"""
+    word = "(?:" + "|".join(words) + ")"
+    return rf"{word}(?:\s*/\s*{word})?\s*[:：]\s*"
+
+class LayoutProfile:
+    """A roll format: parse() turns the document's lines into voter dicts"""
+
+    name = ""
+    # Whether the page text can't be relied on for this layout, so documents
+    # in it are read from positioned words (parse_voter_roll_words)
+    needs_word_positions = False
+
+    def parse(self, lines: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        """Returns (voters, number of lines with a voter ID that could not be parsed)"""
+        raise NotImplementedError
+
+    def score(self, page_text: str) -> int:
+        """How well the profile reads a sample page: the number of voters it parses"""
+        return len(self.parse(page_text.split("\n"))[0])
+
+    def page_lines(self, page_width: float, words: List[Tuple[float, float, str]]) -> List[str]:
+        """The lines parse() expects, built from a page's positioned words"""
+        return words_to_lines(words)
+
+class HouseListProfile(LayoutProfile):
+    """'House No: 12-A' headers, each followed by one 'N. Name Age M/F EPIC' line per voter"""
+
+    def __init__(self, name: str, house_label: str):
+        self.name = name
+        self.house_re = re.compile(rf"(?:{house_label})\s*[:：]?\s*({HOUSE_NUMBER})", re.IGNORECASE)
+        # Searched, not matched whole: text after the EPIC (e.g. a photo
+        # caption or serial number) doesn't stop the line from parsing
+        self.voter_re = re.compile(rf"(?:\d+\.\s*)?(.*\S)\s+(\d{{1,3}})\s+([MF])\s+({EPIC})")
+
+    def parse(self, lines: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        voters = []
+        unparsed = 0
+        current_house = None
+        voter_match = self.voter_re.search
+        house_search = self.house_re.search
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            match = voter_match(line)
+            if match:
+                if current_house is None:
+                    unparsed += 1
+                    continue
+                name, age, gender, voter_id = match.groups()
+                voters.append({
+                    'name': name,
+                    'age': int(age),
+                    'gender': gender,
+                    'voter_id': voter_id,
+                    'house_number': current_house
+                })
+                continue
+
+            match = house_search(line)
+            if match:
+                current_house = match.group(1)
+            elif EPIC_RE.search(line):
+                unparsed += 1
+
+        return voters, unparsed
+
+class BoxProfile(LayoutProfile):
+    """
+    Rows of voter boxes side by side (three per row on CEO Telangana rolls)
+    The text of a row is one line of EPIC numbers followed by one line per
+    field, with a 'Label : value' entry for each box in left-to-right order.
+    A box whose name wraps pushes its other fields onto the next line of
+    text, so a row whose field lines don't hold one entry per box is counted
+    as unparsed rather than read with its values shifted between boxes
+    """
+
+    needs_word_positions = True
+
+    def __init__(self, name: str, labels: Dict[str, List[str]], requires: Optional[str] = None, columns: int = 3):
+        self.name = name
+        self.columns = columns
+        self.name_split = re.compile(_label(*labels["name"]))
+        self.relation_re = re.compile(_label(*labels["relation"]))
+        self.house_split = re.compile(_label(*labels["house"]), re.IGNORECASE)
+        self.age_gender_re = re.compile(
+            _label(*labels["age"]) + r"(\d{1,3})\s*" + _label(*labels["gender"]) + r"(\S+)",
+            re.IGNORECASE
+        )
+        self.house_number_re = re.compile(HOUSE_NUMBER)
+        # Only considered for documents whose sample page matches this
+        self.requires = re.compile(requires) if requires else None
+
+    def score(self, page_text: str) -> int:
+        if self.requires and not self.requires.search(page_text):
+            return 0
+        return super().score(page_text)
+
+    def page_lines(self, page_width: float, words: List[Tuple[float, float, str]]) -> List[str]:
+        """
+        Lines of one box at a time: words are split into the page's columns
+        by position, so boxes whose fields don't line up stay apart
+        """
+        boundaries = column_boundaries(page_width, self.columns)
+        columns = [[] for _ in range(self.columns)]
+        for word in words:
+            columns[bisect(boundaries, word[0])].append(word)
+
+        # Each column is a stack of boxes, each starting at its EPIC line
+        column_boxes = []
+        for column_words in columns:
+            boxes = []
+            for line in words_to_lines(column_words):
+                if EPIC_RE.search(line) or not boxes:
+                    boxes.append([])
+                boxes[-1].append(line)
+            column_boxes.append(boxes)
+
+        # Back into reading order: row by row, left to right
+        return [
+            line
+            for row in zip_longest(*column_boxes, fillvalue=[])
+            for box in row
+            for line in box
+        ]
+
+    def parse(self, lines: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        voters = []
+        unparsed = 0
+        row = []
+        # A lone box's name may wrap onto the next line
+        name_wraps = False
+        # A field line with more or fewer entries than the row has boxes
+        misaligned = False
+
+        def finish_row():
+            nonlocal unparsed
+            for box in row:
+                if box.get('name') and box.get('house_number') and not misaligned:
+                    voters.append(box)
+                else:
+                    unparsed += 1
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            if name_wraps:
+                name_wraps = False
+                if ":" not in line and not EPIC_RE.search(line):
+                    row[0]['name'] = f"{row[0]['name']} {line}"
+                    continue
+
+            # The relation line ("Father's Name : ...") also contains the name label
+            if self.relation_re.match(line):
+                continue
+            if self.name_split.match(line):
+                names = self.name_split.split(line)[1:]
+                misaligned = misaligned or len(names) != len(row)
+                for box, value in zip(row, names):
+                    box['name'] = value.strip()
+                name_wraps = len(row) == 1
+                continue
+            if self.house_split.match(line):
+                houses = self.house_split.split(line)[1:]
+                misaligned = misaligned or len(houses) != len(row)
+                for box, value in zip(row, houses):
+                    match = self.house_number_re.match(value.strip())
+                    if match:
+                        box['house_number'] = match.group(0)
+                continue
+            age_genders = self.age_gender_re.findall(line)
+            if age_genders:
+                misaligned = misaligned or len(age_genders) != len(row)
+                for box, (age, gender) in zip(row, age_genders):
+                    box['age'] = int(age)
+                    box['gender'] = GENDERS.get(gender.upper())
+                continue
+
+            voter_ids = EPIC_RE.findall(line)
+            if voter_ids:
+                finish_row()
+                misaligned = False
+                row = [
+                    {'name': None, 'age': None, 'gender': None, 'voter_id': voter_id, 'house_number': None}
+                    for voter_id in voter_ids
+                ]
+
+        finish_row()
+        return voters, unparsed
+
+ENGLISH_BOX_LABELS = {
+    "name": [r"Name"],
+    "relation": [r"Father'?s?\s+Name", r"Husband'?s?\s+Name", r"Mother'?s?\s+Name", r"Others?"],
+    "house": [r"House\s+(?:Number|No\.?)"],
+    "age": [r"Age"],
+    "gender": [r"Gender", r"Sex"],
+}
+
+BILINGUAL_BOX_LABELS = {
+    "name": [r"Name", r"పేరు"],
+    "relation": ENGLISH_BOX_LABELS["relation"] + [r"తండ్రి\s*పేరు", r"భర్త\s*పేరు", r"తల్లి\s*పేరు", r"ఇతరులు"],
+    "house": ENGLISH_BOX_LABELS["house"] + [r"ఇంటి\s*(?:నెంబరు|నెం\.?|సంఖ్య)"],
+    "age": [r"Age", r"వయస్సు"],
+    "gender": [r"Gender", r"Sex", r"లింగము", r"లింగం"],
+}
+
+# Registered layouts in priority order (earlier profiles win ties)
+LAYOUT_PROFILES: Dict[str, LayoutProfile] = {}
+
+def register_profile(profile: LayoutProfile):
+    """Add a layout profile (or replace the one with the same name)"""
+    LAYOUT_PROFILES[profile.name] = profile
+
+register_profile(HouseListProfile("house-list", r"House\s+No\.?|ఇంటి\s*(?:నెంబరు|నెం\.?)"))
+register_profile(BoxProfile("box-3col", ENGLISH_BOX_LABELS))
+register_profile(BoxProfile("box-3col-bilingual", BILINGUAL_BOX_LABELS, requires="[\u0C00-\u0C7F]"))
+
+def detect_profile(page_text: str) -> Optional[LayoutProfile]:
+    """The profile that reads the most voters from a sample page, if any reads one"""
+    best, best_score = None, 0
+    for profile in LAYOUT_PROFILES.values():
+        score = profile.score(page_text)
+        if score > best_score:
+            best, best_score = profile, score
+    return best
+
+def _layout_runs(
+    pages: Sequence[Page],
+    page_text: Callable[[Page], str]
+) -> Tuple[List[Tuple[LayoutProfile, List[Page]]], int]:
+    """
+    Pages grouped into runs of consecutive pages of the same layout, each
+    page's layout sniffed on its own; pages without voter IDs join the
+    current run. Returns (runs, voter lines on pages no profile reads)
+    """
+    runs = []
+    unread = 0
+    for page in pages:
+        text = page_text(page)
+        profile = detect_profile(text) if EPIC_RE.search(text) else None
+        if profile is None:
+            if EPIC_RE.search(text):
+                unread += sum(1 for line in text.split("\n") if EPIC_RE.search(line))
+            elif runs:
+                runs[-1][1].append(page)
+        elif runs and runs[-1][0] is profile:
+            runs[-1][1].append(page)
+        else:
+            runs.append((profile, [page]))
+    return runs, unread
+
+def _parse_pages(
+    pages: Sequence[Page],
+    profile_name: Optional[str],
+    page_text: Callable[[Page], str],
+    page_lines: Callable[[LayoutProfile, Page], List[str]],
+    stats: Optional[Dict[str, int]]
+) -> List[Dict[str, Any]]:
+    unparsed = 0
+    if profile_name is not None:
+        runs = [(LAYOUT_PROFILES[profile_name], list(pages))]
+    else:
+        sample = next((page for page in pages if EPIC_RE.search(page_text(page))), None)
+        profile = detect_profile(page_text(sample)) if sample is not None else None
+        if profile is not None:
+            runs = [(profile, list(pages))]
+        else:
+            runs, unparsed = _layout_runs(pages, page_text)
+
+    voters = []
+    line_count = 0
+    for profile, run in runs:
+        lines = [line for page in run for line in page_lines(profile, page)]
+        run_voters, run_unparsed = profile.parse(lines)
+        if run_unparsed:
+            logger.warning("%s layout: %d voter entries could not be parsed", profile.name, run_unparsed)
+        voters.extend(run_voters)
+        line_count += len(lines)
+        unparsed += run_unparsed
+    if unparsed and not runs:
+        logger.warning("No layout profile reads this roll: %d voter entries could not be parsed", unparsed)
+    if stats is not None:
+        stats["lines"] = line_count
+        stats["unparsed"] = unparsed
+    return voters
+
+def parse_voter_roll_words(
+    pages: List[PageWords],
+    profile_name: Optional[str] = None,
+    stats: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Parse the voters of a roll from its pages' positioned words
+    Like parse_voter_roll, but each profile lays the words out itself
+    (box layouts are read one column at a time)
+    """
+    return _parse_pages(
+        pages, profile_name,
+        lambda page: "\n".join(words_to_lines(page[1])),
+        lambda profile, page: profile.page_lines(*page),
+        stats
+    )
+
+def parse_voter_roll(
+    page_texts: List[str],
+    profile_name: Optional[str] = None,
+    stats: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Parse the voters of a roll from its page texts
+    The layout is sniffed from the first page with a voter ID (cover pages
+    have none) unless profile_name picks one; pages are parsed as one text,
+    so a house continues across a page break. If that page matches no
+    layout, each page's layout is sniffed on its own and runs of pages with
+    the same layout are parsed together.
+    stats, if given, receives the number of lines parsed and of voter entries
+    that could not be parsed ("lines", "unparsed").
+    """
+    return _parse_pages(page_texts, profile_name, lambda text: text, lambda profile, text: text.split("\n"), stats)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # District Schemas
@@ -90,14 +90,14 @@ class VoterBase(BaseModel):
     house_id: int
 
 class VoterCreate(VoterBase):
-    district_name: Optional[str] = None
-    mandal_name: Optional[str] = None
-    village_name: Optional[str] = None
-    booth_number: Optional[str] = None
-    house_number: Optional[str] = None
+    pass
 
 class Voter(VoterBase):
     id: int
+    district_id: Optional[int] = None
+    mandal_id: Optional[int] = None
+    village_id: Optional[int] = None
+    booth_id: Optional[int] = None
     district_name: Optional[str] = None
     mandal_name: Optional[str] = None
     village_name: Optional[str] = None
@@ -118,6 +118,8 @@ class UploadLogCreate(UploadLogBase):
     total_houses: int = 0
     status: str = "processing"
     error_message: Optional[str] = None
+    upload_batch_id: Optional[int] = None
+    worker: Optional[str] = None
 
 class UploadLog(UploadLogBase):
     id: int
@@ -125,6 +127,35 @@ class UploadLog(UploadLogBase):
     total_houses: int
     status: str
     error_message: Optional[str] = None
+    content_hash: Optional[str] = None
+    changeset: Optional[Dict[str, int]] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    page_count: Optional[int] = None
+    line_count: Optional[int] = None
+    parsed_voter_count: Optional[int] = None
+    upload_batch_id: Optional[int] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Upload Batch Schemas
+class UploadBatchCreate(BaseModel):
+    filename: str
+    total_files: int = 0
+    files_skipped: int = 0
+    status: str = "processing"
+
+class UploadBatch(BaseModel):
+    id: int
+    filename: str
+    total_files: int
+    files_completed: int
+    files_failed: int
+    files_skipped: int
+    total_voters: int
+    total_houses: int
+    status: str
     created_at: datetime
     
     class Config:
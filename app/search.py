@@ -0,0 +1,108 @@
+import logging
+from typing import Dict, List
+from sqlalchemy import Integer, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Trigram tokens are three characters long; shorter terms fall back to LIKE
+MIN_FTS_TERM_LENGTH = 3
+
+# Databases with a usable voters_fts index, keyed so that the sync and the
+# async engine of the same database share the entry
+_fts_databases = set()
+
+def _database_key(engine: Engine):
+    return engine.dialect.name, engine.url.database
+
+# House numbers live on houses, so the index reads its content through a view
+_VOTER_FTS_DDL = [
+    """
+    CREATE VIEW IF NOT EXISTS voters_fts_content AS
+    SELECT voters.id, voters.name, voters.voter_id, houses.house_number
+    FROM voters JOIN houses ON houses.id = voters.house_id
+    """,
+    """
+    CREATE VIRTUAL TABLE voters_fts USING fts5(
+        name, voter_id, house_number,
+        content='voters_fts_content', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    # Triggers keep the index in sync with every write, bulk inserts included
+    """
+    CREATE TRIGGER voters_fts_insert AFTER INSERT ON voters BEGIN
+        INSERT INTO voters_fts(rowid, name, voter_id, house_number)
+        VALUES (new.id, new.name, new.voter_id, (SELECT house_number FROM houses WHERE id = new.house_id));
+    END
+    """,
+    """
+    CREATE TRIGGER voters_fts_delete AFTER DELETE ON voters BEGIN
+        INSERT INTO voters_fts(voters_fts, rowid, name, voter_id, house_number)
+        VALUES ('delete', old.id, old.name, old.voter_id, (SELECT house_number FROM houses WHERE id = old.house_id));
+    END
+    """,
+    """
+    CREATE TRIGGER voters_fts_update AFTER UPDATE ON voters BEGIN
+        INSERT INTO voters_fts(voters_fts, rowid, name, voter_id, house_number)
+        VALUES ('delete', old.id, old.name, old.voter_id, (SELECT house_number FROM houses WHERE id = old.house_id));
+        INSERT INTO voters_fts(rowid, name, voter_id, house_number)
+        VALUES (new.id, new.name, new.voter_id, (SELECT house_number FROM houses WHERE id = new.house_id));
+    END
+    """,
+]
+
+def ensure_voter_search_index(engine: Engine) -> bool:
+    """
+    Create the SQLite FTS5 trigram index over voters if it doesn't exist yet
+    Returns False when the database can't host it (not SQLite, or SQLite
+    built without FTS5/trigram); searches then use LIKE filters
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'voters_fts'"
+            )).first()
+            if not exists:
+                for statement in _VOTER_FTS_DDL:
+                    conn.execute(text(statement))
+                # Index the voters that were loaded before the index existed
+                conn.execute(text("INSERT INTO voters_fts(voters_fts) VALUES ('rebuild')"))
+    except OperationalError as e:
+        logger.warning("Voter full-text index unavailable, using LIKE search: %s", e)
+        return False
+
+    _fts_databases.add(_database_key(engine))
+    return True
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def voter_text_criteria(engine: Engine, filters: Dict[str, str], use_fts: bool = True) -> List:
+    """
+    Case-insensitive substring filters on voter text columns
+    Terms long enough for the trigram index are combined into one FTS5 MATCH;
+    the rest use ILIKE '%term%'
+    """
+    criteria = []
+    match_terms = []
+    fts = use_fts and _database_key(engine) in _fts_databases
+    for column, term in filters.items():
+        if not term:
+            continue
+        if fts and len(term) >= MIN_FTS_TERM_LENGTH:
+            match_terms.append(f"{column} : {_fts_phrase(term)}")
+        else:
+            criteria.append(getattr(models.Voter, column).ilike(f"%{term}%"))
+
+    if match_terms:
+        criteria.append(models.Voter.id.in_(
+            text("SELECT rowid FROM voters_fts WHERE voters_fts MATCH :fts_query").bindparams(
+                fts_query=" AND ".join(match_terms)
+            ).columns(rowid=Integer)
+        ))
+    return criteria
@@ -1,76 +1,255 @@
 import pandas as pd
-import re
+import hashlib
 import io
-from typing import List, Dict, Any, Tuple
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 from sqlalchemy.orm import Session
 from app import crud, schemas, models
+from app.cache import bump_hierarchy_version
+from app.parsers import EPIC_RE, PARSER_VERSION, detect_profile, parse_voter_roll, parse_voter_roll_words
+from app.spreadsheets import BOOTH_COLUMNS, HIERARCHY_COLUMNS, ColumnMap, SpreadsheetFile, iter_record_chunks
 import pdfplumber
 
+logger = logging.getLogger(__name__)
+
+# Worker processes used for PDF text extraction (1 extracts in-process)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# Smaller PDFs are extracted in-process; the pool round trip isn't worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+# "text" parses each page's flattened text; "words" places word boxes into
+# the layout's columns by their coordinates
+PDF_EXTRACT_MODE = os.getenv("PDF_EXTRACT_MODE", "text")
+PDF_EXTRACT_MODES = ("text", "words")
+# Pages searched for a voter ID to sniff the layout from (cover pages have none)
+LAYOUT_SNIFF_PAGES = 5
+# Least number of seconds between two progress updates of an upload log
+UPLOAD_PROGRESS_INTERVAL = float(os.getenv("UPLOAD_PROGRESS_INTERVAL", "1"))
+
+# A PDF given by the path of a (spooled) file or by its content
+PDFFile = Union[str, bytes]
+
+_extract_pools: Dict[int, ProcessPoolExecutor] = {}
+_extract_pools_lock = threading.Lock()
+
+def _get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Shared process pool, so concurrent uploads don't oversubscribe the CPUs
+    The pool is created from an upload thread while the server's other
+    threads run, so its workers are spawned: a forked child could inherit a
+    lock (logging, the connection pool) that another thread held
+    """
+    with _extract_pools_lock:
+        if workers not in _extract_pools:
+            _extract_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extract_pools[workers]
+
+def _discard_extract_pool(workers: int, pool: ProcessPoolExecutor):
+    with _extract_pools_lock:
+        if _extract_pools.get(workers) is pool:
+            del _extract_pools[workers]
+    pool.shutdown(wait=False)
+
+def _open_pdf(pdf_file: PDFFile):
+    return pdfplumber.open(pdf_file if isinstance(pdf_file, str) else io.BytesIO(pdf_file))
+
+def _sniff_layout(pdf_file: PDFFile):
+    """The layout profile of the first page with a voter ID, read as text, if any"""
+    with _open_pdf(pdf_file) as pdf:
+        for page in pdf.pages[:LAYOUT_SNIFF_PAGES]:
+            text = _page_text(page)
+            if EPIC_RE.search(text):
+                return detect_profile(text)
+    return None
+
+def content_sha256(pdf_file: PDFFile) -> str:
+    """Hex SHA-256 of a PDF's content, read in chunks when it is a file"""
+    if not isinstance(pdf_file, str):
+        return hashlib.sha256(pdf_file).hexdigest()
+    digest = hashlib.sha256()
+    with open(pdf_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _booth_location(booth: models.Booth) -> Dict[str, int]:
+    """The hierarchy ids stored on each voter of a booth"""
+    village = booth.village
+    return {
+        'booth_id': booth.id,
+        'village_id': village.id,
+        'mandal_id': village.mandal_id,
+        'district_id': village.mandal.district_id
+    }
+
+def _page_text(page) -> str:
+    return page.extract_text() or ''
+
+def _page_words(page) -> Tuple[float, List[Tuple[float, float, str]]]:
+    """Page width and the (x0, top, text) of every word, compact to send between processes"""
+    words = page.extract_words(use_text_flow=True)
+    return page.width, [(word['x0'], word['top'], word['text']) for word in words]
+
+def _extract_timed(pages, extract: Callable, progress: Optional[Callable[[], None]] = None) -> Tuple[List, List[float]]:
+    """extract(page) of every page, and the seconds each page took"""
+    results = []
+    page_seconds = []
+    for page in pages:
+        start = time.perf_counter()
+        results.append(extract(page))
+        page_seconds.append(time.perf_counter() - start)
+        if progress:
+            progress()
+    return results, page_seconds
+
+def _extract_page_range(pdf_file: PDFFile, start: int, stop: int, extract: Callable) -> Tuple[List, List[float]]:
+    """Extract pages [start, stop) with extract(page) - runs inside a pool worker"""
+    with _open_pdf(pdf_file) as pdf:
+        return _extract_timed(pdf.pages[start:stop], extract)
+
+class StageTimer:
+    """
+    Milliseconds an upload spent in each processing stage, and the pages,
+    lines and voters it read, as recorded on its upload log
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.page_count: Optional[int] = None
+        self.line_count: Optional[int] = None
+        self.parsed_voter_count: Optional[int] = None
+    
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds * 1000, 1)
+    
+    @contextmanager
+    def stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+    
+    def log_fields(self) -> Dict[str, Any]:
+        """Keyword arguments for crud.update_upload_log, with the total time so far"""
+        return {
+            'stage_timings': {**self.stages, 'total': round((time.perf_counter() - self.started) * 1000, 1)},
+            'page_count': self.page_count,
+            'line_count': self.line_count,
+            'parsed_voter_count': self.parsed_voter_count
+        }
+
 class HierarchyService:
     """Service for managing administrative hierarchy"""
     
     @staticmethod
-    def import_hierarchy_from_excel(db: Session, file_content: bytes) -> Dict[str, Any]:
+    def import_hierarchy(
+        db: Session,
+        source: SpreadsheetFile,
+        columns: Optional[ColumnMap] = None,
+        chunk_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
         """
-        Import hierarchy from Excel file
-        Expected columns: District, Mandal, Village
+        Import hierarchy from a CSV file or Excel workbook (a path or the file content)
+        Expected columns: District, Mandal, Village, or the headers mapped to
+        them by columns (default: HIERARCHY_COLUMNS, which reads the GP list)
+        
+        The file is read in chunks of chunk_size rows (default:
+        IMPORT_CHUNK_SIZE). Each chunk's missing districts, mandals and
+        villages are inserted, one batch per level, and the whole import is
+        committed as one transaction. progress(chunks_done, rows_done) is
+        called after each chunk.
         """
         try:
-            # Read Excel file
-            df = pd.read_excel(io.BytesIO(file_content))
+            district_ids = crud.get_district_id_map(db)
+            mandal_ids = crud.get_mandal_id_map(db)
+            village_ids = crud.get_village_id_map(db)
+            mandal_district = {mandal_id: district_id for (district_id, _), mandal_id in mandal_ids.items()}
+            created = {'districts': 0, 'mandals': 0, 'villages': 0}
+            rollup_deltas = defaultdict(lambda: defaultdict(int))
+            total_rows = 0
             
-            # Validate columns
-            required_columns = ['District', 'Mandal', 'Village']
-            if not all(col in df.columns for col in required_columns):
-                raise ValueError(f"Excel file must contain columns: {required_columns}")
+            chunks = iter_record_chunks(source, columns or HIERARCHY_COLUMNS, chunk_size)
+            for chunk_number, records in enumerate(chunks, 1):
+                # Districts: insert the names we don't have yet in one batch
+                new_districts = list(dict.fromkeys(
+                    record['District'] for record in records if record['District'] not in district_ids
+                ))
+                crud.bulk_insert(db, models.District, [{'name': name} for name in new_districts])
+                if new_districts:
+                    district_ids = crud.get_district_id_map(db)
+                
+                # Mandals, keyed by (district_id, name)
+                new_mandals = list(dict.fromkeys(
+                    key for key in ((district_ids[record['District']], record['Mandal']) for record in records)
+                    if key not in mandal_ids
+                ))
+                crud.bulk_insert(db, models.Mandal, [
+                    {'name': name, 'district_id': district_id} for district_id, name in new_mandals
+                ])
+                if new_mandals:
+                    mandal_ids.update(crud.get_mandal_id_map(db, {district_id for district_id, _ in new_mandals}))
+                    mandal_district.update((mandal_ids[key], key[0]) for key in new_mandals)
+                
+                # Villages, keyed by (mandal_id, name)
+                new_villages = list(dict.fromkeys(
+                    key for key in (
+                        (mandal_ids[(district_ids[record['District']], record['Mandal'])], record['Village'])
+                        for record in records
+                    )
+                    if key not in village_ids
+                ))
+                crud.bulk_insert(db, models.Village, [
+                    {'name': name, 'mandal_id': mandal_id} for mandal_id, name in new_villages
+                ])
+                if new_villages:
+                    village_ids.update(crud.get_village_id_map(db, {mandal_id for mandal_id, _ in new_villages}))
+                
+                # Count the new entities into their ancestors' rollups
+                rollup_deltas[('state', 0)]['districts'] += len(new_districts)
+                for district_id, _ in new_mandals:
+                    rollup_deltas[('state', 0)]['mandals'] += 1
+                    rollup_deltas[('district', district_id)]['mandals'] += 1
+                for mandal_id, _ in new_villages:
+                    rollup_deltas[('state', 0)]['villages'] += 1
+                    rollup_deltas[('district', mandal_district[mandal_id])]['villages'] += 1
+                    rollup_deltas[('mandal', mandal_id)]['villages'] += 1
+                
+                created['districts'] += len(new_districts)
+                created['mandals'] += len(new_mandals)
+                created['villages'] += len(new_villages)
+                total_rows += len(records)
+                logger.info("Hierarchy import: chunk %d, %d rows read", chunk_number, total_rows)
+                if progress:
+                    progress(chunk_number, total_rows)
             
-            # Clean data
-            df = df.dropna(subset=required_columns)
-            df[required_columns] = df[required_columns].astype(str).apply(lambda x: x.str.strip())
+            crud.apply_rollup_deltas(db, rollup_deltas)
+            bump_hierarchy_version(db)
+            db.commit()
             
-            # Track stats
+            # Same per-row accounting as a row-by-row import: the first row
+            # naming a new entity creates it, every other row skips it
             stats = {
-                'districts_created': 0,
-                'mandals_created': 0,
-                'villages_created': 0,
-                'districts_skipped': 0,
-                'mandals_skipped': 0,
-                'villages_skipped': 0
+                'rows': total_rows,
+                'districts_created': created['districts'],
+                'mandals_created': created['mandals'],
+                'villages_created': created['villages'],
+                'districts_skipped': total_rows - created['districts'],
+                'mandals_skipped': total_rows - created['mandals'],
+                'villages_skipped': total_rows - created['villages']
             }
             
-            # Process each row
-            for _, row in df.iterrows():
-                district_name = row['District']
-                mandal_name = row['Mandal']
-                village_name = row['Village']
-                
-                # Create or get district
-                district = crud.get_district_by_name(db, district_name)
-                if not district:
-                    district_data = schemas.DistrictCreate(name=district_name)
-                    district = crud.create_district(db, district_data)
-                    stats['districts_created'] += 1
-                else:
-                    stats['districts_skipped'] += 1
-                
-                # Create or get mandal
-                mandal = crud.get_mandal_by_name_and_district(db, mandal_name, district.id)
-                if not mandal:
-                    mandal_data = schemas.MandalCreate(name=mandal_name, district_id=district.id)
-                    mandal = crud.create_mandal(db, mandal_data)
-                    stats['mandals_created'] += 1
-                else:
-                    stats['mandals_skipped'] += 1
-                
-                # Create or get village
-                village = crud.get_village_by_name_and_mandal(db, village_name, mandal.id)
-                if not village:
-                    village_data = schemas.VillageCreate(name=village_name, mandal_id=mandal.id)
-                    village = crud.create_village(db, village_data)
-                    stats['villages_created'] += 1
-                else:
-                    stats['villages_skipped'] += 1
-            
             return {
                 'success': True,
                 'message': 'Hierarchy imported successfully',
@@ -78,106 +257,312 @@ class HierarchyService:
             }
             
         except Exception as e:
+            db.rollback()
             return {
                 'success': False,
                 'message': f'Error importing hierarchy: {str(e)}',
                 'stats': None
             }
+    
+    @staticmethod
+    def import_booths(
+        db: Session,
+        source: SpreadsheetFile,
+        columns: Optional[ColumnMap] = None,
+        chunk_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Import booths from a CSV file or Excel workbook (a path or the file content)
+        Expected columns: District, Mandal, Village, Booth Number, Booth Name
+        (or the headers mapped to them by columns, default: BOOTH_COLUMNS)
+        
+        Villages are looked up by name in an index loaded once, and booths a
+        village already has (or that the file repeats) are skipped against a
+        preloaded set. Each chunk of chunk_size rows is inserted in one batch
+        and the whole import is committed as one transaction. Rows naming a
+        village that doesn't exist, and rows with a blank cell, are skipped and
+        reported, so that created + skipped + unmatched + invalid = rows.
+        """
+        try:
+            villages = crud.get_village_name_index(db)
+            booth_keys = crud.get_booth_keys(db)
+            rollup_deltas = defaultdict(lambda: defaultdict(int))
+            created = 0
+            unmatched = 0
+            unmatched_villages = {}
+            invalid_rows = []
+            total_rows = 0
+            
+            chunks = iter_record_chunks(source, columns or BOOTH_COLUMNS, chunk_size, invalid_rows)
+            for chunk_number, records in enumerate(chunks, 1):
+                new_booths = []
+                for record in records:
+                    location = (record['District'], record['Mandal'], record['Village'])
+                    ids = villages.get(location)
+                    if ids is None:
+                        unmatched += 1
+                        unmatched_villages.setdefault(' / '.join(location), None)
+                        continue
+                    village_id, mandal_id, district_id = ids
+                    key = (village_id, record['Booth Number'])
+                    if key in booth_keys:
+                        continue
+                    booth_keys.add(key)
+                    new_booths.append({
+                        'booth_number': record['Booth Number'],
+                        'booth_name': record['Booth Name'],
+                        'village_id': village_id
+                    })
+                    for rollup_key in [('state', 0), ('district', district_id), ('mandal', mandal_id), ('village', village_id)]:
+                        rollup_deltas[rollup_key]['booths'] += 1
+                
+                created += crud.bulk_insert(db, models.Booth, new_booths)
+                total_rows += len(records)
+                logger.info("Booth import: chunk %d, %d rows read", chunk_number, total_rows)
+                if progress:
+                    progress(chunk_number, total_rows)
+            
+            crud.apply_rollup_deltas(db, rollup_deltas)
+            bump_hierarchy_version(db)
+            db.commit()
+            
+            stats = {
+                'rows': total_rows + len(invalid_rows),
+                'booths_created': created,
+                'booths_skipped': total_rows - created - unmatched,
+                'rows_unmatched': unmatched,
+                'rows_invalid': len(invalid_rows),
+                # The first few, to show which names and rows to fix
+                'unmatched_villages': list(unmatched_villages)[:20],
+                'invalid_rows': invalid_rows[:20]
+            }
+            message = 'Booths imported successfully'
+            if unmatched:
+                message += f"; {unmatched} {'row names' if unmatched == 1 else 'rows name'} a village that does not exist"
+            if invalid_rows:
+                message += f"; {len(invalid_rows)} {'row has' if len(invalid_rows) == 1 else 'rows have'} a blank cell"
+            
+            return {
+                'success': True,
+                'message': message,
+                'stats': stats
+            }
+            
+        except Exception as e:
+            db.rollback()
+            return {
+                'success': False,
+                'message': f'Error importing booths: {str(e)}',
+                'stats': None
+            }
 
 class PDFProcessingService:
     """Service for processing voter PDFs"""
     
     @staticmethod
-    def extract_voter_data_from_pdf(file_content: bytes) -> List[Dict[str, Any]]:
+    def extract_voter_data_from_pdf(
+        pdf_file: PDFFile,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        mode: Optional[str] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict[str, Any]]:
         """
         Extract voter data from PDF
         Returns list of voter dictionaries with house numbers
+        
+        Large PDFs are split into contiguous page ranges that are extracted in
+        parallel and merged back in page order. The layout is detected once
+        per document (see app.parsers) and the pages are parsed as one text,
+        so a house continues across a page break.
+        mode is "text" or "words" (default: PDF_EXTRACT_MODE). In text mode the
+        layout is sniffed first, and documents in a layout whose page text
+        can't be relied on (box rolls) are read as words instead.
+        progress(pages_done, total_pages) is called as pages are extracted.
+        timer receives the sniff, open, extract and parse times and the counts.
+        Errors (an unreadable PDF, a worker that died) are raised to the caller.
         """
-        voters = []
+        mode = PDF_EXTRACT_MODE if mode is None else mode
+        if mode not in PDF_EXTRACT_MODES:
+            raise ValueError(f"Unknown PDF extraction mode {mode!r}, expected one of {PDF_EXTRACT_MODES}")
+        timer = timer or StageTimer()
+        parse_stats = {}
         
-        try:
-            # Open PDF
-            pdf_file = io.BytesIO(file_content)
-            
-            with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        # Extract voter records from text
-                        page_voters = PDFProcessingService._parse_voter_text(text)
-                        voters.extend(page_voters)
+        if mode == "text":
+            with timer.stage("sniff"):
+                profile = _sniff_layout(pdf_file)
+            if profile is not None and profile.needs_word_positions:
+                mode = "words"
+        
+        extract = _page_words if mode == "words" else _page_text
+        pages = PDFProcessingService.extract_pages(pdf_file, extract, workers, progress, timer)
+        with timer.stage("parse"):
+            if mode == "words":
+                voters = parse_voter_roll_words(pages, stats=parse_stats)
+            else:
+                voters = parse_voter_roll(pages, stats=parse_stats)
+        timer.line_count = parse_stats.get("lines", 0)
+        timer.parsed_voter_count = len(voters)
         
-        except Exception as e:
-            print(f"Error processing PDF: {str(e)}")
-            
         return voters
     
     @staticmethod
-    def _parse_voter_text(text: str) -> List[Dict[str, Any]]:
+    def extract_pages(
+        pdf_file: PDFFile,
+        extract: Callable = _page_text,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List:
         """
-        Parse voter information from text
-        This is a basic implementation - you may need to adjust based on PDF format
+        Run extract(page) over every page, in page order (extract must be a module-level function)
+        Pool workers open a PDF given by path themselves, so only the path is sent to them
+        timer receives the open and extract times, the slowest page's time and the page count
         """
-        voters = []
-        lines = text.split('\n')
+        workers = PDF_EXTRACT_WORKERS if workers is None else workers
+        timer = timer or StageTimer()
         
-        current_house = None
+        start = time.perf_counter()
+        with _open_pdf(pdf_file) as pdf:
+            page_count = len(pdf.pages)
+            timer.page_count = page_count
+            timer.add("open", time.perf_counter() - start)
+            if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+                with timer.stage("extract"):
+                    pages_done = 0
+                    
+                    def page_extracted():
+                        nonlocal pages_done
+                        pages_done += 1
+                        if progress:
+                            progress(pages_done, page_count)
+                    
+                    pages, page_seconds = _extract_timed(pdf.pages, extract, page_extracted)
+                if page_seconds:
+                    timer.add("slowest_page", max(page_seconds))
+                return pages
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Try to extract house number (common patterns)
-            house_match = re.search(r'House\s+No\.?\s*:?\s*(\d+[A-Za-z]*)', line, re.IGNORECASE)
-            if house_match:
-                current_house = house_match.group(1)
-                continue
-            
-            # Try to extract voter information
-            # Pattern: Name, Age, Gender, Voter ID
-            voter_match = re.search(
-                r'(\w+(?:\s+\w+)*)\s+(\d{1,3})\s+([MF])\s+([A-Z]{3}\d{7})',
-                line
-            )
-            
-            if voter_match and current_house:
-                name = voter_match.group(1).strip()
-                age = int(voter_match.group(2))
-                gender = voter_match.group(3)
-                voter_id = voter_match.group(4)
+        with timer.stage("extract"):
+            chunk_size = -(-page_count // workers)
+            pool = _get_extract_pool(workers)
+            chunks = {}
+            page_seconds = []
+            pages_done = 0
+            try:
+                futures = {
+                    pool.submit(_extract_page_range, pdf_file, start, min(start + chunk_size, page_count), extract): start
+                    for start in range(0, page_count, chunk_size)
+                }
                 
-                voters.append({
-                    'name': name,
-                    'age': age,
-                    'gender': gender,
-                    'voter_id': voter_id,
-                    'house_number': current_house
-                })
+                for future in as_completed(futures):
+                    chunks[futures[future]], chunk_seconds = future.result()
+                    page_seconds.extend(chunk_seconds)
+                    pages_done += len(chunk_seconds)
+                    if progress:
+                        progress(pages_done, page_count)
+            except BrokenProcessPool:
+                # A worker died and the pool can't be used again; the next upload gets a new one
+                _discard_extract_pool(workers, pool)
+                raise
+        timer.add("slowest_page", max(page_seconds))
         
-        return voters
+        return [page for start in sorted(chunks) for page in chunks[start]]
     
     @staticmethod
-    def process_voter_pdf(db: Session, booth_id: int, filename: str, file_content: bytes) -> Dict[str, Any]:
+    def process_voter_pdf(
+        db: Session,
+        booth_id: int,
+        filename: str,
+        pdf_file: PDFFile,
+        upload_log_id: Optional[int] = None,
+        revision: bool = False
+    ) -> Dict[str, Any]:
         """
         Process voter PDF and save to database
+        
+        Houses and voters are written with batched statements and committed
+        together, so a failed upload leaves no partial data behind.
+        Pass upload_log_id to report into an existing (queued) upload log.
+        
+        Uploads are identified by the SHA-256 of the file: the same file as
+        the booth's last completed upload is marked "duplicate" without being
+        parsed, and a file parsed before (for any booth) reuses its cached
+        voter records instead of going through pdfplumber again.
+        
+        By default only voters that aren't registered yet are added; with
+        revision=True the booth is brought in line with the roll instead
+        (see apply_roll_revision).
+        
+        The time spent in each stage and the pages, lines and voters read are
+        recorded on the upload log (see StageTimer).
         """
+        timer = StageTimer()
         try:
-            # Create upload log
-            upload_log_data = schemas.UploadLogCreate(
-                filename=filename,
-                booth_id=booth_id,
-                status="processing"
-            )
-            upload_log = crud.create_upload_log(db, upload_log_data)
+            # Create upload log, or pick up the one the job was queued with
+            if upload_log_id is None:
+                upload_log_data = schemas.UploadLogCreate(
+                    filename=filename,
+                    booth_id=booth_id,
+                    status="processing"
+                )
+                upload_log = crud.create_upload_log(db, upload_log_data)
+            else:
+                upload_log = crud.update_upload_log_status(db, upload_log_id, "processing")
+            
+            last_progress = 0.0
             
-            # Extract voter data from PDF
-            voter_data = PDFProcessingService.extract_voter_data_from_pdf(file_content)
+            def report_progress(pages_done: int, total_pages: int):
+                # Best effort: a failed update (e.g. "database is locked" while
+                # another upload writes) is logged and must not abort extraction
+                nonlocal last_progress
+                now = time.monotonic()
+                if now - last_progress < UPLOAD_PROGRESS_INTERVAL and pages_done < total_pages:
+                    return
+                last_progress = now
+                try:
+                    crud.update_upload_log_status(
+                        db, upload_log.id, f"processing {pages_done}/{total_pages} pages"
+                    )
+                except Exception as e:
+                    db.rollback()
+                    logger.warning("Could not update the progress of upload %s: %s", upload_log.id, e)
+            
+            with timer.stage("hash"):
+                content_hash = content_sha256(pdf_file)
+            crud.set_upload_log_content_hash(db, upload_log.id, content_hash)
+            
+            # Re-uploading the roll the booth was last loaded from changes nothing
+            last_upload = crud.get_last_completed_upload(db, booth_id)
+            if last_upload and last_upload.content_hash == content_hash:
+                crud.update_upload_log(db, upload_log.id, 0, 0, "duplicate", **timer.log_fields())
+                return {
+                    'success': True,
+                    'message': f'Same file as upload {last_upload.id}, nothing to change',
+                    'upload_log_id': upload_log.id,
+                    'stats': {
+                        'total_voters': 0,
+                        'total_houses': 0
+                    }
+                }
+            
+            # Extract voter data from PDF, or reuse the records of an earlier parse
+            with timer.stage("cache"):
+                voter_data = crud.get_parsed_roll(db, content_hash, PDF_EXTRACT_MODE, PARSER_VERSION)
+            if voter_data is None:
+                voter_data = PDFProcessingService.extract_voter_data_from_pdf(
+                    pdf_file, progress=report_progress, timer=timer
+                )
+                if voter_data:
+                    with timer.stage("cache"):
+                        crud.save_parsed_roll(db, content_hash, PDF_EXTRACT_MODE, PARSER_VERSION, voter_data)
+            else:
+                timer.parsed_voter_count = len(voter_data)
             
             if not voter_data:
                 crud.update_upload_log(
                     db, upload_log.id, 0, 0, "failed", 
-                    "No voter data found in PDF"
+                    "No voter data found in PDF", **timer.log_fields()
                 )
                 return {
                     'success': False,
@@ -190,7 +575,7 @@ class PDFProcessingService:
             if not booth:
                 crud.update_upload_log(
                     db, upload_log.id, 0, 0, "failed", 
-                    "Booth not found"
+                    "Booth not found", **timer.log_fields()
                 )
                 return {
                     'success': False,
@@ -198,51 +583,78 @@ class PDFProcessingService:
                     'upload_log_id': upload_log.id
                 }
             
-            # Group voters by house
-            houses_data = {}
-            for voter in voter_data:
-                house_number = voter['house_number']
-                if house_number not in houses_data:
-                    houses_data[house_number] = []
-                houses_data[house_number].append(voter)
-            
-            # Process each house and its voters
-            total_voters_created = 0
-            total_houses_created = 0
-            voters_to_create = []
+            if revision:
+                changeset = PDFProcessingService.apply_roll_revision(db, booth, voter_data, timer=timer)
+                with timer.stage("commit"):
+                    db.commit()
+                crud.update_upload_log(
+                    db, upload_log.id, changeset['added'] + changeset['transferred'],
+                    changeset['houses'], "completed", changeset=changeset, **timer.log_fields()
+                )
+                return {
+                    'success': True,
+                    'message': (
+                        f"Applied revision: {changeset['added']} added, {changeset['updated']} updated, "
+                        f"{changeset['moved'] + changeset['transferred']} moved, {changeset['removed']} removed"
+                    ),
+                    'upload_log_id': upload_log.id,
+                    'stats': {
+                        'total_voters': changeset['added'] + changeset['transferred'],
+                        'total_houses': changeset['houses']
+                    },
+                    'changeset': changeset
+                }
             
-            for house_number, house_voters in houses_data.items():
-                # Get or create house
-                house = crud.get_or_create_house(db, house_number, booth_id)
-                if house:
-                    total_houses_created += 1
+            with timer.stage("houses"):
+                # Group voters by house
+                houses_data = {}
+                for voter in voter_data:
+                    house_number = voter['house_number']
+                    if house_number not in houses_data:
+                        houses_data[house_number] = []
+                    houses_data[house_number].append(voter)
                 
-                # Prepare voters for bulk insert
-                for voter_data_item in house_voters:
-                    # Check if voter already exists
-                    existing_voter = crud.get_voter_by_voter_id(db, voter_data_item['voter_id'])
-                    if not existing_voter:
-                        voter_create = schemas.VoterCreate(
-                            name=voter_data_item['name'],
-                            age=voter_data_item['age'],
-                            gender=voter_data_item['gender'],
-                            voter_id=voter_data_item['voter_id'],
-                            house_id=house.id,
-                            district_name=booth.village.mandal.district.name,
-                            mandal_name=booth.village.mandal.name,
-                            village_name=booth.village.name,
-                            booth_number=booth.booth_number,
-                            house_number=house_number
-                        )
-                        voters_to_create.append(voter_create)
+                # Resolve every house of the roll in one batch
+                house_ids, new_houses = crud.upsert_houses(db, booth_id, list(houses_data))
+                total_houses_created = len(houses_data)
             
-            # Bulk create voters
-            if voters_to_create:
+            with timer.stage("dedup"):
+                # One IN (...) lookup for voters that are already registered
+                existing_voter_ids = crud.get_existing_voter_ids(
+                    db, [voter['voter_id'] for voter in voter_data]
+                )
+            
+            with timer.stage("insert"):
+                location = _booth_location(booth)
+                
+                voters_to_create = []
+                for house_number, house_voters in houses_data.items():
+                    for voter_data_item in house_voters:
+                        if voter_data_item['voter_id'] in existing_voter_ids:
+                            continue
+                        # Also skips repeats of the same voter_id within the roll
+                        existing_voter_ids.add(voter_data_item['voter_id'])
+                        voters_to_create.append({
+                            'name': voter_data_item['name'],
+                            'age': voter_data_item['age'],
+                            'gender': voter_data_item['gender'],
+                            'voter_id': voter_data_item['voter_id'],
+                            'house_id': house_ids[house_number],
+                            **location
+                        })
+                
                 total_voters_created = crud.bulk_create_voters(db, voters_to_create)
+                crud.add_to_rollups(
+                    db, crud.get_rollup_path(db, booth_id=booth_id),
+                    houses=new_houses, voters=total_voters_created
+                )
+            with timer.stage("commit"):
+                db.commit()
             
             # Update upload log
             crud.update_upload_log(
-                db, upload_log.id, total_voters_created, total_houses_created, "completed"
+                db, upload_log.id, total_voters_created, total_houses_created, "completed",
+                **timer.log_fields()
             )
             
             return {
@@ -256,14 +668,162 @@ class PDFProcessingService:
             }
             
         except Exception as e:
+            db.rollback()
+            logger.exception("Processing %s for booth %s failed", filename, booth_id)
+            
             # Update upload log with error
             if 'upload_log' in locals():
                 crud.update_upload_log(
-                    db, upload_log.id, 0, 0, "failed", str(e)
+                    db, upload_log.id, 0, 0, "failed", str(e), **timer.log_fields()
                 )
             
             return {
                 'success': False,
                 'message': f'Error processing PDF: {str(e)}',
                 'upload_log_id': upload_log.id if 'upload_log' in locals() else None
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def apply_roll_revision(
+        db: Session,
+        booth: models.Booth,
+        voter_data: List[Dict[str, Any]],
+        timer: Optional[StageTimer] = None
+    ) -> Dict[str, int]:
+        """
+        Make a booth's voters match a revised roll (no commit)
+        The roll is diffed against the booth's voters in one pass, and only
+        the differences are written, as one bulk changeset:
+        - added: voter IDs not registered anywhere yet
+        - updated: name, age or gender corrected
+        - moved: now in another house of the booth
+        - transferred: registered on another booth until now
+        - removed: the booth's voters missing from the roll
+        Houses left without voters are deleted. Returns the changeset counts.
+        The houses, dedup and insert stages are recorded on the timer if given.
+        """
+        timer = timer or StageTimer()
+        booth_path = crud.get_rollup_path(db, booth_id=booth.id)
+        location = _booth_location(booth)
+        
+        # A voter ID repeated within the roll keeps its first entry
+        roll = {}
+        for voter in voter_data:
+            roll.setdefault(voter['voter_id'], voter)
+        
+        with timer.stage("houses"):
+            house_ids, houses_added = crud.upsert_houses(db, booth.id, [voter['house_number'] for voter in roll.values()])
+        
+        changeset = dict.fromkeys(['added', 'updated', 'moved', 'transferred', 'removed', 'unchanged'], 0)
+        inserts, updates, vacated_houses = [], [], set()
+        rollup_deltas = defaultdict(lambda: defaultdict(int))
+        other_booth_paths = {}
+        
+        # Looking up the roll's voters and diffing them against it is the dedup stage
+        with timer.stage("dedup"):
+            current = crud.get_booth_voter_records(db, booth.id)
+            elsewhere = crud.get_voter_records(db, [voter_id for voter_id in roll if voter_id not in current])
+            
+            for voter_id, voter in roll.items():
+                house_id = house_ids[voter['house_number']]
+                record = current.get(voter_id)
+                # Most of a revised roll is unchanged: one tuple comparison each
+                if record is not None and (record.name, record.age, record.gender, record.house_id) == (
+                    voter['name'], voter['age'], voter['gender'], house_id
+                ):
+                    changeset['unchanged'] += 1
+                    continue
+                
+                fields = {'name': voter['name'], 'age': voter['age'], 'gender': voter['gender'], 'house_id': house_id}
+                record = record or elsewhere.get(voter_id)
+                if record is None:
+                    inserts.append({'voter_id': voter_id, **fields, **location})
+                    changeset['added'] += 1
+                elif record.booth_id != booth.id:
+                    updates.append({'id': record.id, **fields, **location})
+                    vacated_houses.add(record.house_id)
+                    changeset['transferred'] += 1
+                    if record.booth_id not in other_booth_paths:
+                        other_booth_paths[record.booth_id] = crud.get_rollup_path(db, booth_id=record.booth_id)
+                    for key in other_booth_paths[record.booth_id]:
+                        rollup_deltas[key]['voters'] -= 1
+                elif record.house_id != house_id:
+                    updates.append({'id': record.id, **fields})
+                    vacated_houses.add(record.house_id)
+                    changeset['moved'] += 1
+                else:
+                    updates.append({'id': record.id, **fields})
+                    changeset['updated'] += 1
+            
+            removed = [record for voter_id, record in current.items() if voter_id not in roll]
+            changeset['removed'] = len(removed)
+            vacated_houses.update(record.house_id for record in removed)
+        
+        with timer.stage("insert"):
+            changeset['added'] = crud.bulk_create_voters(db, inserts)
+            crud.bulk_update_voters(db, updates)
+            crud.bulk_delete_voters(db, [record.id for record in removed])
+            houses_removed = crud.delete_empty_houses(db, vacated_houses)
+            changeset['houses'] = len(set(house_ids[voter['house_number']] for voter in roll.values()))
+            changeset['houses_added'] = houses_added
+            changeset['houses_removed'] = houses_removed.get(booth.id, 0)
+            
+            for key in booth_path:
+                rollup_deltas[key]['voters'] += changeset['added'] + changeset['transferred'] - changeset['removed']
+                rollup_deltas[key]['houses'] += houses_added - changeset['houses_removed']
+            for booth_id, count in houses_removed.items():
+                if booth_id != booth.id:
+                    for key in other_booth_paths[booth_id]:
+                        rollup_deltas[key]['houses'] -= count
+            crud.apply_rollup_deltas(db, rollup_deltas)
+        
+        return changeset
+
+class BatchUploadService:
+    """Service for mapping batches of voter PDFs to their booths"""
+    
+    @staticmethod
+    def resolve_manifest(db: Session, manifest_content: bytes) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+        """
+        Resolve a manifest CSV to booth ids
+        Expected columns: filename, booth_number and either village_id or
+        District, Mandal, Village names
+        
+        Returns (filename -> booth_id, rows that could not be resolved)
+        """
+        df = pd.read_csv(io.BytesIO(manifest_content), dtype=str).fillna('')
+        df.columns = [column.strip() for column in df.columns]
+        df = df.apply(lambda x: x.str.strip())
+        
+        by_name = all(col in df.columns for col in ['District', 'Mandal', 'Village'])
+        if not {'filename', 'booth_number'} <= set(df.columns) or not ('village_id' in df.columns or by_name):
+            raise ValueError(
+                "Manifest must contain columns: filename, booth_number and "
+                "village_id (or District, Mandal, Village)"
+            )
+        
+        # Resolve every row against preloaded id maps instead of per-row lookups
+        if 'village_id' in df.columns:
+            village_ids = [int(v) if v.isdigit() else None for v in df['village_id']]
+        else:
+            district_ids = crud.get_district_id_map(db)
+            mandal_ids = crud.get_mandal_id_map(db)
+            village_id_map = crud.get_village_id_map(db)
+            village_ids = []
+            for district, mandal, village in zip(df['District'], df['Mandal'], df['Village']):
+                mandal_id = mandal_ids.get((district_ids.get(district), mandal))
+                village_ids.append(village_id_map.get((mandal_id, village)))
+        booth_ids = crud.get_booth_id_map(db, [v for v in village_ids if v is not None])
+        
+        booths_by_file = {}
+        errors = []
+        for filename, booth_number, village_id in zip(df['filename'], df['booth_number'], village_ids):
+            filename = os.path.basename(filename)
+            if village_id is None:
+                errors.append({'filename': filename, 'reason': 'Village not found'})
+            elif (village_id, booth_number) not in booth_ids:
+                errors.append({'filename': filename, 'reason': f'Booth {booth_number} not found'})
+            else:
+                booths_by_file[filename] = booth_ids[(village_id, booth_number)]
+        
+        return booths_by_file, errors
@@ -0,0 +1,141 @@
+"""
+Streaming spreadsheet readers
+Imports read CSV files and .xlsx workbooks (in openpyxl's read-only mode)
+one row at a time and receive them in fixed-size chunks of records, so a
+large file is never loaded whole
+"""
+
+import csv
+import io
+import os
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+from app.uploads import XLS_MAGIC, XLSX_MAGIC
+
+# Records per chunk handed to an import
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+# Rows searched for the header row (the GP list has a title row above it)
+HEADER_SEARCH_ROWS = 10
+
+# A spreadsheet given by the path of a (spooled) file or by its content
+SpreadsheetFile = Union[str, bytes]
+
+# field -> the header names it is read from, matched ignoring case and spacing
+ColumnMap = Dict[str, List[str]]
+
+HIERARCHY_COLUMNS: ColumnMap = {
+    "District": ["District", "Name of the District"],
+    "Mandal": ["Mandal", "Name of the Mandal"],
+    "Village": ["Village", "Name of the Gram Panchayat", "Gram Panchayat"],
+}
+
+BOOTH_COLUMNS: ColumnMap = {
+    **HIERARCHY_COLUMNS,
+    "Booth Number": ["Booth Number", "booth_number", "Booth No", "Polling Station No", "PS No"],
+    "Booth Name": ["Booth Name", "booth_name", "Polling Station Name", "PS Name"],
+}
+
+def _read_head(source: SpreadsheetFile) -> bytes:
+    if not isinstance(source, str):
+        return source[:8]
+    with open(source, "rb") as f:
+        return f.read(8)
+
+def _xlsx_rows(source: SpreadsheetFile) -> Iterator[Sequence[Any]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(
+        source if isinstance(source, str) else io.BytesIO(source), read_only=True, data_only=True
+    )
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _xls_rows(source: SpreadsheetFile) -> Iterator[Sequence[Any]]:
+    # There is no streaming reader for the old binary format, so .xls
+    # workbooks are still read whole
+    import pandas as pd
+
+    frame = pd.read_excel(source if isinstance(source, str) else io.BytesIO(source), header=None)
+    for row in frame.itertuples(index=False, name=None):
+        yield [None if pd.isna(value) else value for value in row]
+
+def _csv_rows(source: SpreadsheetFile) -> Iterator[Sequence[Any]]:
+    if not isinstance(source, str):
+        yield from csv.reader(io.StringIO(source.decode("utf-8-sig")))
+        return
+    with open(source, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+def iter_rows(source: SpreadsheetFile) -> Iterator[Sequence[Any]]:
+    """The rows of a CSV file or of a workbook's first sheet, by its signature"""
+    head = _read_head(source)
+    if head.startswith(XLSX_MAGIC):
+        return _xlsx_rows(source)
+    if head.startswith(XLS_MAGIC):
+        return _xls_rows(source)
+    return _csv_rows(source)
+
+def _header_key(value: Any) -> str:
+    return " ".join(str(value).split()).lower() if value is not None else ""
+
+def find_columns(row: Sequence[Any], columns: ColumnMap) -> Optional[Dict[str, int]]:
+    """Position of each field's column if the row is a header naming them all"""
+    headers = {}
+    for index, value in enumerate(row):
+        headers.setdefault(_header_key(value), index)
+    positions = {}
+    for field, names in columns.items():
+        index = next((headers[key] for key in map(_header_key, names) if key in headers), None)
+        if index is None:
+            return None
+        positions[field] = index
+    return positions
+
+def _cell(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+def iter_record_chunks(
+    source: SpreadsheetFile,
+    columns: ColumnMap,
+    chunk_size: Optional[int] = None,
+    invalid_rows: Optional[List[int]] = None
+) -> Iterator[List[Dict[str, str]]]:
+    """
+    Records {field: value} of a spreadsheet, chunk_size (default:
+    IMPORT_CHUNK_SIZE) at a time
+    The header is the first of the top HEADER_SEARCH_ROWS rows naming every
+    field. Rows with a blank field are skipped, and their row numbers are
+    appended to invalid_rows if given; empty rows and a column numbering row
+    ("1 2 3 ...") under the header are skipped silently. Raises ValueError
+    without a header.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    rows = iter_rows(source)
+    positions = None
+    for header_number, row in enumerate(islice(rows, HEADER_SEARCH_ROWS), 1):
+        positions = find_columns(row, columns)
+        if positions:
+            break
+    if not positions:
+        raise ValueError(f"File must contain columns: {list(columns)}")
+
+    chunk = []
+    for row_number, row in enumerate(rows, header_number + 1):
+        record = {field: _cell(row[index]) if index < len(row) else "" for field, index in positions.items()}
+        if not all(record.values()):
+            if any(record.values()) and invalid_rows is not None:
+                invalid_rows.append(row_number)
+            continue
+        if all(value.isdigit() for value in record.values()):
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
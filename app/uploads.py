@@ -0,0 +1,212 @@
+"""
+Upload spooling and validation
+Uploads are copied to disk in chunks with a size limit and checked before
+any parser sees them; the processors then open the spooled file by path
+"""
+
+import codecs
+import os
+import tempfile
+import zipfile
+import zlib
+from typing import BinaryIO, Callable, List, Tuple
+import pdfplumber
+
+# Largest accepted uploads, in megabytes (the Excel limit also covers CSV files)
+MAX_PDF_UPLOAD_MB = int(os.getenv("MAX_PDF_UPLOAD_MB", "100"))
+MAX_EXCEL_UPLOAD_MB = int(os.getenv("MAX_EXCEL_UPLOAD_MB", "20"))
+# Largest ZIP archive of voter PDFs, and most PDF bytes extracted from one
+MAX_ZIP_UPLOAD_MB = int(os.getenv("MAX_ZIP_UPLOAD_MB", "500"))
+# Voter PDFs with more pages are refused
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "2000"))
+
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Spooled uploads live here, named "<pid>-..." after the server process that
+# owns them, so files left by a process that died can be swept
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "politiq-uploads"))
+
+# PDFs carry their header within the first 1024 bytes; .xlsx files are ZIP
+# archives and .xls files OLE2 compound documents
+PDF_MAGIC = b"%PDF-"
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+EXCEL_MAGIC = (XLSX_MAGIC, XLS_MAGIC)
+
+class UploadError(ValueError):
+    """A refused upload, with the HTTP status to answer it with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def spool_upload(fileobj: BinaryIO, suffix: str, max_mb: int) -> str:
+    """
+    Copy an upload to a temporary file one chunk at a time; returns its path
+    Raises UploadError (413) as soon as the upload grows past max_mb
+    """
+    limit = max_mb * 1024 * 1024
+    size = 0
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        suffix=suffix, prefix=f"{os.getpid()}-", dir=UPLOAD_SPOOL_DIR, delete=False
+    ) as spool:
+        try:
+            while True:
+                chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise UploadError(f"File is larger than {max_mb} MB", status_code=413)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            os.remove(spool.name)
+            raise
+    return spool.name
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this id runs on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def sweep_spool_dir() -> int:
+    """
+    Remove the spooled uploads of server processes that are gone (including
+    an earlier process with this one's pid); call on startup, before any
+    upload is spooled. Returns the number of files removed
+    """
+    try:
+        names = os.listdir(UPLOAD_SPOOL_DIR)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        pid = name.split("-", 1)[0]
+        if not pid.isdigit() or (int(pid) != os.getpid() and process_alive(int(pid))):
+            continue
+        try:
+            os.remove(os.path.join(UPLOAD_SPOOL_DIR, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def read_upload(fileobj: BinaryIO, max_mb: int) -> bytes:
+    """Read a small upload (e.g. a manifest) whole; raises UploadError (413) past max_mb"""
+    limit = max_mb * 1024 * 1024
+    content = fileobj.read(limit + 1)
+    if len(content) > limit:
+        raise UploadError(f"File is larger than {max_mb} MB", status_code=413)
+    return content
+
+def validate_pdf(path: str) -> int:
+    """Check a spooled voter PDF's header and page count; returns the page count"""
+    with open(path, "rb") as spooled:
+        if PDF_MAGIC not in spooled.read(1024):
+            raise UploadError("File is not a PDF")
+    try:
+        with pdfplumber.open(path) as pdf:
+            page_count = len(pdf.pages)
+    except Exception as e:
+        raise UploadError(f"PDF could not be read: {str(e)}")
+    if page_count == 0:
+        raise UploadError("PDF has no pages")
+    if page_count > MAX_PDF_PAGES:
+        raise UploadError(f"PDF has {page_count} pages, the limit is {MAX_PDF_PAGES}", status_code=413)
+    return page_count
+
+def validate_excel(path: str):
+    """Check that a spooled file starts like an .xlsx or .xls workbook"""
+    with open(path, "rb") as spooled:
+        if not spooled.read(8).startswith(EXCEL_MAGIC):
+            raise UploadError("File is not an Excel workbook")
+
+def validate_csv(path: str):
+    """Check that a spooled file starts as UTF-8 text"""
+    with open(path, "rb") as spooled:
+        head = spooled.read(UPLOAD_CHUNK_SIZE)
+    if b"\x00" in head:
+        raise UploadError("File is not a CSV file")
+    try:
+        # Not final: the chunk may end inside a character
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+    except UnicodeDecodeError:
+        raise UploadError("CSV file is not UTF-8 text")
+
+def validate_zip(path: str):
+    """Check that a spooled file is a readable ZIP archive"""
+    if not zipfile.is_zipfile(path):
+        raise UploadError("File is not a valid ZIP file")
+
+def _spool_validated(fileobj: BinaryIO, suffix: str, max_mb: int, validate: Callable[[str], object]) -> str:
+    path = spool_upload(fileobj, suffix, max_mb)
+    try:
+        validate(path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def spool_pdf(fileobj: BinaryIO) -> str:
+    """Spool and validate an uploaded voter PDF; the caller owns (and removes) the returned file"""
+    return _spool_validated(fileobj, ".pdf", MAX_PDF_UPLOAD_MB, validate_pdf)
+
+def spool_excel(fileobj: BinaryIO) -> str:
+    """Spool and validate an uploaded hierarchy workbook; the caller owns (and removes) the returned file"""
+    return _spool_validated(fileobj, ".xlsx", MAX_EXCEL_UPLOAD_MB, validate_excel)
+
+def spool_spreadsheet(fileobj: BinaryIO, filename: str) -> str:
+    """Spool and validate an uploaded .csv file or Excel workbook, by its file name"""
+    if filename.lower().endswith(".csv"):
+        return _spool_validated(fileobj, ".csv", MAX_EXCEL_UPLOAD_MB, validate_csv)
+    return spool_excel(fileobj)
+
+def spool_zip(fileobj: BinaryIO) -> str:
+    """Spool and validate an uploaded ZIP archive of voter PDFs; the caller owns (and removes) the returned file"""
+    return _spool_validated(fileobj, ".zip", MAX_ZIP_UPLOAD_MB, validate_zip)
+
+def spool_zip_pdfs(zip_path: str) -> List[Tuple[str, str]]:
+    """
+    Spool and validate every PDF entry of a spooled ZIP archive like an
+    uploaded PDF; returns (filename, path) pairs owned by the caller
+    Raises UploadError naming the entry if one is refused, or (413) once the
+    extracted PDFs add up to more than MAX_ZIP_UPLOAD_MB
+    """
+    limit = MAX_ZIP_UPLOAD_MB * 1024 * 1024
+    extracted = 0
+    spooled = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                    continue
+                filename = os.path.basename(info.filename)
+                try:
+                    with archive.open(info) as entry:
+                        path = _spool_validated(entry, ".pdf", MAX_PDF_UPLOAD_MB, validate_pdf)
+                except UploadError as e:
+                    raise UploadError(f"{filename}: {str(e)}", status_code=e.status_code)
+                spooled.append((filename, path))
+                extracted += os.path.getsize(path)
+                if extracted > limit:
+                    raise UploadError(
+                        f"PDFs in the archive add up to more than {MAX_ZIP_UPLOAD_MB} MB", status_code=413
+                    )
+    except (zipfile.BadZipFile, zlib.error) as e:
+        for _, path in spooled:
+            os.remove(path)
+        raise UploadError(f"File is not a valid ZIP file: {str(e)}")
+    except BaseException:
+        for _, path in spooled:
+            os.remove(path)
+        raise
+    return spooled
+
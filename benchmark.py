@@ -0,0 +1,853 @@
+#!/usr/bin/env python3
+"""
+PolitiQ performance benchmarks
+Generates synthetic electoral rolls and times the processing pipeline
+
+Usage: python benchmark.py <benchmark> [options]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Lines of roll text that fit on one synthetic A4 page
+LINES_PER_PAGE = 60
+
+
+def synthetic_roll_lines(houses, voters_per_house=4, prefix="ABC"):
+    """Roll text lines in the format shown in sample_data/sample_voter_data.txt"""
+    lines = []
+    serial = 0
+    for house in range(1, houses + 1):
+        lines.append(f"House No: {house}-{chr(65 + house % 3)}")
+        for member in range(1, voters_per_house + 1):
+            serial += 1
+            gender = "M" if member % 2 else "F"
+            lines.append(f"{member}. Voter{serial} Kumar {18 + serial % 60} {gender} {prefix}{serial:07d}")
+    return lines
+
+
+def pdf_string(text):
+    """A PDF literal string"""
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def build_pdf(lines, lines_per_page=LINES_PER_PAGE, padding=0):
+    """Build a minimal text-only PDF, one line of text per row"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    streams = []
+    for page_lines in pages:
+        stream = ["BT /F1 10 Tf 12 TL 40 800 Td"]
+        for line in page_lines:
+            stream.append(f"{pdf_string(line)} Tj T*")
+        stream.append("ET")
+        streams.append("\n".join(stream))
+    return assemble_pdf(streams, padding)
+
+
+def assemble_pdf(streams, padding=0):
+    """
+    A4 PDF with one page per content stream, text set in Helvetica (/F1)
+    padding adds about that many bytes of comment lines, for large files that stay quick to parse
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for stream in streams:
+        content = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    comment = b"%" + b"x" * 1022 + b"\n"
+    out += comment * (padding // len(comment))
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+# Box roll geometry: three boxes across an A4 page, fields 11pt apart
+BOX_COLUMNS_X = (25, 222, 420)
+BOX_LINE_HEIGHT = 11
+BOX_ROW_HEIGHT = 7 * BOX_LINE_HEIGHT
+BOX_ROWS_PER_PAGE = 10
+
+
+def synthetic_box_voters(count):
+    """Voters for a box-layout roll; every 7th has a name long enough to wrap onto a second line"""
+    voters = []
+    for serial in range(1, count + 1):
+        name = f"Voter{serial} Kumar"
+        if serial % 7 == 0:
+            name += " Venkata Satya Narayana"
+        voters.append({
+            'name': name,
+            'age': 18 + serial % 60,
+            'gender': "M" if serial % 2 else "F",
+            'voter_id': f"BOX{serial:07d}",
+            'house_number': f"{1 + (serial - 1) // 3}-{chr(65 + serial % 3)}",
+        })
+    return voters
+
+
+def build_box_pdf(voters):
+    """
+    Box-layout roll PDF with each field placed at its own position, as on
+    CEO Telangana rolls: wrapped names push the rest of their box down, so
+    the boxes of a row no longer share text lines
+    """
+    per_page = BOX_ROWS_PER_PAGE * len(BOX_COLUMNS_X)
+    streams = []
+    for page_start in range(0, len(voters), per_page):
+        stream = ["BT /F1 8 Tf"]
+        for index, voter in enumerate(voters[page_start:page_start + per_page]):
+            row, column = divmod(index, len(BOX_COLUMNS_X))
+            name_lines = [f"Name : {voter['name']}"]
+            if len(voter['name']) > 20:
+                words = name_lines[0].split(" ")
+                name_lines = [" ".join(words[:4]), " ".join(words[4:])]
+            fields = [f"{page_start + index + 1} {voter['voter_id']}"] + name_lines + [
+                f"Father's Name: Father{page_start + index + 1} Kumar",
+                f"House Number : {voter['house_number']}",
+                f"Age : {voter['age']} Gender : {'Male' if voter['gender'] == 'M' else 'Female'}",
+            ]
+            top = 800 - row * BOX_ROW_HEIGHT
+            for line_number, field in enumerate(fields):
+                y = top - line_number * BOX_LINE_HEIGHT
+                stream.append(f"1 0 0 1 {BOX_COLUMNS_X[column]} {y} Tm {pdf_string(field)} Tj")
+        stream.append("ET")
+        streams.append("\n".join(stream))
+    return assemble_pdf(streams)
+
+
+def bench_pdf_extraction(args):
+    """Serial vs process-pool page extraction of one roll"""
+    from app.services import PDFProcessingService
+
+    lines = synthetic_roll_lines(args.pages * LINES_PER_PAGE // 5)
+    pdf = build_pdf(lines)
+    print(f"📄 Synthetic roll: {args.pages} pages, {len(pdf) / 1024:.0f} KB")
+
+    results = {}
+    for workers in sorted({1, args.workers}):
+        # Warm-up run starts the pool processes outside the timing
+        PDFProcessingService.extract_voter_data_from_pdf(pdf, workers=workers)
+        start = time.perf_counter()
+        voters = PDFProcessingService.extract_voter_data_from_pdf(pdf, workers=workers)
+        elapsed = time.perf_counter() - start
+        results[workers] = voters
+        print(f"   workers={workers}: {elapsed:.2f}s, {len(voters)} voters")
+
+    if len(results) > 1:
+        serial, parallel = results[1], results[args.workers]
+        print(f"✅ Identical output: {serial == parallel}")
+
+
+FIRST_NAMES = ["Ramesh", "Suresh", "Lakshmi", "Venkat", "Priya", "Kavya", "Ahmed", "Fatima", "Srinivas", "Padma"]
+LAST_NAMES = ["Reddy", "Rao", "Kumar", "Sharma", "Khan", "Goud", "Naidu", "Yadav", "Chary", "Devi"]
+
+
+def build_voter_database(path, voters, voters_per_booth=1000, voters_per_house=4, revision="head"):
+    """
+    Synthetic hierarchy and voters in a fresh SQLite database at a schema revision
+    Returns (engine, seconds spent inserting the voters)
+    """
+    from sqlalchemy import MetaData, Table, create_engine, insert
+    from app import models
+    from app.migrations import init_database, upgrade_database
+
+    engine = create_engine(f"sqlite:///{path}")
+    if revision == "head":
+        init_database(engine)
+    else:
+        upgrade_database(engine, revision)
+    # Reflected, so older revisions get their own voter columns
+    voters_table = Table("voters", MetaData(), autoload_with=engine)
+    rng = random.Random(42)
+    booths = max(1, voters // voters_per_booth)
+
+    def booth_of(house):
+        return min(booths, 1 + (house * voters_per_house) // voters_per_booth)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.District), [{"id": 1, "name": "Benchmark"}])
+        conn.execute(insert(models.Mandal), [{"id": 1, "name": "Benchmark", "district_id": 1}])
+        conn.execute(insert(models.Village), [{"id": 1, "name": "Benchmark", "mandal_id": 1}])
+        conn.execute(insert(models.Booth), [
+            {"id": booth, "booth_number": str(booth), "booth_name": f"Booth {booth}", "village_id": 1}
+            for booth in range(1, booths + 1)
+        ])
+        conn.execute(insert(models.House), [
+            {"id": house, "house_number": f"{house % 500}-{chr(65 + house // 500 % 26)}", "booth_id": booth_of(house)}
+            for house in range(1, voters // voters_per_house + 2)
+        ])
+
+    insert_seconds = 0.0
+    for start in range(0, voters, 50000):
+        rows = []
+        for serial in range(start + 1, min(start + 50000, voters) + 1):
+            house = 1 + serial // voters_per_house
+            row = {
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "age": 18 + serial % 70,
+                "gender": "MF"[serial % 2],
+                "voter_id": f"TS{chr(65 + serial % 26)}{serial:07d}",
+                "house_id": house,
+                "booth_id": booth_of(house),
+                "village_id": 1,
+                "mandal_id": 1,
+                "district_id": 1,
+                "district_name": "Benchmark",
+                "mandal_name": "Benchmark",
+                "village_name": "Benchmark",
+                "booth_number": str(booth_of(house)),
+                "house_number": f"{house % 500}-{chr(65 + house // 500 % 26)}",
+            }
+            rows.append({column: value for column, value in row.items() if column in voters_table.c})
+        batch_start = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(voters_table), rows)
+        insert_seconds += time.perf_counter() - batch_start
+    return engine, insert_seconds
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_voter_search(args):
+    """LIKE vs FTS5 latency of /api/voters/search text filters"""
+    from sqlalchemy.orm import sessionmaker
+    from app import crud
+    from app.search import ensure_voter_search_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        engine, _ = build_voter_database(os.path.join(tmp, "bench.db"), args.voters)
+        print(f"🗄️  Built {args.voters:,} voters in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        ensure_voter_search_index(engine)
+        print(f"🔎 Built full-text index in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(7)
+        searches = (
+            [{"name": rng.choice(FIRST_NAMES)[1:5]} for _ in range(args.queries // 3)]
+            + [{"voter_id": f"{rng.randrange(args.voters):07d}"[:5]} for _ in range(args.queries // 3)]
+            + [{"name": rng.choice(LAST_NAMES), "house_number": f"{rng.randrange(500)}-"} for _ in range(args.queries // 3)]
+        )
+
+        db = sessionmaker(bind=engine)()
+        for label, use_fts in [("LIKE", False), ("FTS5", True)]:
+            timings = []
+            for filters in searches:
+                start = time.perf_counter()
+                query = crud.search_voters_query(db, use_fts=use_fts, **filters)
+                query.count()
+                query.limit(50).all()
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"   {label}: p50 {statistics.median(timings):.1f} ms, p95 {percentile(timings, 95):.1f} ms")
+        db.close()
+        engine.dispose()
+
+
+def bench_voter_schema(args):
+    """Database size and voter insert throughput: location name columns vs hierarchy ids"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        # Revision 0001 stores the location names on every voter row, 0002 adds
+        # the hierarchy ids beside them and the current schema keeps only the ids
+        for label, revision in [("name columns", "0001"), ("names and ids", "0002"), ("hierarchy ids", "head")]:
+            path = os.path.join(tmp, f"{revision}.db")
+            engine, seconds = build_voter_database(path, args.voters, revision=revision)
+            engine.dispose()
+            size = os.path.getsize(path) / (1024 * 1024)
+            results[label] = (size, args.voters / seconds)
+            print(f"   {label}: {size:,.0f} MB, {args.voters / seconds:,.0f} voters/s inserted")
+
+        new_size, new_rate = results["hierarchy ids"]
+        for label in ["name columns", "names and ids"]:
+            old_size, old_rate = results[label]
+            print(f"✅ vs {label}: {1 - new_size / old_size:.0%} smaller, {new_rate / old_rate:.1f}x insert throughput")
+
+
+def write_gp_list(path, rows):
+    """A GP list workbook (title row, header row, column numbering row) or CSV with rows gram panchayats"""
+    header = ["Sl.No", "Name of the District", "Name of the Mandal", "Name of the Gram Panchayat", "Remarks"]
+    records = (
+        [serial, f"District {serial // 20000}", f"Mandal {serial // 400}", f"Gram Panchayat {serial}", None]
+        for serial in range(1, rows + 1)
+    )
+    if path.endswith(".csv"):
+        import csv
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(records)
+        return
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("sheet1")
+    sheet.append([f"List of GPs {rows}"])
+    sheet.append(header)
+    sheet.append(list(range(1, len(header) + 1)))
+    for record in records:
+        sheet.append(record)
+    workbook.save(path)
+
+
+def _timed_import(kind, path):
+    """Run one hierarchy read or import in a fresh process; returns (seconds, peak RSS MB)"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app.services  # noqa: F401 - counted in every run's baseline
+
+    start = time.perf_counter()
+    if kind == "baseline":
+        pass
+    elif kind == "pandas":
+        import pandas as pd
+
+        pd.read_excel(path, header=1)
+    else:
+        from app.migrations import init_database
+        from app.services import HierarchyService
+
+        engine = create_engine(f"sqlite:///{path}.db")
+        init_database(engine)
+        with Session(engine) as db:
+            result = HierarchyService.import_hierarchy(db, path)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+    return time.perf_counter() - start, peak_rss_mb(os.getpid())
+
+
+def bench_hierarchy_import(args):
+    """Streaming hierarchy import of a large GP list (xlsx and csv) vs reading it with pandas"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "gp_list.xlsx")
+        csv_path = os.path.join(tmp, "gp_list.csv")
+        write_gp_list(xlsx_path, args.rows)
+        write_gp_list(csv_path, args.rows)
+        print(f"📄 {args.rows:,} rows: {os.path.getsize(xlsx_path) / 1024 / 1024:.1f} MB xlsx")
+
+        context = multiprocessing.get_context("spawn")
+        for label, kind, path in [
+            ("modules loaded, nothing read", "baseline", xlsx_path),
+            ("pd.read_excel only (previous import's read step)", "pandas", xlsx_path),
+            ("streaming import, xlsx", "import", xlsx_path),
+            ("streaming import, csv", "import", csv_path),
+        ]:
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                seconds, peak = pool.submit(_timed_import, kind, path).result()
+            print(f"   {label}: {seconds:.1f}s, peak RSS {peak:.0f} MB")
+
+
+def bench_booth_import(args):
+    """Booth import from a spreadsheet vs creating booths one at a time like POST /api/booths"""
+    import csv
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app import crud, schemas
+    from app.migrations import init_database
+    from app.services import HierarchyService
+
+    one_at_a_time = min(args.rows, 2000)
+    with tempfile.TemporaryDirectory() as tmp:
+        gp_path = os.path.join(tmp, "gp_list.csv")
+        booths_path = os.path.join(tmp, "booths.csv")
+        # About 3 booths per gram panchayat
+        write_gp_list(gp_path, max(1, args.rows // 3))
+        with open(booths_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["District", "Mandal", "Village", "Booth Number", "Booth Name"])
+            for booth in range(args.rows):
+                serial = 1 + booth % max(1, args.rows // 3)
+                writer.writerow([
+                    f"District {serial // 20000}", f"Mandal {serial // 400}", f"Gram Panchayat {serial}",
+                    str(booth), f"Polling Station {booth}"
+                ])
+
+        results = {}
+        for label in ["one at a time", "spreadsheet import"]:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, label.replace(' ', '_'))}.db")
+            init_database(engine)
+            with Session(engine) as db:
+                HierarchyService.import_hierarchy(db, gp_path)
+                start = time.perf_counter()
+                if label == "one at a time":
+                    villages = crud.get_village_name_index(db)
+                    with open(booths_path, newline="") as f:
+                        reader = csv.DictReader(f)
+                        for row in list(reader)[:one_at_a_time]:
+                            village_id = villages[(row["District"], row["Mandal"], row["Village"])][0]
+                            if not crud.get_booth_by_number_and_village(db, row["Booth Number"], village_id):
+                                crud.create_booth(db, schemas.BoothCreate(
+                                    booth_number=row["Booth Number"], booth_name=row["Booth Name"], village_id=village_id
+                                ))
+                    booths = one_at_a_time
+                else:
+                    result = HierarchyService.import_booths(db, booths_path)
+                    booths = result["stats"]["booths_created"]
+                seconds = time.perf_counter() - start
+            engine.dispose()
+            results[label] = booths / seconds
+            print(f"   {label}: {booths:,} booths in {seconds:.2f}s ({booths / seconds:,.0f} booths/s)")
+
+        print(f"✅ {results['spreadsheet import'] / results['one at a time']:.0f}x booths/s")
+
+
+def legacy_parse_voter_text(text):
+    """The line-by-line parser that app.parsers replaced, kept as the baseline"""
+    import re
+
+    voters = []
+    current_house = None
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        house_match = re.search(r'House\s+No\.?\s*:?\s*(\d+[A-Za-z]*)', line, re.IGNORECASE)
+        if house_match:
+            current_house = house_match.group(1)
+            continue
+        voter_match = re.search(r'(\w+(?:\s+\w+)*)\s+(\d{1,3})\s+([MF])\s+([A-Z]{3}\d{7})', line)
+        if voter_match and current_house:
+            voters.append({
+                'name': voter_match.group(1).strip(),
+                'age': int(voter_match.group(2)),
+                'gender': voter_match.group(3),
+                'voter_id': voter_match.group(4),
+                'house_number': current_house
+            })
+    return voters
+
+
+def bench_roll_parsing(args):
+    """Parse throughput of app.parsers vs the legacy parser on the sample roll scaled up"""
+    from app.parsers import parse_voter_roll
+
+    sample_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_data", "sample_voter_data.txt")
+    with open(sample_path, encoding="utf-8") as sample:
+        sample_text = sample.read()
+    sample_voters = len(parse_voter_roll([sample_text]))
+    # One page of text per copy of the sample, up to the requested voters
+    pages = [sample_text] * max(1, args.voters // sample_voters)
+    line_count = sum(page.count("\n") + 1 for page in pages)
+    print(f"📄 {line_count:,} lines, {sample_voters * len(pages):,} voters")
+
+    results = {}
+    for label, parse in [("legacy", lambda: legacy_parse_voter_text("\n".join(pages))),
+                         ("layout profiles", lambda: parse_voter_roll(pages))]:
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            results[label] = parse()
+            timings.append(time.perf_counter() - start)
+        print(f"   {label}: {line_count / min(timings):,.0f} lines/s ({len(results[label]):,} voters)")
+
+    # The legacy parser cut house numbers such as 12-A down to 12
+    same = [(v["name"], v["age"], v["gender"], v["voter_id"]) for v in results["legacy"]] == [
+        (v["name"], v["age"], v["gender"], v["voter_id"]) for v in results["layout profiles"]
+    ]
+    print(f"✅ Same voters: {same}")
+
+
+def bench_pdf_modes(args):
+    """Time and accuracy of text vs word-position PDF extraction on house-list and box rolls"""
+    from app.parsers import parse_voter_roll
+    from app.services import PDF_EXTRACT_MODES, PDFProcessingService
+
+    house_lines = synthetic_roll_lines(args.pages * LINES_PER_PAGE // 5)
+    box_voters = synthetic_box_voters(args.pages * BOX_ROWS_PER_PAGE * len(BOX_COLUMNS_X))
+    rolls = [
+        ("house-list", build_pdf(house_lines), parse_voter_roll(["\n".join(house_lines)])),
+        ("box-3col", build_box_pdf(box_voters), box_voters),
+    ]
+
+    for layout, pdf, expected in rolls:
+        print(f"📄 {layout}: {args.pages} pages, {len(expected):,} voters")
+        for mode in PDF_EXTRACT_MODES:
+            start = time.perf_counter()
+            voters = PDFProcessingService.extract_voter_data_from_pdf(pdf, workers=1, mode=mode)
+            elapsed = time.perf_counter() - start
+            parsed = {voter['voter_id']: voter for voter in voters}
+            correct = sum(parsed.get(voter['voter_id']) == voter for voter in expected)
+            print(f"   {mode}: {elapsed:.2f}s, {correct:,}/{len(expected):,} voters exact ({len(voters):,} parsed)")
+
+
+def bench_upload_dedup(args):
+    """Processing time of a roll's first upload, a duplicate re-upload and the same file on another booth"""
+    from sqlalchemy.orm import Session
+    from app.services import PDFProcessingService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _ = build_voter_database(os.path.join(tmp, "bench.db"), 2000)
+        pdf_path = os.path.join(tmp, "roll.pdf")
+        with open(pdf_path, "wb") as pdf:
+            pdf.write(build_pdf(synthetic_roll_lines(args.pages * LINES_PER_PAGE // 5, prefix="DUP")))
+        print(f"📄 Synthetic roll: {args.pages} pages")
+
+        for label, booth_id in [("first upload", 1), ("duplicate, same booth", 1), ("same file, another booth", 2)]:
+            with Session(engine) as db:
+                start = time.perf_counter()
+                result = PDFProcessingService.process_voter_pdf(db, booth_id, "roll.pdf", pdf_path)
+                elapsed = time.perf_counter() - start
+            print(f"   {label}: {elapsed * 1000:,.0f} ms - {result['message']}")
+        engine.dispose()
+
+
+def bench_upload_stages(args):
+    """Where an upload's time goes: the stage timings recorded on its upload log"""
+    from sqlalchemy.orm import Session
+    from app import models
+    from app.services import PDFProcessingService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _ = build_voter_database(os.path.join(tmp, "bench.db"), 2000)
+        pdf_path = os.path.join(tmp, "roll.pdf")
+        with open(pdf_path, "wb") as pdf:
+            pdf.write(build_pdf(synthetic_roll_lines(args.pages * LINES_PER_PAGE // 5, prefix="STG")))
+
+        with Session(engine) as db:
+            result = PDFProcessingService.process_voter_pdf(db, 1, "roll.pdf", pdf_path)
+            upload_log = db.get(models.UploadLog, result['upload_log_id'])
+            timings = dict(upload_log.stage_timings)
+            print(
+                f"📄 Synthetic roll: {upload_log.page_count} pages, {upload_log.line_count:,} lines, "
+                f"{upload_log.parsed_voter_count:,} voters parsed"
+            )
+        total = timings.pop("total")
+        for stage, ms in timings.items():
+            share = "" if stage == "slowest_page" else f" ({ms / total:.0%})"
+            print(f"   {stage}: {ms:,.1f} ms{share}")
+        print(f"   total: {total:,.1f} ms")
+        engine.dispose()
+
+
+def revised_roll(roll, changes, rng):
+    """A copy of a parsed roll with about `changes` corrections, house moves, removals and additions"""
+    roll = [dict(voter) for voter in roll]
+    picked = rng.sample(range(len(roll)), changes)
+    quarter = max(1, changes // 4)
+    for index in picked[:quarter]:
+        roll[index]['name'] += " Kumar"
+    for index in picked[quarter:2 * quarter]:
+        roll[index]['house_number'] = roll[(index + 7) % len(roll)]['house_number']
+    removed = set(picked[2 * quarter:3 * quarter])
+    added = [
+        {'name': f"New{n} Devi", 'age': 30, 'gender': "F", 'voter_id': f"NEW{n:07d}", 'house_number': roll[n]['house_number']}
+        for n in range(changes - 3 * quarter)
+    ]
+    return [voter for index, voter in enumerate(roll) if index not in removed] + added
+
+
+def bench_roll_revision(args):
+    """Applying a revised roll as a diff vs deleting and reloading the booth, by booth size"""
+    from sqlalchemy.orm import Session
+    from app import crud, models
+    from app.services import PDFProcessingService
+
+    rng = random.Random(5)
+    for booth_size in (1000, 10000, 50000):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, _ = build_voter_database(os.path.join(tmp, "bench.db"), booth_size * 2, voters_per_booth=booth_size)
+            with Session(engine) as db:
+                booth = crud.get_booth(db, 1)
+                roll = [
+                    {'name': name, 'age': age, 'gender': gender, 'voter_id': voter_id, 'house_number': house_number}
+                    for name, age, gender, voter_id, house_number in db.query(
+                        models.Voter.name, models.Voter.age, models.Voter.gender,
+                        models.Voter.voter_id, models.Voter.house_number
+                    ).filter(models.Voter.booth_id == 1)
+                ]
+                revised = revised_roll(roll, args.changes, rng)
+
+                def reload():
+                    # Today's alternative: empty the booth and load the roll again
+                    crud.bulk_delete_voters(db, [id for id, in db.query(models.Voter.id).filter(models.Voter.booth_id == 1)])
+                    db.query(models.House).filter(models.House.booth_id == 1).delete(synchronize_session=False)
+                    house_ids, _ = crud.upsert_houses(db, 1, [voter['house_number'] for voter in revised])
+                    location = {'booth_id': 1, 'village_id': booth.village_id,
+                                'mandal_id': booth.village.mandal_id, 'district_id': booth.village.mandal.district_id}
+                    crud.bulk_create_voters(db, [
+                        {**{key: voter[key] for key in ('name', 'age', 'gender', 'voter_id')},
+                         'house_id': house_ids[voter['house_number']], **location}
+                        for voter in revised
+                    ])
+
+                timings = {}
+                for label, apply in [("delete + reload", reload),
+                                     ("revision diff", lambda: PDFProcessingService.apply_roll_revision(db, booth, revised))]:
+                    start = time.perf_counter()
+                    apply()
+                    db.flush()
+                    timings[label] = time.perf_counter() - start
+                    db.rollback()
+                print(
+                    f"   booth of {booth_size:,} voters, {args.changes} changes: "
+                    + ", ".join(f"{label} {seconds * 1000:,.0f} ms" for label, seconds in timings.items())
+                )
+            engine.dispose()
+
+
+def start_server(database_path):
+    """Run the app under one uvicorn worker on a free port; returns (process, base_url)"""
+    import httpx
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{database_path}"},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{base_url}/api/stats", timeout=1).raise_for_status()
+            return server, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+async def run_load(base_url, paths, concurrency, requests):
+    """Send requests round-robin over paths from concurrency clients; returns (seconds, latencies ms, errors)"""
+    import httpx
+
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client(http):
+        nonlocal errors
+        for number in counter:
+            start = time.perf_counter()
+            try:
+                response = await http.get(paths[number % len(paths)])
+                errors += response.status_code != 200
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, errors
+
+
+def peak_rss_mb(pid):
+    """Peak resident memory of a process so far (Linux)"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+
+def bench_upload_memory(args):
+    """Peak server memory while concurrent clients upload large voter PDFs"""
+    import httpx
+
+    pdf = build_pdf(synthetic_roll_lines(30), padding=args.upload_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "bench.db")
+        engine, _ = build_voter_database(database_path, 1000)
+        engine.dispose()
+
+        server, base_url = start_server(database_path)
+        try:
+            before = peak_rss_mb(server.pid)
+
+            async def upload_all():
+                async with httpx.AsyncClient(base_url=base_url, timeout=600) as http:
+                    async def upload():
+                        response = await http.post(
+                            "/api/upload-voters", data={"booth_id": "1"}, files={"file": ("roll.pdf", pdf)}
+                        )
+                        return response.json().get("upload_log_id")
+                    return await asyncio.gather(*(upload() for _ in range(args.concurrency)))
+
+            start = time.perf_counter()
+            upload_log_ids = asyncio.run(upload_all())
+            elapsed = time.perf_counter() - start
+            # Let the queued jobs run, so their memory is counted too
+            statuses = []
+            for upload_log_id in upload_log_ids:
+                for _ in range(600):
+                    status = httpx.get(f"{base_url}/api/upload-logs/{upload_log_id}").json()["status"]
+                    if status in ("completed", "failed"):
+                        break
+                    time.sleep(0.1)
+                statuses.append(status)
+            peak = peak_rss_mb(server.pid)
+
+            print(
+                f"   {args.concurrency} x {len(pdf) / 1024 / 1024:.0f} MB uploads in {elapsed:.1f}s, "
+                f"{statuses.count('completed')} completed"
+            )
+            print(f"   server peak RSS: {before:.0f} MB idle, {peak:.0f} MB after the uploads")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def bench_voter_export(args):
+    """Time and server memory of a district export per format vs paging through /api/voters/search"""
+    import httpx
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "bench.db")
+        engine, _ = build_voter_database(database_path, args.voters)
+        engine.dispose()
+        print(f"🗄️  Built {args.voters:,} voters")
+
+        server, base_url = start_server(database_path)
+        try:
+            print(f"   idle: server peak RSS {peak_rss_mb(server.pid):.0f} MB")
+            with httpx.Client(base_url=base_url, timeout=600) as http:
+                start = time.perf_counter()
+                rows = 0
+                after_id = None
+                while True:
+                    params = {"district_id": 1, "limit": 1000, "count": "none"}
+                    if after_id is not None:
+                        params["after_id"] = after_id
+                    page = http.get("/api/voters/search", params=params).json()
+                    rows += len(page["voters"])
+                    after_id = page.get("next_after_id")
+                    if after_id is None:
+                        break
+                print(
+                    f"   search pages: {rows:,} rows in {time.perf_counter() - start:.1f}s, "
+                    f"server peak RSS {peak_rss_mb(server.pid):.0f} MB"
+                )
+
+                # Peak RSS only grows, so formats run from the lightest writer up
+                for export_format in ["csv", "ndjson", "parquet", "xlsx"]:
+                    start = time.perf_counter()
+                    size = 0
+                    with http.stream("GET", "/api/export/voters", params={"district_id": 1, "format": export_format}) as response:
+                        response.raise_for_status()
+                        for chunk in response.iter_bytes():
+                            size += len(chunk)
+                    print(
+                        f"   {export_format}: {size / 1024 / 1024:.1f} MB in {time.perf_counter() - start:.1f}s, "
+                        f"server peak RSS {peak_rss_mb(server.pid):.0f} MB"
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def bench_api_load(args):
+    """Request throughput of one server worker under concurrent read traffic"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "bench.db")
+        engine, _ = build_voter_database(database_path, args.voters)
+        engine.dispose()
+        print(f"🗄️  Built {args.voters:,} voters")
+
+        booths = max(1, args.voters // 1000)
+        rng = random.Random(11)
+        paths = []
+        for _ in range(20):
+            booth = rng.randrange(1, booths + 1)
+            paths += [
+                "/api/stats",
+                "/api/districts/1/mandals",
+                "/api/rollups?village_id=1",
+                f"/api/voters/search?name={rng.choice(LAST_NAMES)}&count=estimate",
+                f"/api/voters/search?booth_id={booth}&count=estimate",
+                f"/api/booths/{booth}/summary?houses_only=true&limit=50",
+                "/upload-logs",
+                "/",
+            ]
+
+        server, base_url = start_server(database_path)
+        try:
+            asyncio.run(run_load(base_url, paths, 4, len(paths)))  # warm-up
+            for concurrency in sorted({1, args.concurrency}):
+                elapsed, latencies, errors = asyncio.run(run_load(base_url, paths, concurrency, args.requests))
+                print(
+                    f"   concurrency={concurrency}: {args.requests / elapsed:.0f} req/s, "
+                    f"p50 {statistics.median(latencies):.1f} ms, p95 {percentile(latencies, 95):.1f} ms, "
+                    f"{errors} errors"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+BENCHMARKS = {
+    "pdf-extraction": bench_pdf_extraction,
+    "voter-search": bench_voter_search,
+    "api-load": bench_api_load,
+    "voter-schema": bench_voter_schema,
+    "roll-parsing": bench_roll_parsing,
+    "pdf-modes": bench_pdf_modes,
+    "upload-memory": bench_upload_memory,
+    "upload-dedup": bench_upload_dedup,
+    "upload-stages": bench_upload_stages,
+    "roll-revision": bench_roll_revision,
+    "voter-export": bench_voter_export,
+    "hierarchy-import": bench_hierarchy_import,
+    "booth-import": bench_booth_import,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PolitiQ performance benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--pages", type=int, default=40, help="pages per synthetic roll")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction worker processes")
+    parser.add_argument("--voters", type=int, default=200000, help="voters in the synthetic database")
+    parser.add_argument("--queries", type=int, default=60, help="searches per mode")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per load run")
+    parser.add_argument("--upload-mb", type=int, default=50, help="size of each uploaded PDF")
+    parser.add_argument("--changes", type=int, default=20, help="voters changed by a revised roll")
+    parser.add_argument("--rows", type=int, default=200000, help="rows in the synthetic GP list")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    print(f"🚀 Running {args.benchmark} benchmark...")
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Recompute the hierarchy rollup counters from the base tables
+Run this after changing data outside the application (e.g. direct SQL)
+"""
+
+from app.database import SessionLocal, engine
+from app import crud
+from app.migrations import init_database
+
+def main():
+    """Rebuild every rollup row in one transaction"""
+    print("🔄 Rebuilding hierarchy rollups...")
+    init_database(engine)
+    
+    db = SessionLocal()
+    try:
+        rows = crud.rebuild_rollups(db)
+        db.commit()
+        state = crud.get_rollup(db, "state")
+        print(f"✅ Rebuilt {rows} rollup rows")
+        print("📊 " + ", ".join(f"{count}: {value}" for count, value in state.items()))
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error rebuilding rollups: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
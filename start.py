@@ -36,7 +36,8 @@ def main():
     print("   - Host: 0.0.0.0")
     print("   - Port: 8000")
     print("   - Reload: True")
-    print("   - Database: SQLite (politiq.db)")
+    database_url = os.getenv("DATABASE_URL", "sqlite:///./politiq.db")
+    print(f"   - Database: {database_url.split(':')[0]}")
     print()
     
     print("🌐 Access URLs:")
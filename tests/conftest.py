@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas, search
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A session on a new SQLite database with the voter full-text index"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'politiq.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    assert search.ensure_voter_search_index(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    search._fts_databases.discard(search._database_key(engine))
+    engine.dispose()
+
+
+@pytest.fixture
+def booths(db):
+    """Two booths of one village"""
+    district = crud.create_district(db, schemas.DistrictCreate(name="Hyderabad"))
+    mandal = crud.create_mandal(db, schemas.MandalCreate(name="Amberpet", district_id=district.id))
+    village = crud.create_village(db, schemas.VillageCreate(name="Bagh Amberpet", mandal_id=mandal.id))
+    return [
+        crud.create_booth(db, schemas.BoothCreate(booth_number=number, booth_name=f"Booth {number}", village_id=village.id))
+        for number in ("1", "2")
+    ]
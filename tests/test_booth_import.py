@@ -0,0 +1,34 @@
+"""Row accounting of booth imports (HierarchyService.import_booths)"""
+
+from app import crud, schemas
+from app.services import HierarchyService
+
+
+BOOTHS_CSV = b"""District,Mandal,Village,Booth Number,Booth Name
+1,2,3,4,5
+Hyderabad,Amberpet,Bagh Amberpet,1,Govt School
+Hyderabad,Amberpet,Bagh Amberpet,1,Govt School
+Hyderabad,Amberpet,Bagh Amberpet,,Community Hall
+Hyderabad,Amberpet,Golnaka,2,Ward Office
+,,,,
+Hyderabad,Amberpet,Bagh Amberpet,3,
+Hyderabad,Amberpet,Bagh Amberpet,4,Library
+"""
+
+
+def test_rows_with_a_blank_cell_are_reported(db):
+    district = crud.create_district(db, schemas.DistrictCreate(name="Hyderabad"))
+    mandal = crud.create_mandal(db, schemas.MandalCreate(name="Amberpet", district_id=district.id))
+    crud.create_village(db, schemas.VillageCreate(name="Bagh Amberpet", mandal_id=mandal.id))
+
+    result = HierarchyService.import_booths(db, BOOTHS_CSV)
+
+    stats = result['stats']
+    assert result['success']
+    assert (stats['booths_created'], stats['booths_skipped'], stats['rows_unmatched']) == (2, 1, 1)
+    # The numbering row and the empty row are not data rows
+    assert stats['rows_invalid'] == 2
+    assert stats['invalid_rows'] == [5, 8]
+    assert stats['rows'] == 6
+    assert stats['booths_created'] + stats['booths_skipped'] + stats['rows_unmatched'] + stats['rows_invalid'] == stats['rows']
+    assert "2 rows have a blank cell" in result['message']
@@ -0,0 +1,83 @@
+"""Recovering the upload jobs of server processes that died (app.jobs.recover_interrupted_uploads)"""
+
+import os
+import socket
+
+import pytest
+
+from app import crud, jobs, models, schemas, uploads
+
+
+LIVE_PID = 4001
+DEAD_PID = 4002
+
+
+@pytest.fixture
+def workers(monkeypatch, tmp_path):
+    """Only LIVE_PID (and this process) runs on this host; uploads spool to a temporary directory"""
+    monkeypatch.setattr(jobs, "process_alive", lambda pid: pid == LIVE_PID)
+    monkeypatch.setattr(uploads, "process_alive", lambda pid: pid == LIVE_PID)
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_DIR", str(tmp_path / "spool"))
+    host = socket.gethostname()
+    return {"live": f"{host}:{LIVE_PID}", "dead": f"{host}:{DEAD_PID}", "remote": f"elsewhere:{DEAD_PID}"}
+
+
+def job(db, booth, worker, status="queued", upload_batch_id=None):
+    upload_log = crud.create_upload_log(db, schemas.UploadLogCreate(
+        filename="roll.pdf", booth_id=booth.id, status=status, upload_batch_id=upload_batch_id, worker=worker
+    ))
+    return upload_log.id
+
+
+def status(db, upload_log_id):
+    return crud.get_upload_log(db, upload_log_id).status
+
+
+def test_jobs_of_dead_processes_fail(db, booths, workers):
+    booth = booths[0]
+    queued = job(db, booth, workers["dead"])
+    processing = job(db, booth, workers["dead"], status="processing 3/10 pages")
+    finished = job(db, booth, workers["dead"], status="completed")
+    running = job(db, booth, workers["live"])
+    remote = job(db, booth, workers["remote"])
+
+    assert jobs.recover_interrupted_uploads(db) == 2
+
+    for upload_log_id in (queued, processing):
+        upload_log = crud.get_upload_log(db, upload_log_id)
+        assert (upload_log.status, upload_log.error_message) == ("failed", "Interrupted by a server restart")
+    assert status(db, finished) == "completed"
+    assert status(db, running) == "queued"
+    # Jobs of other hosts are left for those hosts to recover
+    assert status(db, remote) == "queued"
+
+
+def test_jobs_recorded_under_this_pid_belong_to_an_earlier_process(db, booths, workers):
+    upload_log_id = job(db, booths[0], jobs.WORKER_ID)
+
+    assert jobs.recover_interrupted_uploads(db) == 1
+    assert status(db, upload_log_id) == "failed"
+
+
+def test_failed_jobs_are_counted_on_their_batch(db, booths, workers):
+    upload_batch = crud.create_upload_batch(db, schemas.UploadBatchCreate(filename="rolls.zip", total_files=2))
+    job(db, booths[0], workers["dead"], status="completed", upload_batch_id=upload_batch.id)
+    crud.record_upload_batch_result(db, upload_batch.id, True, 2, 1)
+    job(db, booths[1], workers["dead"], upload_batch_id=upload_batch.id)
+
+    jobs.recover_interrupted_uploads(db)
+
+    upload_batch = db.query(models.UploadBatch).filter(models.UploadBatch.id == upload_batch.id).one()
+    assert (upload_batch.files_completed, upload_batch.files_failed) == (1, 1)
+    assert upload_batch.status == "completed_with_errors"
+
+
+def test_uploads_spooled_by_dead_processes_are_removed(db, workers):
+    spool_dir = uploads.UPLOAD_SPOOL_DIR
+    os.makedirs(spool_dir)
+    for name in (f"{DEAD_PID}-a.pdf", f"{LIVE_PID}-b.pdf"):
+        open(os.path.join(spool_dir, name), "wb").close()
+
+    jobs.recover_interrupted_uploads(db)
+
+    assert os.listdir(spool_dir) == [f"{LIVE_PID}-b.pdf"]
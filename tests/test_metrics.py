@@ -0,0 +1,39 @@
+"""SQL metrics recorded by the execution hooks (app.metrics)"""
+
+import pytest
+from sqlalchemy import update
+
+from app import crud, metrics, models
+from app.services import PDFProcessingService
+
+
+@pytest.fixture
+def registry(db, monkeypatch):
+    """A fresh registry counting the statements of the test database"""
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    metrics.instrument_engine(db.get_bind())
+    return registry
+
+
+def test_rows_affected_counts_changes_not_selects(db, booths, registry):
+    PDFProcessingService.apply_roll_revision(db, booths[0], [
+        {"voter_id": f"ABC100000{serial}", "name": f"Voter {serial}", "age": 30, "gender": "M", "house_number": "1"}
+        for serial in range(3)
+    ])
+    db.commit()
+    house_id = db.query(models.House.id).scalar()
+
+    before = registry.rows_affected[metrics.BACKGROUND_ROUTE]
+    # A bulk INSERT ... RETURNING, where SQLite's cursor reports no rows
+    inserted = crud.bulk_create_voters(db, [
+        {"voter_id": f"ABC200000{serial}", "name": "New", "age": 20, "gender": "F", "house_id": house_id, "booth_id": booths[0].id}
+        for serial in range(4)
+    ])
+    db.execute(update(models.Voter).where(models.Voter.name == "New").values(age=21))
+    db.query(models.Voter).all()
+    db.commit()
+
+    assert inserted == 4
+    assert registry.rows_affected[metrics.BACKGROUND_ROUTE] - before == 8
+    assert "politiq_sql_rows_affected_total" in registry.render()
@@ -0,0 +1,106 @@
+"""
+Upgrading databases created before migrations (app.migrations.init_database)
+
+A database is built with the baseline schema and some data through raw SQL,
+as the original create_all left it, then brought to the latest revision.
+"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.migrations import init_database, upgrade_database
+
+
+BASELINE_ROWS = [
+    "INSERT INTO districts (id, name, state) VALUES (1, 'Hyderabad', 'Telangana')",
+    "INSERT INTO mandals (id, name, district_id) VALUES (1, 'Amberpet', 1)",
+    "INSERT INTO villages (id, name, mandal_id) VALUES (1, 'Bagh Amberpet', 1), (2, 'Golnaka', 1)",
+    "INSERT INTO booths (id, booth_number, booth_name, village_id) VALUES (1, '1', 'Booth 1', 1), (2, '2', 'Booth 2', 1)",
+    "INSERT INTO houses (id, house_number, booth_id) VALUES (1, '1-10', 1), (2, '1-11', 1), (3, '2-30', 2)",
+    """
+    INSERT INTO voters (id, name, age, gender, voter_id, house_id, district_name, mandal_name, village_name, booth_number, house_number)
+    VALUES
+        (1, 'Ramesh Kumar', 40, 'Male', 'ABC1000001', 1, 'Hyderabad', 'Amberpet', 'Bagh Amberpet', '1', '1-10'),
+        (2, 'Lakshmi Devi', 38, 'Female', 'ABC1000002', 1, 'Hyderabad', 'Amberpet', 'Bagh Amberpet', '1', '1-10'),
+        (3, 'Srinivas Rao', 52, 'Male', 'ABC1000003', 2, 'Hyderabad', 'Amberpet', 'Bagh Amberpet', '1', '1-11'),
+        (4, 'Anjali Sharma', 29, 'Female', 'ABC2000001', 3, 'Hyderabad', 'Amberpet', 'Bagh Amberpet', '2', '2-30')
+    """,
+    "INSERT INTO upload_logs (id, filename, booth_id, total_voters, total_houses, status) VALUES (1, 'roll.pdf', 1, 3, 2, 'completed')",
+]
+
+
+def schema(engine):
+    """Columns and indexes of every table"""
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted((column["name"], str(column["type"]), column["nullable"]) for column in inspector.get_columns(table)),
+            sorted(index["name"] for index in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names() if table != "alembic_version"
+    }
+
+
+def rollups(db):
+    return {
+        (rollup.level, rollup.node_id): {count: getattr(rollup, count) for count in crud.ROLLUP_COUNTS}
+        for rollup in db.query(models.HierarchyRollup)
+    }
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """A database with the tables and data of a pre-migrations release"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    upgrade_database(engine, "0001")
+    with engine.begin() as conn:
+        for statement in BASELINE_ROWS:
+            conn.execute(text(statement))
+        conn.execute(text("DROP TABLE alembic_version"))
+    yield engine
+    engine.dispose()
+
+
+def test_baseline_database_upgrades_to_the_model_schema(baseline_engine, tmp_path):
+    init_database(baseline_engine)
+
+    created = create_engine(f"sqlite:///{tmp_path / 'created.db'}")
+    models.Base.metadata.create_all(bind=created)
+    assert schema(baseline_engine) == schema(created)
+    created.dispose()
+
+
+def test_upgrade_keeps_the_data_and_fills_what_migrations_add(baseline_engine):
+    init_database(baseline_engine)
+
+    db = Session(bind=baseline_engine)
+    voters = {voter.voter_id: voter for voter in db.query(models.Voter)}
+    assert len(voters) == 4
+    # Voters carry the hierarchy ids the location name columns were replaced by
+    voter = voters["ABC2000001"]
+    assert (voter.district_id, voter.mandal_id, voter.village_id, voter.booth_id) == (1, 1, 1, 2)
+    assert db.query(models.UploadLog).one().status == "completed"
+
+    # The rollup counters filled by the migration agree with a full rebuild
+    migrated = rollups(db)
+    assert migrated[("state", 0)]["voters"] == 4
+    assert migrated[("booth", 2)]["houses"] == 1
+    crud.rebuild_rollups(db)
+    db.commit()
+    rebuilt = rollups(db)
+    zero = dict.fromkeys(crud.ROLLUP_COUNTS, 0)
+    for key in set(migrated) | set(rebuilt):
+        assert migrated.get(key, zero) == rebuilt.get(key, zero), key
+    assert crud.get_rollup(db, "village", 2)["voters"] == 0
+    db.close()
+
+
+def test_upgrade_runs_once(baseline_engine):
+    init_database(baseline_engine)
+    upgraded = schema(baseline_engine)
+
+    init_database(baseline_engine)
+
+    assert schema(baseline_engine) == upgraded
@@ -0,0 +1,63 @@
+"""Voter roll parsing (app.parsers) and the layout handling of PDF extraction"""
+
+from app.parsers import parse_voter_roll
+from app.services import PDFProcessingService, _sniff_layout
+from benchmark import LINES_PER_PAGE, build_box_pdf, build_pdf, synthetic_box_voters, synthetic_roll_lines
+
+
+# Page text of a box roll whose 7th voter's name wraps: the rest of that box
+# moves down a line, out of line with the boxes next to it
+BOX_ROWS_TEXT = """1 ABC0000001 2 ABC0000002 3 ABC0000003
+Name : Ramesh Kumar Name : Lakshmi Devi Name : Srinivas Rao
+Father's Name: Ravi Kumar Father's Name: Venkat Rao Father's Name: Narayana Rao
+House Number : 1-A House Number : 1-B House Number : 2
+Age : 40 Gender : Male Age : 38 Gender : Female Age : 61 Gender : Male
+7 ABC0000007 8 ABC0000008 9 ABC0000009
+Name : Voter7 Kumar Name : Voter8 Kumar Name : Voter9 Kumar
+Venkata Satya Narayana Father's Name: Father8 Kumar Father's Name: Father9 Kumar
+Father's Name: Father7 Kumar House Number : 3-C House Number : 3-A
+House Number : 3-B Age : 26 Gender : Female Age : 27 Gender : Male
+Age : 25 Gender : Male"""
+
+
+def test_misaligned_box_rows_are_counted_not_shifted():
+    stats = {}
+
+    voters = parse_voter_roll([BOX_ROWS_TEXT], stats=stats)
+
+    assert [voter['voter_id'] for voter in voters] == ["ABC0000001", "ABC0000002", "ABC0000003"]
+    assert voters[2] == {
+        'name': "Srinivas Rao", 'age': 61, 'gender': "M", 'voter_id': "ABC0000003", 'house_number': "2"
+    }
+    assert stats['unparsed'] == 3
+
+
+def test_box_rolls_are_read_by_word_position_in_text_mode():
+    expected = synthetic_box_voters(30)
+
+    voters = PDFProcessingService.extract_voter_data_from_pdf(build_box_pdf(expected), workers=1, mode="text")
+
+    assert voters == expected
+
+
+def test_layout_is_sniffed_from_the_first_page_with_voters():
+    cover = ["Electoral Roll 2026", "Assembly Constituency: Amberpet"]
+    cover += [""] * (LINES_PER_PAGE - len(cover))
+
+    assert _sniff_layout(build_pdf(cover + synthetic_roll_lines(5))).name == "house-list"
+    assert _sniff_layout(build_box_pdf(synthetic_box_voters(3))).name == "box-3col"
+    assert _sniff_layout(build_pdf(cover)) is None
+
+
+def test_house_list_rolls_stay_in_text_mode(monkeypatch):
+    def no_word_positions(page):
+        raise AssertionError("house-list rolls are read as text")
+
+    monkeypatch.setattr("app.services._page_words", no_word_positions)
+
+    voters = PDFProcessingService.extract_voter_data_from_pdf(
+        build_pdf(synthetic_roll_lines(5, voters_per_house=2)), workers=1, mode="text"
+    )
+
+    assert len(voters) == 10
+    assert voters[0]['voter_id'] == "ABC0000001"
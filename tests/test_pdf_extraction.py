@@ -0,0 +1,21 @@
+"""Failures while reading voter PDFs (PDFProcessingService.extract_voter_data_from_pdf)"""
+
+import pytest
+
+from app import crud
+from app.services import PDFProcessingService
+
+
+def test_unreadable_pdf_raises():
+    with pytest.raises(Exception):
+        PDFProcessingService.extract_voter_data_from_pdf(b"not a pdf", workers=1)
+
+
+def test_upload_log_records_the_extraction_error(db, booths):
+    result = PDFProcessingService.process_voter_pdf(db, booths[0].id, "roll.pdf", b"not a pdf")
+
+    upload_log = crud.get_upload_log(db, result['upload_log_id'])
+    assert not result['success']
+    assert upload_log.status == "failed"
+    assert upload_log.error_message
+    assert upload_log.error_message != "No voter data found in PDF"
@@ -0,0 +1,180 @@
+"""
+Behaviour of revised voter rolls (PDFProcessingService.apply_roll_revision)
+
+Each test loads a roll into a booth, applies a revision and checks the voter
+and house rows, the rollup counters against a full rebuild, and what the
+full-text voter search finds afterwards.
+"""
+
+from app import crud, models
+from app.services import PDFProcessingService
+
+
+def voter(voter_id, name, house_number, age=40, gender="Male"):
+    return {"voter_id": voter_id, "name": name, "age": age, "gender": gender, "house_number": house_number}
+
+
+def revise(db, booth, roll):
+    changeset = PDFProcessingService.apply_roll_revision(db, booth, roll)
+    db.commit()
+    return changeset
+
+
+def booth_voters(db, booth):
+    """voter_id -> (name, house_number) of the booth's voters"""
+    rows = db.query(models.Voter.voter_id, models.Voter.name, models.House.house_number).join(
+        models.House, models.Voter.house_id == models.House.id
+    ).filter(models.Voter.booth_id == booth.id)
+    return {voter_id: (name, house_number) for voter_id, name, house_number in rows}
+
+
+def booth_houses(db, booth):
+    return {house.house_number for house in crud.get_houses_by_booth(db, booth.id)}
+
+
+def assert_rollups_match_rebuild(db):
+    def snapshot():
+        return {
+            (rollup.level, rollup.node_id): {count: getattr(rollup, count) for count in crud.ROLLUP_COUNTS}
+            for rollup in db.query(models.HierarchyRollup)
+        }
+
+    maintained = snapshot()
+    crud.rebuild_rollups(db)
+    db.commit()
+    rebuilt = snapshot()
+    # A node that never had anything counted has no row; readers count it as zero
+    zero = dict.fromkeys(crud.ROLLUP_COUNTS, 0)
+    for key in set(maintained) | set(rebuilt):
+        assert maintained.get(key, zero) == rebuilt.get(key, zero), key
+
+
+def found(db, **filters):
+    """voter_ids the search finds through the full-text index"""
+    return {voter.voter_id for voter in crud.search_voters_query(db, **filters)}
+
+
+def test_added_and_removed_voters(db, booths):
+    booth = booths[0]
+    revise(db, booth, [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC1000002", "Lakshmi Devi", "1-10"),
+        voter("ABC1000003", "Srinivas Rao", "1-11"),
+    ])
+
+    changeset = revise(db, booth, [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC1000002", "Lakshmi Devi", "1-10"),
+        voter("ABC1000004", "Padma Reddy", "1-12"),
+    ])
+
+    assert changeset["added"] == 1
+    assert changeset["removed"] == 1
+    assert changeset["unchanged"] == 2
+    assert (changeset["houses_added"], changeset["houses_removed"]) == (1, 1)
+    assert booth_voters(db, booth) == {
+        "ABC1000001": ("Ramesh Kumar", "1-10"),
+        "ABC1000002": ("Lakshmi Devi", "1-10"),
+        "ABC1000004": ("Padma Reddy", "1-12"),
+    }
+    # The house of the removed voter had nobody else and is gone
+    assert booth_houses(db, booth) == {"1-10", "1-12"}
+    assert_rollups_match_rebuild(db)
+    assert crud.get_rollup(db, "booth", booth.id)["voters"] == 3
+
+    assert found(db, name="Padma") == {"ABC1000004"}
+    assert found(db, voter_id="ABC1000004") == {"ABC1000004"}
+    assert found(db, name="Srinivas") == set()
+    assert found(db, voter_id="ABC1000003") == set()
+
+
+def test_voter_moved_within_the_booth(db, booths):
+    booth = booths[0]
+    revise(db, booth, [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC1000002", "Lakshmi Devi", "1-10"),
+        voter("ABC1000003", "Srinivas Rao", "1-11"),
+    ])
+
+    changeset = revise(db, booth, [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC1000002", "Lakshmi Devi", "1-10"),
+        voter("ABC1000003", "Srinivas Rao", "1-20"),
+    ])
+
+    assert changeset["moved"] == 1
+    assert (changeset["added"], changeset["removed"], changeset["transferred"]) == (0, 0, 0)
+    assert booth_voters(db, booth)["ABC1000003"] == ("Srinivas Rao", "1-20")
+    assert booth_houses(db, booth) == {"1-10", "1-20"}
+    assert_rollups_match_rebuild(db)
+    assert crud.get_rollup(db, "booth", booth.id)["houses"] == 2
+
+    # The index follows the voter to the new house number
+    assert found(db, house_number="1-20") == {"ABC1000003"}
+    assert found(db, house_number="1-11") == set()
+    assert found(db, name="Srinivas", booth_id=booth.id) == {"ABC1000003"}
+
+
+def test_voter_transferred_from_another_booth(db, booths):
+    booth, other_booth = booths
+    revise(db, booth, [voter("ABC1000001", "Ramesh Kumar", "1-10")])
+    revise(db, other_booth, [
+        voter("ABC2000001", "Anjali Sharma", "2-30"),
+        voter("ABC2000002", "Mohammed Ali", "2-31"),
+    ])
+
+    changeset = revise(db, booth, [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC2000002", "Mohammed Ali", "1-15"),
+    ])
+
+    assert changeset["transferred"] == 1
+    assert (changeset["added"], changeset["removed"]) == (0, 0)
+    assert booth_voters(db, booth) == {
+        "ABC1000001": ("Ramesh Kumar", "1-10"),
+        "ABC2000002": ("Mohammed Ali", "1-15"),
+    }
+    assert booth_voters(db, other_booth) == {"ABC2000001": ("Anjali Sharma", "2-30")}
+    # The house the voter left behind was emptied and is deleted
+    assert booth_houses(db, other_booth) == {"2-30"}
+    transferred = db.query(models.Voter).filter(models.Voter.voter_id == "ABC2000002").one()
+    assert (transferred.booth_id, transferred.village_id) == (booth.id, booth.village_id)
+    assert_rollups_match_rebuild(db)
+    assert crud.get_rollup(db, "booth", booth.id)["voters"] == 2
+    other_rollup = crud.get_rollup(db, "booth", other_booth.id)
+    assert (other_rollup["houses"], other_rollup["voters"]) == (1, 1)
+
+    assert found(db, name="Mohammed", booth_id=booth.id) == {"ABC2000002"}
+    assert found(db, name="Mohammed", booth_id=other_booth.id) == set()
+    assert found(db, house_number="2-31") == set()
+
+
+def test_corrected_details_replace_the_indexed_ones(db, booths):
+    booth = booths[0]
+    revise(db, booth, [voter("ABC1000001", "Ramesh Kumar", "1-10", age=40)])
+
+    changeset = revise(db, booth, [voter("ABC1000001", "Ramesh Kumar Goud", "1-10", age=41)])
+
+    assert (changeset["updated"], changeset["unchanged"]) == (1, 0)
+    corrected = db.query(models.Voter).filter(models.Voter.voter_id == "ABC1000001").one()
+    assert (corrected.name, corrected.age) == ("Ramesh Kumar Goud", 41)
+    assert_rollups_match_rebuild(db)
+
+    assert found(db, name="Goud") == {"ABC1000001"}
+    assert found(db, name="Ramesh Kumar") == {"ABC1000001"}
+
+
+def test_reapplying_a_roll_changes_nothing(db, booths):
+    booth = booths[0]
+    roll = [
+        voter("ABC1000001", "Ramesh Kumar", "1-10"),
+        voter("ABC1000002", "Lakshmi Devi", "1-11"),
+    ]
+    revise(db, booth, roll)
+
+    changeset = revise(db, booth, roll)
+
+    assert changeset["unchanged"] == 2
+    assert not any(changeset[key] for key in ("added", "updated", "moved", "transferred", "removed"))
+    assert booth_houses(db, booth) == {"1-10", "1-11"}
+    assert_rollups_match_rebuild(db)
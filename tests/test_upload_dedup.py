@@ -0,0 +1,93 @@
+"""Upload deduplication and the parsed roll cache (PDFProcessingService.process_voter_pdf)"""
+
+import pytest
+
+from app import models, services
+from app.services import PDFProcessingService
+
+
+ROLL = b"%PDF-1.4 a voter roll"
+SCANNED_ROLL = b"%PDF-1.4 a scanned roll without text"
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """The PDFs extraction ran on; every roll but SCANNED_ROLL parses to the same two voters"""
+    parsed = []
+
+    def extract_voter_data_from_pdf(pdf_file, progress=None, timer=None, **kwargs):
+        parsed.append(pdf_file)
+        if pdf_file == SCANNED_ROLL:
+            return []
+        return [
+            {"voter_id": "ABC1000001", "name": "Ramesh Kumar", "age": 40, "gender": "M", "house_number": "1-10"},
+            {"voter_id": "ABC1000002", "name": "Lakshmi Devi", "age": 38, "gender": "F", "house_number": "1-11"},
+        ]
+
+    monkeypatch.setattr(PDFProcessingService, "extract_voter_data_from_pdf", staticmethod(extract_voter_data_from_pdf))
+    return parsed
+
+
+def upload(db, booth, pdf_file=ROLL):
+    return PDFProcessingService.process_voter_pdf(db, booth.id, "roll.pdf", pdf_file)
+
+
+def upload_log(db, result):
+    return db.query(models.UploadLog).filter(models.UploadLog.id == result['upload_log_id']).one()
+
+
+def test_reuploading_the_last_roll_of_a_booth_is_a_duplicate(db, booths, parses):
+    upload(db, booths[0])
+
+    result = upload(db, booths[0])
+
+    assert result['success']
+    assert result['stats'] == {'total_voters': 0, 'total_houses': 0}
+    assert upload_log(db, result).status == "duplicate"
+    assert len(parses) == 1
+    assert db.query(models.Voter).count() == 2
+
+
+def test_roll_parsed_for_another_booth_comes_from_the_cache(db, booths, parses):
+    upload(db, booths[0])
+
+    result = upload(db, booths[1])
+
+    assert result['success']
+    assert len(parses) == 1
+    log = upload_log(db, result)
+    assert (log.status, log.parsed_voter_count) == ("completed", 2)
+    assert "cache" in log.stage_timings
+
+
+def test_earlier_roll_of_the_booth_is_loaded_again_from_the_cache(db, booths, parses):
+    upload(db, booths[0])
+    upload(db, booths[0], b"%PDF-1.4 a revised voter roll")
+
+    result = upload(db, booths[0])
+
+    # Only the booth's last roll counts as a duplicate; older ones are applied
+    assert upload_log(db, result).status == "completed"
+    assert len(parses) == 2
+
+
+def test_rolls_without_voters_are_not_cached(db, booths, parses):
+    result = upload(db, booths[0], SCANNED_ROLL)
+    assert not result['success']
+
+    upload(db, booths[1], SCANNED_ROLL)
+
+    assert len(parses) == 2
+    assert db.query(models.ParsedRoll).count() == 0
+
+
+def test_parser_version_change_parses_cached_rolls_again(db, booths, parses, monkeypatch):
+    upload(db, booths[0])
+    monkeypatch.setattr(services, "PARSER_VERSION", services.PARSER_VERSION + 1)
+
+    result = upload(db, booths[1])
+
+    assert result['success']
+    assert len(parses) == 2
+    # What the previous parsers made of the file is replaced, not kept alongside
+    assert db.query(models.ParsedRoll.parser_version).all() == [(services.PARSER_VERSION,)]
@@ -0,0 +1,100 @@
+"""
+Voter search: the full-text index (app.search) and keyset paging of the
+/api/voters/search endpoint
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import api, crud, database
+from app.cache import HierarchyCache
+from app.services import PDFProcessingService
+
+
+ROLL = [
+    ("ABC1000001", "Ramesh Kumar", "1-10"),
+    ("ABC1000002", "Lakshmi Devi", "1-10"),
+    ("ABC1000003", "Srinivas Rao", "1-11"),
+    ("ABC1000004", "Padma Reddy", "1-12"),
+    ("XYZ2000005", "Ravi Kumar", "12-4"),
+]
+
+
+@pytest.fixture
+def roll(db, booths):
+    PDFProcessingService.apply_roll_revision(db, booths[0], [
+        {"voter_id": voter_id, "name": name, "age": 40, "gender": "Male", "house_number": house_number}
+        for voter_id, name, house_number in ROLL
+    ])
+    db.commit()
+    return booths[0]
+
+
+def found(db, use_fts=True, **filters):
+    return {voter.voter_id for voter in crud.search_voters_query(db, use_fts=use_fts, **filters)}
+
+
+@pytest.mark.parametrize("filters", [
+    {"name": "kumar"},
+    {"name": "amesh"},
+    {"name": "Kumar", "house_number": "1-10"},
+    {"voter_id": "abc100000"},
+    {"house_number": "12-"},
+    {"name": "Ra"},
+    {"name": "Ram", "voter_id": "XYZ"},
+    {"name": "Nobody"},
+])
+def test_full_text_search_finds_what_like_filters_find(db, roll, filters):
+    assert found(db, **filters) == found(db, use_fts=False, **filters)
+
+
+def test_long_terms_use_the_index_and_short_ones_like(db, roll):
+    statement = str(crud.search_voters_query(db, name="Kumar", house_number="1").statement)
+
+    assert "voters_fts MATCH" in statement
+    assert " LIKE " in statement
+    assert found(db, name="Kumar", house_number="1") == {"ABC1000001", "XYZ2000005"}
+
+
+def test_search_quotes_fts_syntax_in_terms(db, roll):
+    assert found(db, name='Kumar" OR "Devi') == set()
+    assert found(db, name="Rao AND") == set()
+
+
+def search_pages(db, limit, **filters):
+    """Follow next_after_id through /api/voters/search; returns the voter_ids of each page"""
+    async def pages():
+        engine = database._create_engine(database._async_url(str(db.get_bind().url)), create=create_async_engine)
+        async with AsyncSession(engine) as session:
+            after_id, result = None, []
+            while True:
+                page = await api.search_voters(**filters, limit=limit, after_id=after_id, count="none", db=session)
+                result.append([voter["voter_id"] for voter in page["voters"]])
+                after_id = page["next_after_id"]
+                if after_id is None:
+                    break
+        await engine.dispose()
+        return result
+
+    return asyncio.run(pages())
+
+
+@pytest.fixture
+def hierarchy_cache(monkeypatch):
+    # The process-wide cache could hold another test database's hierarchy
+    monkeypatch.setattr(api, "hierarchy_cache", HierarchyCache())
+
+
+def test_keyset_pages_cover_every_match_once(db, roll, hierarchy_cache):
+    pages = search_pages(db, 2, booth_id=roll.id)
+
+    assert pages == [["ABC1000001", "ABC1000002"], ["ABC1000003", "ABC1000004"], ["XYZ2000005"]]
+
+
+def test_keyset_paging_ends_on_a_full_last_page(db, roll, hierarchy_cache):
+    pages = search_pages(db, 2, name="Kumar")
+
+    # A full page can't tell whether more follow; the next one comes back empty
+    assert pages == [["ABC1000001", "XYZ2000005"], []]